@@ -6,10 +6,15 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+import asyncio
 import os
 from typing import Dict, Any
 
-from .routes import query, index, projects, stats, context_rules, documentation, webhook, architecture, datasets, faq_ai
+from ..llm.ollama_client import OLLAMA_WARMUP, close_http_client, get_ollama_client
+from ..llm.scheduler import get_scheduler
+from ..llm.tokens import get_tokenizer
+from ..storage.chroma_client import ChromaClient
+from .routes import query, index, projects, stats, context_rules, documentation, webhook, architecture, datasets, faq_ai, chunks
 
 # Настройка логирования
 logging.basicConfig(
@@ -44,6 +49,23 @@ app.include_router(webhook.router, prefix="/api/webhook", tags=["webhook"])
 app.include_router(architecture.router, prefix="/api", tags=["architecture"])
 app.include_router(datasets.router, prefix="/api", tags=["datasets"])
 app.include_router(faq_ai.router, prefix="/api", tags=["faq-ai"])
+app.include_router(chunks.router, prefix="/api", tags=["chunks"])
+
+@app.on_event("startup")
+async def start_background_jobs():
+    """Фоновые задачи: сверка счётчиков статистики с ChromaDB, загрузка токенизатора, прогрев модели Ollama"""
+    app.state.stats_reconcile_task = asyncio.create_task(stats.reconcile_stats_forever())
+    # Токенизатор грузится с диска секунды - заранее, а не на первом запросе к LLM
+    app.state.tokenizer_task = asyncio.create_task(asyncio.to_thread(get_tokenizer))
+    if OLLAMA_WARMUP:
+        # Холодная загрузка 14B модели - десятки секунд, не блокируем старт API
+        app.state.ollama_warmup_task = asyncio.create_task(
+            get_ollama_client().warm_up(ChromaClient.project_names())
+        )
+
+@app.on_event("shutdown")
+async def close_clients():
+    await close_http_client()
 
 # Статические файлы
 if os.path.exists("frontend"):
@@ -96,7 +118,12 @@ async def docs():
 @app.get("/health")
 async def health_check():
     """Проверка здоровья сервиса"""
-    return {"status": "healthy", "service": "project-brain"}
+    scheduler = get_scheduler()
+    return {
+        "status": "healthy",
+        "service": "project-brain",
+        "llm": {"active": scheduler.active, "queued": scheduler.queued, "concurrency": scheduler.concurrency}
+    }
 
 if __name__ == "__main__":
     import uvicorn
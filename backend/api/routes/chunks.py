@@ -0,0 +1,74 @@
+"""
+API роуты для точного поиска чанков (диапазон строк, символ) - для интеграций с редактором
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict, Any, Optional
+import logging
+
+from ...storage.chroma_client import ChromaClient
+from .stats import get_chroma_client
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/chunks/{project}/range")
+async def get_chunks_in_range(
+    project: str,
+    file: str = Query(..., description="Относительный путь файла"),
+    start: int = Query(..., ge=1),
+    end: int = Query(..., ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    chroma: ChromaClient = Depends(get_chroma_client)
+) -> Dict[str, Any]:
+    """Чанки файла, пересекающиеся со строками start-end"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end должен быть не меньше start")
+    try:
+        chunks = await chroma.chunks_in_range(project, file, start, end, limit=limit)
+        return {"project": project, "file": file, "start": start, "end": end, "chunks": chunks}
+    except Exception as e:
+        logger.error(f"Ошибка поиска чанков по диапазону строк: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/chunks/{project}/symbol/{symbol}")
+async def get_chunks_for_symbol(
+    project: str,
+    symbol: str,
+    file: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    chroma: ChromaClient = Depends(get_chroma_client)
+) -> Dict[str, Any]:
+    """Чанки функции, класса или секции документации по точному имени"""
+    try:
+        chunks = await chroma.chunks_for_symbol(project, symbol, file_path=file, limit=limit)
+        return {"project": project, "symbol": symbol, "chunks": chunks}
+    except Exception as e:
+        logger.error(f"Ошибка поиска чанков по символу: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/chunks/{project}/symbols")
+async def search_symbols(
+    project: str,
+    q: str = Query(..., min_length=1),
+    mode: str = Query("prefix", pattern="^(exact|prefix|fuzzy)$"),
+    limit: int = Query(20, ge=1, le=200),
+    chroma: ChromaClient = Depends(get_chroma_client)
+) -> Dict[str, Any]:
+    """Поиск по таблице символов: точный, по префиксу или нечёткий (автодополнение в редакторе)"""
+    try:
+        table = await chroma.symbol_index.get_table(project)
+        if table is None:
+            return {"project": project, "query": q, "symbols": []}
+        if mode == "exact":
+            symbols = table.exact(q)[:limit]
+        elif mode == "fuzzy":
+            symbols = table.fuzzy(q, limit=limit)
+        else:
+            symbols = table.prefix(q, limit=limit)
+        return {"project": project, "query": q, "symbols": symbols}
+    except Exception as e:
+        logger.error(f"Ошибка поиска по таблице символов: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Dict, Any, Optional
 import logging
 
+from ...rag.context_rules import RULES_TOKEN_BUDGET
 from ...rag.engine import RAGEngine
 
 router = APIRouter()
@@ -26,6 +27,8 @@ async def get_context_rules(
     file: Optional[str] = Query(None, description="Путь к файлу"),
     role: Optional[str] = Query(None, description="Роль пользователя"),
     module: Optional[str] = Query(None, description="Модуль системы"),
+    project: str = Query("staffprobot", description="Проект"),
+    max_tokens: int = Query(RULES_TOKEN_BUDGET, ge=100, le=8000, description="Бюджет токенов"),
     rag: RAGEngine = Depends(get_rag_engine)
 ) -> Dict[str, Any]:
     """
@@ -40,22 +43,20 @@ async def get_context_rules(
             "module": module
         }
         
-        # Получение релевантных правил
-        relevant_rules = await rag.get_relevant_rules(
+        # Готовый набор из кэша (правила скомпилированы из rules_path проекта)
+        bundle = await rag.context_rules.get_rules(
+            project,
             file_path=file or "",
             role=role or "",
-            module=module or ""
+            module=module or "",
+            budget=max_tokens
         )
         
-        # Подсчет токенов (примерно 4 символа = 1 токен)
-        total_chars = sum(len(rule) for rule in relevant_rules)
-        estimated_tokens = total_chars // 4
-        
         return {
-            "rules": relevant_rules,
+            "rules": bundle["rules"],
             "context": context,
-            "estimated_tokens": estimated_tokens,
-            "rules_count": len(relevant_rules)
+            "estimated_tokens": bundle["tokens"],
+            "rules_count": len(bundle["rules"])
         }
         
     except Exception as e:
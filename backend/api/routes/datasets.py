@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import os
 from typing import Any, Dict, List
 import hashlib
@@ -11,9 +12,13 @@ import httpx
 from fastapi import APIRouter, HTTPException
 
 from ...architecture.storage import get_chroma_client, get_redis_client
+from ...rag.embeddings import aembed_texts
+from ...storage.chroma_client import DATASET_COLLECTIONS
+from ...storage.index_stats import IndexStats
 
 
 router = APIRouter()
+index_stats = IndexStats()
 
 
 def _staffprobot_base() -> str:
@@ -59,14 +64,6 @@ async def sync_datasets(mode: str = "full") -> Dict[str, Any]:
     chroma = get_chroma_client()
     redis = get_redis_client()
 
-    # optional embedder (sentence-transformers)
-    embedder = None
-    try:
-        from sentence_transformers import SentenceTransformer  # type: ignore
-        embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    except Exception:
-        embedder = None
-
     def _hash(text: str) -> str:
         return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
 
@@ -81,10 +78,10 @@ async def sync_datasets(mode: str = "full") -> Dict[str, Any]:
                     err = f"HTTP {r.status_code}"
                 else:
                     items = r.json().get("items", [])
-                    col = chroma.get_or_create_collection(name)
+                    col = await asyncio.to_thread(chroma.get_or_create_collection, name)
                     # load existing
                     try:
-                        existing = col.get(ids=None, include=["metadatas"])
+                        existing = await asyncio.to_thread(col.get, ids=None, include=["metadatas"])
                         ids_exist = existing.get("ids", []) or []
                         metas_exist = existing.get("metadatas", []) or []
                         id2hash = {ids_exist[i]: (metas_exist[i] or {}).get("doc_hash") for i in range(len(ids_exist))}
@@ -108,34 +105,36 @@ async def sync_datasets(mode: str = "full") -> Dict[str, Any]:
                         docs.append(doc)
                         metas.append({**it, "doc_hash": h})
                     if ids:
-                        if embedder:
-                            try:
-                                emb = embedder.encode(docs, normalize_embeddings=True).tolist()  # type: ignore
-                                col.add(ids=ids, documents=docs, metadatas=metas, embeddings=emb)
-                            except Exception:
-                                col.add(ids=ids, documents=docs, metadatas=metas)
-                        else:
-                            col.add(ids=ids, documents=docs, metadatas=metas)
+                        # Общая локальная модель (та же, что кодирует запросы), кодирование вне event loop
+                        emb = await aembed_texts(docs)
+                        await asyncio.to_thread(col.add, ids=ids, documents=docs, metadatas=metas, embeddings=emb)
+                    await index_stats.set_dataset_count(name, await asyncio.to_thread(col.count))
             except Exception as e:
                 err = str(e)
             finally:
                 stats[name] = {"added": added, "updated": updated, "skipped": skipped, "duration_sec": round(time.time()-t0,3), "error": err}
 
     # commit history
-    commits = _get_commit_history(100)
+    commits = await asyncio.to_thread(_get_commit_history, 100)
     t0 = time.time()
     err = None
     try:
-        col = chroma.get_or_create_collection("commit_history")
-        existing = col.get(ids=None)
+        col = await asyncio.to_thread(chroma.get_or_create_collection, "commit_history")
+        existing = await asyncio.to_thread(col.get, ids=None, include=[])
         existed = set(existing.get("ids", []) or [])
         new_items = [c for c in commits if f"commit:{c['sha']}" not in existed]
         if new_items:
-            col.add(
+            subjects = [c.get("subject", "") for c in new_items]
+            # Те же эмбеддинги, что у запросов, иначе коллекция ищется чужой моделью
+            emb = await aembed_texts(subjects)
+            await asyncio.to_thread(
+                col.add,
                 ids=[f"commit:{c['sha']}" for c in new_items],
-                documents=[c.get("subject", "") for c in new_items],
+                documents=subjects,
                 metadatas=new_items,
+                embeddings=emb,
             )
+        await index_stats.set_dataset_count("commit_history", await asyncio.to_thread(col.count))
         stats["commit_history"] = {"added": len(new_items), "updated": 0, "skipped": len(commits)-len(new_items), "duration_sec": round(time.time()-t0,3), "error": err}
     except Exception as e:
         stats["commit_history"] = {"added": 0, "updated": 0, "skipped": 0, "duration_sec": round(time.time()-t0,3), "error": str(e)}
@@ -150,15 +149,16 @@ async def sync_datasets(mode: str = "full") -> Dict[str, Any]:
 
 @router.get("/datasets/metrics")
 async def datasets_metrics() -> Dict[str, Any]:
-    chroma = get_chroma_client()
-    names = ["faq_knowledge", "bug_context", "dev_changes", "commit_history"]
-    out: Dict[str, int] = {}
-    for n in names:
-        try:
-            col = chroma.get_or_create_collection(n)
-            out[n] = len(col.get(ids=None).get("ids", []))
-        except Exception:
-            out[n] = 0
-    return {"collections": out, "timestamp": dt.datetime.utcnow().isoformat() + "Z"}
-
-
+    # Счётчики ведёт /datasets/sync и фоновая сверка; ChromaDB опрашиваем только при их отсутствии
+    out: Dict[str, int] = await index_stats.get_dataset_counts()
+    missing = [n for n in DATASET_COLLECTIONS if n not in out]
+    if missing:
+        chroma = get_chroma_client()
+        for n in missing:
+            try:
+                col = await asyncio.to_thread(chroma.get_or_create_collection, n)
+                out[n] = await asyncio.to_thread(col.count)
+                await index_stats.set_dataset_count(n, out[n])
+            except Exception:
+                out[n] = 0
+    return {"collections": {n: out.get(n, 0) for n in DATASET_COLLECTIONS}, "timestamp": dt.datetime.utcnow().isoformat() + "Z"}
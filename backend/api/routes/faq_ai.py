@@ -2,33 +2,39 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 
-from ...architecture.storage import get_chroma_client
+from ...rag.embeddings import aembed_query
+from ...storage.chroma_client import ChromaClient
+from .stats import get_chroma_client
 
 
 router = APIRouter()
 
 
 @router.get("/faq/ai")
-async def faq_ai_get(query: str = Query(..., min_length=2)) -> Dict[str, Any]:
-    chroma = get_chroma_client()
-    col = chroma.get_or_create_collection("faq_knowledge")
-    res = col.query(query_texts=[query], n_results=3, include=["documents", "metadatas", "distances"])
+async def faq_ai_get(
+    query: str = Query(..., min_length=2),
+    chroma: ChromaClient = Depends(get_chroma_client),
+) -> Dict[str, Any]:
+    # Эмбеддинг той же локальной моделью, что и при /datasets/sync (кэшируется, вне event loop)
+    embedding = await aembed_query(query)
+    res = await chroma.query_collection("faq_knowledge", embedding, n_results=3)
     docs = res.get("documents", [[]])[0]
     metas = res.get("metadatas", [[]])[0]
     dists = res.get("distances", [[]])[0]
     answer = docs[0] if docs else "Ответ не найден"
     sources = [
-        {"file": f"faq:{m.get('id', idx)}", "lines": "-", "score": float(dists[idx]) if idx < len(dists) else None}
+        {"file": f"faq:{(m or {}).get('id', idx)}", "lines": "-", "score": float(dists[idx]) if idx < len(dists) else None}
         for idx, m in enumerate(metas)
     ]
     return {"answer": answer, "sources": sources}
 
 
 @router.post("/faq/ai")
-async def faq_ai_post(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def faq_ai_post(
+    payload: Dict[str, Any],
+    chroma: ChromaClient = Depends(get_chroma_client),
+) -> Dict[str, Any]:
     q = payload.get("query") or ""
-    return await faq_ai_get(query=q)
-
-
+    return await faq_ai_get(query=q, chroma=chroma)
@@ -4,7 +4,7 @@ API роуты для индексации проектов
 import asyncio
 import logging
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
@@ -12,7 +12,11 @@ from pydantic import BaseModel
 from ...indexers.simple_project_indexer import SimpleProjectIndexer
 from ...indexers.python_indexer import PythonIndexer
 from ...indexers.markdown_indexer import MarkdownIndexer
+from ...indexers.file_chunks import file_chunks
+from ...indexers.index_gc import IndexGarbageCollector
 from ...rag.engine import RAGEngine
+from ...storage.redis_lock import RedisLock
+from .webhook import acquire_reindex_lock
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -40,8 +44,8 @@ async def get_rag_engine():
     return rag_engine
 
 
-async def index_project_background(project_name: str):
-    """Фоновая индексация проекта (потоковая обработка)"""
+async def index_project_background(project_name: str, lock: Optional[RedisLock] = None):
+    """Фоновая индексация проекта (потоковая обработка); по завершении снимает блокировку переиндексации"""
     try:
         logger.info(f"=== Начало индексации: {project_name} ===")
         start_time = time.time()
@@ -49,13 +53,8 @@ async def index_project_background(project_name: str):
         # Получение RAG engine
         rag = await get_rag_engine()
 
-        # Получаем список уже проиндексированных файлов
-        # ВАЖНО: НЕ используем collection.get() - это медленно и виснет
-        # Вместо этого просто пытаемся добавить, ChromaDB сам отбросит дубли по ID
-        indexed_files = set()  # Оставляем пустым - не проверяем заранее
-        logger.info(
-            "📊 Начинаем индексацию без предварительной проверки (дубли отбросит ChromaDB)"
-        )
+        # Файлы переиндексируются целиком: неизменённые чанки перезаписываются по тем же
+        # стабильным ID, а прежние версии изменённых чанков файла удаляются (replace_file)
 
         stats = {
             "total_files": 0,
@@ -69,54 +68,26 @@ async def index_project_background(project_name: str):
         logger.info(f"🚀 Индексация проекта {project_name}")
         async for file_info in project_indexer.iter_project_files(project_name):
             try:
-                file_path = file_info["file_path"]
                 file_type = file_info["file_type"]
                 relative_path = file_info["relative_path"]
 
                 stats["total_files"] += 1
 
                 # Индексация файла
-                chunks = []
                 if file_type == "python":
-                    chunks = await python_indexer.index_file(file_path)
                     stats["python_files"] += 1
                 elif file_type == "markdown":
-                    chunks = await markdown_indexer.index_file(file_path)
                     stats["markdown_files"] += 1
+                prepared = await file_chunks(project_name, file_info, python_indexer, markdown_indexer)
 
-                # Загрузка чанков в ChromaDB
-                for chunk in chunks:
-                    try:
-                        # Классификация типа документа
-                        doc_type = (
-                            python_indexer._classify_doc_type(relative_path)
-                            if file_type == "python"
-                            else "documentation"
-                        )
-
-                        await rag.store_document(
-                            project=project_name,
-                            content=chunk["content"],
-                            metadata={
-                                "file": relative_path,
-                                "type": chunk["type"],
-                                "doc_type": doc_type,
-                                "start_line": chunk.get("start_line", 0),
-                                "end_line": chunk.get("end_line", 0),
-                                "lines": chunk.get(
-                                    "lines",
-                                    f"{chunk.get('start_line', 0)}-{chunk.get('end_line', 0)}",
-                                ),
-                                "project": project_name,
-                                "chunk_id": chunk.get(
-                                    "chunk_id", hash(chunk["content"][:100])
-                                ),
-                            },
-                        )
-                        stats["total_chunks"] += 1
-                    except Exception as error:
-                        stats["errors"] += 1
-                        logger.error("Ошибка загрузки чанка: %s", error)
+                # Загрузка чанков в ChromaDB одним батчем на файл
+                try:
+                    stats["total_chunks"] += await rag.storage.replace_file(
+                        project_name, relative_path, prepared
+                    )
+                except Exception as error:
+                    stats["errors"] += 1
+                    logger.error("Ошибка загрузки чанков: %s", error)
 
                 # Логируем прогресс
                 if stats["total_files"] % 50 == 0:
@@ -136,6 +107,7 @@ async def index_project_background(project_name: str):
                 )
 
         processing_time = time.time() - start_time
+        await rag.storage.index_stats.finish_run(project_name, processing_time)
 
         logger.info(f"=== Индексация завершена за {processing_time:.2f}с ===")
         logger.info(
@@ -147,6 +119,9 @@ async def index_project_background(project_name: str):
 
     except Exception as error:
         logger.error("❌ Критическая ошибка индексации: %s", error, exc_info=True)
+    finally:
+        if lock is not None:
+            await lock.release()
 
 
 @router.post("/index/{project_name}", response_model=IndexResponse)
@@ -165,8 +140,16 @@ async def index_project(project_name: str, background_tasks: BackgroundTasks):
                 detail=f"Проект {project_name} не найден. Доступные: {project_names}",
             )
 
+        # Та же блокировка, что у webhook: два прохода по одному проекту не пересекаются
+        acquired, lock = await acquire_reindex_lock(project_name)
+        if not acquired:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Переиндексация проекта {project_name} уже идёт, повторите позже",
+            )
+
         # Запуск фоновой задачи
-        background_tasks.add_task(index_project_background, project_name)
+        background_tasks.add_task(index_project_background, project_name, lock)
 
         return IndexResponse(
             status="started",
@@ -205,3 +188,38 @@ async def get_index_status(project_name: str):
     except Exception as error:
         logger.error("Ошибка получения статуса: %s", error)
         raise HTTPException(status_code=500, detail=str(error))
+
+
+@router.post("/index/gc/{project_name}")
+async def collect_index_garbage(project_name: str, dry_run: bool = False):
+    """
+    Удаление из индекса чанков удалённых и переименованных файлов
+    и устаревших версий чанков изменённых файлов
+    """
+    try:
+        rag = await get_rag_engine()
+        gc = IndexGarbageCollector(rag)
+        return await gc.collect(project_name, dry_run=dry_run)
+
+    except ValueError as error:
+        raise HTTPException(status_code=404, detail=str(error))
+    except Exception as error:
+        logger.error("Ошибка сборки мусора в индексе: %s", error)
+        raise HTTPException(status_code=500, detail=str(error))
+
+
+@router.post("/index/partitions/{project_name}/rebuild")
+async def rebuild_index_partitions(project_name: str):
+    """
+    Пересборка коллекций-разделов doc_type из основной коллекции проекта
+    """
+    try:
+        rag = await get_rag_engine()
+        counts = await rag.storage.rebuild_partitions(project_name)
+        return {"project": project_name, "partitions": counts}
+
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except Exception as error:
+        logger.error("Ошибка пересборки разделов индекса: %s", error)
+        raise HTTPException(status_code=500, detail=str(error))
@@ -1,15 +1,22 @@
 """
 API роуты для запросов к AI
 """
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Dict, Any, List, AsyncIterator
 import asyncio
+import json
 import logging
+import time
 
-from ...rag.engine import RAGEngine  # Полноценный RAG с ChromaDB
+from ...rag.engine import RAGEngine, UnknownProjectError  # Полноценный RAG с ChromaDB
 from ...rag.simple_engine import SimpleRAGEngine  # Fallback
-from ...llm.ollama_client import OllamaClient
+from ...llm.ollama_client import OllamaClient, get_ollama_client
+from ...storage.chroma_client import CHROMA_BREAKER_RESET_SEC
+from ...llm.completion_cache import get_completion_cache
+from ...llm.scheduler import LLMOverloadedError
+from ...storage.circuit_breaker import CircuitOpenError
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,6 +24,10 @@ logger = logging.getLogger(__name__)
 class QueryRequest(BaseModel):
     query: str
     project: str = "staffprobot"
+    # Федеративный поиск: датасеты (faq_knowledge, bug_context, dev_changes, commit_history) или ["*"]
+    datasets: Optional[List[str]] = None
+    # Поиск сразу по нескольким проектам: ["staffprobot", "project-brain"] или ["*"]
+    projects: Optional[List[str]] = None
     context: Optional[Dict[str, Any]] = None
     max_tokens: Optional[int] = 1000
 
@@ -26,9 +37,8 @@ class QueryResponse(BaseModel):
     relevant_rules: Optional[List[str]] = None
     processing_time: float
 
-# Глобальные клиенты (инициализируются при первом запросе)
+# Глобальный RAG engine (инициализируется при первом запросе), Ollama клиент общий на процесс
 rag_engine: Optional[RAGEngine] = None
-ollama_client: Optional[OllamaClient] = None
 
 async def get_rag_engine() -> RAGEngine:
     """Получение RAG engine с ChromaDB (ленивая инициализация)"""
@@ -46,13 +56,12 @@ async def get_rag_engine() -> RAGEngine:
             logger.warning("⚠️ Используется SimpleRAGEngine (без ChromaDB)")
     return rag_engine
 
-async def get_ollama_client() -> OllamaClient:
-    """Получение Ollama клиента (ленивая инициализация)"""
-    global ollama_client
-    if ollama_client is None:
-        ollama_client = OllamaClient()
-        await ollama_client.initialize()
-    return ollama_client
+def _circuit_open_exception() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="База знаний временно недоступна, попробуйте позже",
+        headers={"Retry-After": str(int(CHROMA_BREAKER_RESET_SEC))}
+    )
 
 @router.post("/query", response_model=QueryResponse)
 async def query_ai(
@@ -63,14 +72,15 @@ async def query_ai(
     """
     Основной endpoint для запросов к AI
     """
-    import time
     start_time = time.time()
     
     try:
         # Получение релевантного контекста
         result = await rag.query(
             query=request.query,
-            project=request.project
+            project=request.project,
+            datasets=request.datasets,
+            projects=request.projects
         )
         
         # Результат уже готов из RAG
@@ -87,10 +97,159 @@ async def query_ai(
             processing_time=processing_time
         )
         
+    except UnknownProjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning(f"ChromaDB недоступна, запрос отклонён: {e}")
+        raise _circuit_open_exception()
+    except LLMOverloadedError as e:
+        logger.warning(f"LLM перегружена, запрос отклонён: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="LLM перегружена, попробуйте позже",
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
     except Exception as e:
         logger.error(f"Ошибка при обработке запроса: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка обработки запроса: {str(e)}")
 
+def _sse(event: Dict[str, Any]) -> str:
+    """Событие Server-Sent Events: имя в event, остальное - JSON в data"""
+    payload = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _timed_events(first: Dict[str, Any], events: AsyncIterator[Dict[str, Any]], start_time: float):
+    """События потока с processing_time в завершающем событии"""
+    yield first
+    async for event in events:
+        if event["event"] == "done":
+            event = {**event, "processing_time": time.time() - start_time}
+        yield event
+
+async def _open_stream(request: QueryRequest, rag) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Запуск потокового запроса: поиск выполняется до первого события (sources),
+    поэтому недоступность ChromaDB видна до начала ответа
+    """
+    start_time = time.time()
+    events = rag.query_stream(
+        query=request.query,
+        project=request.project,
+        datasets=request.datasets,
+        projects=request.projects
+    )
+    first = await events.__anext__()
+    return _timed_events(first, events, start_time)
+
+async def _sse_response(request: QueryRequest, rag) -> StreamingResponse:
+    try:
+        events = await _open_stream(request, rag)
+    except UnknownProjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning(f"ChromaDB недоступна, потоковый запрос отклонён: {e}")
+        raise _circuit_open_exception()
+    except Exception as e:
+        logger.error(f"Ошибка при обработке потокового запроса: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка обработки запроса: {str(e)}")
+    
+    async def body():
+        async for event in events:
+            yield _sse(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx не должен копить поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/query/stream")
+async def query_stream_post(
+    request: QueryRequest,
+    rag: SimpleRAGEngine = Depends(get_rag_engine)
+):
+    """
+    Потоковый ответ (Server-Sent Events): sources → token ... → done
+    """
+    return await _sse_response(request, rag)
+
+@router.get("/query/stream")
+async def query_stream_get(
+    query: str = Query(..., min_length=1),
+    project: str = "staffprobot",
+    datasets: Optional[List[str]] = Query(None),
+    projects: Optional[List[str]] = Query(None),
+    rag: SimpleRAGEngine = Depends(get_rag_engine)
+):
+    """
+    Потоковый ответ для EventSource (только GET)
+    """
+    request = QueryRequest(query=query, project=project, datasets=datasets, projects=projects)
+    return await _sse_response(request, rag)
+
+@router.websocket("/query/ws")
+async def query_websocket(websocket: WebSocket):
+    """
+    Потоковые ответы по WebSocket: клиент шлёт JSON QueryRequest,
+    сервер отвечает событиями sources → token ... → done (или error)
+    """
+    await websocket.accept()
+    rag = await get_rag_engine()
+    try:
+        while True:
+            try:
+                request = QueryRequest(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await websocket.send_json({"event": "error", "status": 422, "detail": str(e)})
+                continue
+            
+            try:
+                events = await _open_stream(request, rag)
+            except UnknownProjectError as e:
+                await websocket.send_json({"event": "error", "status": 400, "detail": str(e)})
+                continue
+            except CircuitOpenError as e:
+                logger.warning(f"ChromaDB недоступна, запрос по WebSocket отклонён: {e}")
+                await websocket.send_json({
+                    "event": "error",
+                    "status": 503,
+                    "detail": "База знаний временно недоступна, попробуйте позже",
+                    "retry_after": int(CHROMA_BREAKER_RESET_SEC)
+                })
+                continue
+            except Exception as e:
+                logger.error(f"Ошибка при обработке запроса по WebSocket: {e}")
+                await websocket.send_json({"event": "error", "status": 500, "detail": str(e)})
+                continue
+            
+            async for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        logger.debug("WebSocket клиент отключился")
+
+class PinnedAnswer(BaseModel):
+    question: str
+    answer: str
+
+@router.get("/query/pinned/{project}")
+async def list_pinned_answers(project: str) -> Dict[str, Any]:
+    """Закреплённые канонические ответы проекта"""
+    return {"project": project, "pinned": await get_completion_cache().list_pinned(project)}
+
+@router.put("/query/pinned/{project}")
+async def pin_answer(project: str, pinned: PinnedAnswer) -> Dict[str, Any]:
+    """Закрепить ответ на вопрос: отдаётся вместо поиска и генерации"""
+    await get_completion_cache().pin(project, pinned.question, pinned.answer)
+    return {"project": project, "question": pinned.question, "pinned": True}
+
+@router.delete("/query/pinned/{project}")
+async def unpin_answer(project: str, question: str = Query(..., min_length=1)) -> Dict[str, Any]:
+    removed = await get_completion_cache().unpin(project, question)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Закреплённый ответ не найден")
+    return {"project": project, "question": question, "pinned": False}
+
 @router.get("/query/test")
 async def test_query():
     """Тестовый endpoint для проверки работы"""
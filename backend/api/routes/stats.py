@@ -3,13 +3,19 @@ API роуты для статистики
 """
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
+import asyncio
 import logging
+import os
 
 from ...storage.chroma_client import ChromaClient
+from .datasets import DATASET_COLLECTIONS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Период фоновой сверки счётчиков статистики с ChromaDB
+STATS_RECONCILE_INTERVAL_SEC = float(os.getenv("STATS_RECONCILE_INTERVAL_SEC", "3600"))
+
 # Глобальный клиент ChromaDB
 chroma_client: ChromaClient = None
 
@@ -53,6 +59,7 @@ async def get_project_stats(
             "total_chunks": stats.get("total_chunks", 0),
             "total_files": stats.get("total_files", 0),
             "last_indexed": stats.get("last_indexed", None),
+            "index_duration_sec": stats.get("index_duration_sec"),
             "file_types": stats.get("file_types", {}),
             "top_files": stats.get("top_files", [])
         }
@@ -60,3 +67,28 @@ async def get_project_stats(
     except Exception as e:
         logger.error(f"Ошибка при получении статистики проекта {project}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка получения статистики проекта: {str(e)}")
+
+@router.post("/stats/{project}/reconcile")
+async def reconcile_project_stats(
+    project: str,
+    chroma: ChromaClient = Depends(get_chroma_client)
+) -> Dict[str, Any]:
+    """Принудительная сверка счётчиков проекта с ChromaDB"""
+    try:
+        stats = await chroma.reconcile_project_stats(project)
+        return {"project": project, **stats}
+    except Exception as e:
+        logger.error(f"Ошибка сверки статистики проекта {project}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка сверки статистики: {str(e)}")
+
+async def reconcile_stats_forever():
+    """Фоновая сверка счётчиков (исправляет дрейф после QA загрузок и ручных правок)"""
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL_SEC)
+        try:
+            chroma = await get_chroma_client()
+            for project in await asyncio.to_thread(ChromaClient.project_names):
+                await chroma.reconcile_project_stats(project)
+            await chroma.refresh_dataset_counts(DATASET_COLLECTIONS)
+        except Exception as e:
+            logger.error(f"Ошибка фоновой сверки статистики: {e}")
@@ -3,18 +3,38 @@ API роуты для webhook автообновления
 """
 from fastapi import APIRouter, HTTPException, Request, BackgroundTasks, Header
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
 import logging
 import hashlib
 import hmac
+import os
+import time
 from datetime import datetime
 
+import redis
+
+from ...architecture.storage import get_redis_client
+from ...storage.redis_lock import RedisLock
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Хранилище статусов последних индексаций (в памяти)
 indexing_status = {}
 
+# Коалесцирование push-событий: пуши в пределах окна схлопываются в одну переиндексацию
+PUSH_DEBOUNCE_SEC = float(os.getenv("WEBHOOK_DEBOUNCE_SEC", "15"))
+REINDEX_LOCK_TTL_SEC = float(os.getenv("REINDEX_LOCK_TTL_SEC", "60"))
+SUPERSEDED_HISTORY_LIMIT = 50
+
+# Ожидающие пуши по репозиториям: {'payload', 'sha', 'queued_shas', 'last_push_at'}
+pending_pushes: Dict[str, Dict[str, Any]] = {}
+# SHA, которые были поглощены более новым пушем и не индексировались отдельно
+superseded_shas: Dict[str, List[str]] = {}
+_coalesce_tasks: Dict[str, asyncio.Task] = {}
+_redis_client: Optional[redis.Redis] = None
+
 class WebhookPayload(BaseModel):
     ref: Optional[str] = None
     repository: Optional[Dict[str, Any]] = None
@@ -25,6 +45,7 @@ async def process_github_push(payload: Dict[str, Any]):
     Обработка push события от GitHub
     """
     repo_name = payload.get('repository', {}).get('name', 'unknown')
+    sha = _payload_sha(payload)
     
     try:
         ref = payload.get('ref', '')
@@ -35,6 +56,7 @@ async def process_github_push(payload: Dict[str, Any]):
             'status': 'in_progress',
             'started_at': datetime.now().isoformat(),
             'ref': ref,
+            'sha': sha,
             'commits_count': commits_count,
             'message': 'Индексация начата'
         }
@@ -49,6 +71,7 @@ async def process_github_push(payload: Dict[str, Any]):
             from ...indexers.simple_project_indexer import SimpleProjectIndexer
             from ...indexers.python_indexer import PythonIndexer
             from ...indexers.markdown_indexer import MarkdownIndexer
+            from ...indexers.file_chunks import file_chunks
             from ...rag.engine import RAGEngine
             import subprocess
             
@@ -122,6 +145,7 @@ async def process_github_push(payload: Dict[str, Any]):
                 
                 # ШАГ 2: Переиндексация
                 logger.info(f"📚 Начинаем индексацию проекта: {project_name}")
+                index_started = time.time()
                 
                 # Инициализация
                 project_indexer = SimpleProjectIndexer()
@@ -140,44 +164,24 @@ async def process_github_push(payload: Dict[str, Any]):
                 # Индексация
                 async for file_info in project_indexer.iter_project_files(project_name):
                     try:
-                        file_path = file_info['file_path']
-                        file_type = file_info['file_type']
                         relative_path = file_info['relative_path']
                         
                         stats['total_files'] += 1
                         
-                        # Индексация файла
-                        chunks = []
-                        if file_type == 'python':
-                            chunks = await python_indexer.index_file(file_path)
-                        elif file_type == 'markdown':
-                            chunks = await markdown_indexer.index_file(file_path)
+                        # Индексация файла: чанки с метаданными, как при ручной индексации
+                        prepared = await file_chunks(project_name, file_info, python_indexer, markdown_indexer)
                         
-                        # Загрузка чанков
-                        for chunk in chunks:
-                            doc_type = python_indexer._classify_doc_type(relative_path) if file_type == 'python' else 'documentation'
-                            
-                            await rag_engine.store_document(
-                                project=project_name,
-                                content=chunk['content'],
-                                metadata={
-                                    'file': relative_path,
-                                    'type': chunk['type'],
-                                    'doc_type': doc_type,
-                                    'start_line': chunk.get('start_line', 0),
-                                    'end_line': chunk.get('end_line', 0),
-                                    'lines': chunk.get('lines', '0-0'),
-                                    'project': project_name,
-                                    'chunk_id': chunk.get('chunk_id', hash(chunk['content'][:100]))
-                                }
-                            )
-                            stats['total_chunks'] += 1
+                        # Upsert чанков файла и удаление прежних версий изменённых чанков
+                        stats['total_chunks'] += await rag_engine.storage.replace_file(
+                            project_name, relative_path, prepared
+                        )
                     
                     except Exception as e:
                         stats['errors'] += 1
                         logger.error(f"Ошибка обработки файла: {e}")
                 
                 logger.info(f"✅ Индексация завершена: {stats}")
+                await rag_engine.storage.index_stats.finish_run(project_name, time.time() - index_started)
                 
                 # Обновляем статус - успешное завершение
                 indexing_status[repo_name] = {
@@ -185,6 +189,7 @@ async def process_github_push(payload: Dict[str, Any]):
                     'started_at': indexing_status.get(repo_name, {}).get('started_at'),
                     'completed_at': datetime.now().isoformat(),
                     'ref': ref,
+                    'sha': sha,
                     'commits_count': commits_count,
                     'stats': stats,
                     'message': 'Индексация успешно завершена'
@@ -209,10 +214,110 @@ async def process_github_push(payload: Dict[str, Any]):
             'started_at': indexing_status.get(repo_name, {}).get('started_at'),
             'failed_at': datetime.now().isoformat(),
             'ref': ref,
+            'sha': sha,
             'error': str(e),
             'message': f'Ошибка индексации: {str(e)}'
         }
 
+def _payload_sha(payload: Dict[str, Any]) -> Optional[str]:
+    """SHA головного коммита из push payload"""
+    return payload.get('after') or (payload.get('head_commit') or {}).get('id')
+
+def _is_reindex_ref(ref: str) -> bool:
+    return 'main' in ref or 'master' in ref
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = get_redis_client()
+    return _redis_client
+
+def enqueue_push(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Постановка push в очередь переиндексации с коалесцированием.
+    
+    Пуши одного репозитория, пришедшие в пределах WEBHOOK_DEBOUNCE_SEC,
+    схлопываются в одну задачу на самом новом SHA.
+    """
+    repo_name = payload.get('repository', {}).get('name', 'unknown')
+    sha = _payload_sha(payload)
+    loop = asyncio.get_running_loop()
+    
+    pending = pending_pushes.get(repo_name)
+    if pending is None:
+        pending = {'queued_shas': []}
+        pending_pushes[repo_name] = pending
+    elif pending.get('sha'):
+        history = superseded_shas.setdefault(repo_name, [])
+        history.append(pending['sha'])
+        del history[:-SUPERSEDED_HISTORY_LIMIT]
+        logger.info(f"⏭️ {repo_name}: {pending['sha']} поглощён более новым пушем {sha}")
+    
+    pending['payload'] = payload
+    pending['sha'] = sha
+    pending['last_push_at'] = loop.time()
+    if sha:
+        pending['queued_shas'].append(sha)
+    
+    task = _coalesce_tasks.get(repo_name)
+    if task is None or task.done():
+        _coalesce_tasks[repo_name] = asyncio.create_task(_run_coalesced(repo_name))
+    
+    return _queue_info(repo_name)
+
+async def acquire_reindex_lock(repo_name: str) -> Tuple[bool, Optional[RedisLock]]:
+    """
+    Взятие распределённой блокировки переиндексации проекта.
+    
+    Общая для webhook и ручной индексации (POST /api/index/{project}): ключ по
+    имени в нижнем регистре совпадает для репозитория и проекта.
+    Возвращает (False, None), если переиндексация уже идёт в другом воркере,
+    и (True, None), если Redis недоступен и работаем без блокировки.
+    """
+    try:
+        lock = RedisLock(_get_redis(), f"reindex:lock:{repo_name.lower()}", ttl=REINDEX_LOCK_TTL_SEC)
+        if await lock.acquire():
+            return True, lock
+        return False, None
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Redis недоступен, переиндексация {repo_name} без распределённой блокировки: {e}")
+        return True, None
+
+async def _run_coalesced(repo_name: str):
+    """Фоновый цикл: ждёт окончания окна debounce и запускает одну переиндексацию"""
+    loop = asyncio.get_running_loop()
+    
+    while repo_name in pending_pushes:
+        pending = pending_pushes[repo_name]
+        delay = pending['last_push_at'] + PUSH_DEBOUNCE_SEC - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue
+        
+        acquired, lock = await acquire_reindex_lock(repo_name)
+        if not acquired:
+            logger.info(f"🔒 {repo_name}: переиндексация уже идёт в другом воркере, ждём")
+            await asyncio.sleep(PUSH_DEBOUNCE_SEC)
+            continue
+        
+        # Забираем самый новый push; всё, что придёт дальше, попадёт в следующий цикл
+        pending = pending_pushes.pop(repo_name)
+        try:
+            await process_github_push(pending['payload'])
+        finally:
+            if lock is not None:
+                await lock.release()
+    
+    _coalesce_tasks.pop(repo_name, None)
+
+def _queue_info(repo_name: str) -> Dict[str, Any]:
+    pending = pending_pushes.get(repo_name) or {}
+    return {
+        'next_sha': pending.get('sha'),
+        'queued_shas': list(pending.get('queued_shas', [])),
+        'superseded_shas': list(superseded_shas.get(repo_name, [])),
+    }
+
 def verify_github_signature(payload_body: bytes, signature: str, secret: str) -> bool:
     """
     Проверка подписи webhook от GitHub
@@ -256,7 +361,6 @@ async def github_webhook(
         logger.info(f"📥 GitHub webhook: event={x_github_event}, repo={payload.get('repository', {}).get('name', 'unknown')}")
         
         # Проверка подписи (если настроен секрет)
-        import os
         webhook_secret = os.getenv('GITHUB_WEBHOOK_SECRET')
         if webhook_secret:
             if not verify_github_signature(body, x_hub_signature_256, webhook_secret):
@@ -267,14 +371,20 @@ async def github_webhook(
         
         # Обрабатываем только push события
         if x_github_event == 'push':
-            # Запускаем обработку в фоне
-            background_tasks.add_task(process_github_push, payload)
+            if _is_reindex_ref(payload.get('ref') or ''):
+                # Коалесцируем пуши и запускаем одну переиндексацию на новейшем SHA
+                queue = enqueue_push(payload)
+            else:
+                # Не main/master - только фиксируем пропуск
+                background_tasks.add_task(process_github_push, payload)
+                queue = None
             
             return {
                 "status": "accepted",
                 "message": "Push event will be processed",
                 "ref": payload.get('ref'),
-                "commits": len(payload.get('commits', []))
+                "commits": len(payload.get('commits', [])),
+                "queue": queue
             }
         
         elif x_github_event == 'ping':
@@ -307,7 +417,7 @@ async def test_webhook():
     }
 
 @router.post("/manual-reindex/{project_name}")
-async def manual_reindex(project_name: str, background_tasks: BackgroundTasks):
+async def manual_reindex(project_name: str):
     """
     Ручной запуск переиндексации
     """
@@ -320,11 +430,12 @@ async def manual_reindex(project_name: str, background_tasks: BackgroundTasks):
         'commits': []
     }
     
-    background_tasks.add_task(process_github_push, fake_payload)
+    queue = enqueue_push(fake_payload)
     
     return {
         "status": "accepted",
-        "message": f"Reindexing {project_name} started in background"
+        "message": f"Reindexing {project_name} started in background",
+        "queue": queue
     }
 
 @router.get("/status")
@@ -341,10 +452,11 @@ async def get_indexing_status():
 async def get_project_status(project_name: str):
     """
     Получить статус индексации конкретного проекта
+    (включая SHA в очереди и поглощённые более новыми пушами)
     """
     status = indexing_status.get(project_name)
     
-    if not status:
+    if not status and project_name not in pending_pushes:
         return {
             "status": "not_found",
             "message": f"Проект {project_name} ещё не индексировался"
@@ -353,6 +465,7 @@ async def get_project_status(project_name: str):
     return {
         "status": "ok",
         "project": project_name,
-        "indexing": status
+        "indexing": status,
+        **_queue_info(project_name)
     }
 
@@ -6,8 +6,8 @@ from datetime import datetime
 from typing import Any, Dict
 
 import redis
-from chromadb import HttpClient
 
+from ..storage.vector_store import VectorStore, get_vector_store
 from .models import GraphData, Node, Edge
 
 
@@ -16,15 +16,9 @@ def get_redis_client() -> redis.Redis:
     return redis.Redis.from_url(url)
 
 
-def get_chroma_client() -> HttpClient:
-    host = os.getenv("CHROMA_HOST", "http://chromadb:8000")
-    if host.startswith("http://"):
-        host = host[len("http://") :]
-    if ":" in host:
-        host, port = host.split(":", 1)
-    else:
-        port = "8000"
-    return HttpClient(host=host, port=int(port))
+def get_chroma_client() -> VectorStore:
+    # Бэкенд (HTTP / встроенный / NumPy) задаётся VECTOR_STORE_BACKEND
+    return get_vector_store()
 
 
 class ArchitectureStorage:
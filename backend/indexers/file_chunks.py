@@ -0,0 +1,53 @@
+"""
+Чанки файла проекта в том виде, в котором они пишутся в коллекцию
+
+Общий код ручной индексации, webhook переиндексации и сборки мусора: по одним
+и тем же метаданным считаются стабильные ID чанков.
+"""
+from typing import Any, Dict, List
+
+from ..storage.chunk_ids import chunk_symbol
+from .markdown_indexer import MarkdownIndexer
+from .python_indexer import PythonIndexer
+
+
+async def file_chunks(
+    project_name: str,
+    file_info: Dict[str, Any],
+    python_indexer: PythonIndexer,
+    markdown_indexer: MarkdownIndexer,
+) -> List[Dict[str, Any]]:
+    """Чанки файла из iter_project_files с метаданными для store_chunks/replace_file"""
+    file_path = file_info["file_path"]
+    file_type = file_info["file_type"]
+    relative_path = file_info["relative_path"]
+
+    chunks: List[Dict[str, Any]] = []
+    if file_type == "python":
+        chunks = await python_indexer.index_file(file_path)
+    elif file_type == "markdown":
+        chunks = await markdown_indexer.index_file(file_path)
+
+    doc_type = (
+        python_indexer._classify_doc_type(relative_path)
+        if file_type == "python"
+        else "documentation"
+    )
+    return [
+        {
+            "content": chunk["content"],
+            "file": relative_path,
+            "type": chunk["type"],
+            "doc_type": doc_type,
+            "symbol": chunk_symbol(chunk),
+            "route_path": chunk.get("route_path"),
+            "start_line": chunk.get("start_line", 0),
+            "end_line": chunk.get("end_line", 0),
+            "lines": chunk.get(
+                "lines",
+                f"{chunk.get('start_line', 0)}-{chunk.get('end_line', 0)}",
+            ),
+            "project": project_name,
+        }
+        for chunk in chunks
+    ]
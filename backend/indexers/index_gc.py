@@ -0,0 +1,129 @@
+"""
+Сборка мусора в индексе: удаление чанков удалённых и переименованных файлов
+и устаревших версий чанков изменённых файлов
+"""
+import logging
+import os
+from typing import Any, Dict, List
+
+from .file_chunks import file_chunks
+from .markdown_indexer import MarkdownIndexer
+from .python_indexer import PythonIndexer
+from .simple_project_indexer import SimpleProjectIndexer
+
+logger = logging.getLogger(__name__)
+
+# Типы документов, которые не привязаны к файлам проекта (QA пары, правила)
+UNTRACKED_TYPES = {"qa_pair", "rule"}
+
+
+class IndexGarbageCollector:
+    """Сравнивает текущие файлы проекта (и ID их чанков) с картой file → chunk IDs в коллекции"""
+
+    def __init__(self, rag_engine, page_size: int = 1000, delete_batch_size: int = 500):
+        self.rag_engine = rag_engine
+        self.page_size = page_size
+        self.delete_batch_size = delete_batch_size
+        self.project_indexer = SimpleProjectIndexer()
+        self.python_indexer = PythonIndexer()
+        self.markdown_indexer = MarkdownIndexer()
+
+    async def current_files(self, project: str) -> Dict[str, Dict[str, Any]]:
+        """Файлы, которые сейчас подлежат индексации: относительный путь → file_info"""
+        self.project_indexer.load_config()
+        return {
+            file_info["relative_path"]: file_info
+            async for file_info in self.project_indexer.iter_project_files(project)
+        }
+
+    async def stale_ids(self, project: str, file_info: Dict[str, Any], stored_ids: List[str]) -> List[str]:
+        """ID чанков файла, которые текущее содержимое файла уже не порождает"""
+        chunks = await file_chunks(project, file_info, self.python_indexer, self.markdown_indexer)
+        expected = set(self.rag_engine.storage.chunk_ids_for(project, chunks))
+        return [doc_id for doc_id in stored_ids if doc_id not in expected]
+
+    async def build_file_map(self, project: str) -> Dict[str, List[str]]:
+        """Карта file → chunk IDs (постранично, только метаданные)"""
+        project_path = self._project_path(project)
+        file_map: Dict[str, List[str]] = {}
+        offset = 0
+
+        while True:
+            # Через слой хранения: таймаут, повторы и circuit breaker
+            ids, metadatas = await self.rag_engine.storage.metadata_page(
+                project, limit=self.page_size, offset=offset
+            )
+            if not ids:
+                break
+            for doc_id, metadata in zip(ids, metadatas):
+                if metadata.get("type") in UNTRACKED_TYPES or not metadata.get("file"):
+                    continue
+                file_path = metadata["file"]
+                # Старые скрипты переиндексации сохраняли абсолютные пути
+                if project_path and os.path.isabs(file_path):
+                    file_path = os.path.relpath(file_path, project_path)
+                file_map.setdefault(file_path, []).append(doc_id)
+            offset += len(ids)
+
+        return file_map
+
+    async def collect(self, project: str, dry_run: bool = False) -> Dict[str, Any]:
+        """Удаление чанков файлов, которых больше нет в проекте, и устаревших чанков изменённых файлов"""
+        current = await self.current_files(project)
+        if not current:
+            # Пустой список файлов почти всегда означает несмонтированный путь проекта
+            raise ValueError(f"Для проекта {project} не найдено ни одного файла, GC отменён")
+
+        file_map = await self.build_file_map(project)
+        orphan_files = sorted(set(file_map) - set(current))
+        orphan_ids = [doc_id for file_path in orphan_files for doc_id in file_map[file_path]]
+
+        # Изменённые файлы: в индексе остались чанки, которых текущее содержимое не даёт
+        stale_files: Dict[str, int] = {}
+        stale_ids: List[str] = []
+        for file_path in sorted(set(file_map) & set(current)):
+            try:
+                file_stale = await self.stale_ids(project, current[file_path], file_map[file_path])
+            except Exception as error:
+                logger.warning("GC %s: файл %s пропущен: %s", project, file_path, error)
+                continue
+            if file_stale:
+                stale_files[file_path] = len(file_stale)
+                stale_ids.extend(file_stale)
+
+        if (orphan_ids or stale_ids) and not dry_run:
+            # Удаляем и из основной коллекции, и из разделов doc_type
+            await self.rag_engine.storage.delete_ids(
+                project, orphan_ids + stale_ids, batch_size=self.delete_batch_size
+            )
+            if orphan_files:
+                await self.rag_engine.storage.index_stats.remove_files(project, orphan_files)
+
+        logger.info(
+            "🧹 GC %s: файлов в индексе=%s, текущих=%s, сирот=%s, документов=%s, устаревших чанков=%s в %s файлах%s",
+            project,
+            len(file_map),
+            len(current),
+            len(orphan_files),
+            len(orphan_ids),
+            len(stale_ids),
+            len(stale_files),
+            " (dry run)" if dry_run else "",
+        )
+
+        return {
+            "project": project,
+            "dry_run": dry_run,
+            "indexed_files": len(file_map),
+            "current_files": len(current),
+            "orphan_files": orphan_files,
+            "stale_files": stale_files,
+            "stale_documents": len(stale_ids),
+            "reclaimed_documents": len(orphan_ids) + len(stale_ids),
+        }
+
+    def _project_path(self, project: str) -> str:
+        for proj in self.project_indexer.projects:
+            if proj["name"] == project:
+                return proj.get("path", "")
+        return ""
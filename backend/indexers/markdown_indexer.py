@@ -4,12 +4,14 @@
 import os
 import re
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 import fnmatch
 
 logger = logging.getLogger(__name__)
 
 class MarkdownIndexer:
+    _HEADER_RE = re.compile(r'^#+\s+')
+    
     def __init__(self):
         self.chunk_size = 1000  # Размер чанка в символах
         self.overlap = 200      # Перекрытие между чанками
@@ -51,106 +53,121 @@ class MarkdownIndexer:
         return False
     
     async def index_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Индексация одного Markdown файла"""
+        """Индексация одного Markdown файла (потоковое чтение по строкам)"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            chunks = []
-            
-            # Разбиение на секции по заголовкам
-            sections = self._split_by_headers(content)
-            
-            for i, section in enumerate(sections):
-                if len(section['content'].strip()) < 50:  # Пропускаем слишком короткие секции
-                    continue
-                
-                # Парсинг start_line, end_line из lines
-                lines_str = section.get('lines', '0-0')
-                try:
-                    start_line, end_line = map(int, lines_str.split('-'))
-                except:
-                    start_line, end_line = 0, 0
-                
-                # Дополнительное разбиение на чанки если секция слишком большая
-                sub_chunks = self._split_into_chunks(section['content'])
-                
-                for j, chunk_content in enumerate(sub_chunks):
-                    chunk = {
-                        "content": chunk_content,
-                        "file": file_path,
-                        "lines": lines_str,
-                        "start_line": start_line,
-                        "end_line": end_line,
-                        "type": "markdown",
-                        "section": section.get('header', ''),
-                        "chunk_id": hash(f"{file_path}_{i}_{j}")
-                    }
-                    chunks.append(chunk)
-            
-            return chunks
+                return list(self.iter_chunks(f, file_path))
             
         except Exception as e:
             logger.error(f"Ошибка индексации файла {file_path}: {e}")
             return []
     
-    def _split_by_headers(self, content: str) -> List[Dict[str, Any]]:
-        """Разбиение контента по заголовкам"""
-        sections = []
-        lines = content.split('\n')
-        current_section = {'content': '', 'header': '', 'lines': ''}
-        start_line = 1
-        
-        for i, line in enumerate(lines, 1):
-            # Проверка на заголовок
-            if re.match(r'^#+\s+', line):
-                # Сохраняем предыдущую секцию
-                if current_section['content'].strip():
-                    current_section['lines'] = f"{start_line}-{i-1}"
-                    sections.append(current_section)
-                
-                # Начинаем новую секцию
-                current_section = {
-                    'content': line + '\n',
-                    'header': line.strip(),
-                    'lines': ''
-                }
-                start_line = i
-            else:
-                current_section['content'] += line + '\n'
+    def iter_chunks(self, lines: Iterable[str], file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковое разбиение Markdown на чанки.
         
-        # Добавляем последнюю секцию
-        if current_section['content'].strip():
-            current_section['lines'] = f"{start_line}-{len(lines)}"
-            sections.append(current_section)
-        
-        return sections
-    
-    def _split_into_chunks(self, content: str) -> List[str]:
-        """Разбиение контента на чанки"""
-        if len(content) <= self.chunk_size:
-            return [content]
+        Строки копятся в списке-буфере текущей секции (без конкатенации строк),
+        чанк режется по границе абзаца, когда буфер превышает chunk_size.
+        Внутри fenced-блоков (``` / ~~~) разрез не делается, у каждого чанка
+        свой точный диапазон строк.
+        """
+        header = ''
+        section_index = 0
+        chunk_index = 0
+        # Буфер: (номер строки, текст, строка начинается внутри fenced-блока)
+        buffer: List[Tuple[int, str, bool]] = []
+        size = 0
+        fresh = False       # В буфере есть строки, ещё не попавшие в чанк
+        safe_cut = 0        # Индекс в буфере после последней пустой строки вне кода
+        fence = ''          # Маркер открытого fenced-блока
         
-        chunks = []
-        start = 0
+        def emit(entries: List[Tuple[int, str, bool]]) -> Optional[Dict[str, Any]]:
+            while entries and not entries[-1][1].strip():
+                entries = entries[:-1]
+            if not entries:
+                return None
+            content = '\n'.join(text for _, text, _ in entries)
+            if len(content.strip()) < 50:  # Пропускаем слишком короткие фрагменты
+                return None
+            start_line, end_line = entries[0][0], entries[-1][0]
+            return {
+                "content": content,
+                "file": file_path,
+                "lines": f"{start_line}-{end_line}",
+                "start_line": start_line,
+                "end_line": end_line,
+                "type": "markdown",
+                "section": header,
+                "chunk_id": hash(f"{file_path}_{section_index}_{chunk_index}")
+            }
         
-        while start < len(content):
-            end = start + self.chunk_size
+        for line_no, raw_line in enumerate(lines, 1):
+            line = raw_line.rstrip('\r\n')
+            stripped = line.lstrip()
             
-            if end >= len(content):
-                chunks.append(content[start:])
-                break
+            # Новый заголовок (вне кода) закрывает текущую секцию
+            if not fence and self._HEADER_RE.match(line):
+                chunk = emit(buffer) if fresh else None
+                if chunk:
+                    yield chunk
+                header = line.strip()
+                section_index += 1
+                chunk_index = 0
+                buffer = [(line_no, line, False)]
+                size = len(line) + 1
+                fresh = True
+                safe_cut = 0
+                continue
+            
+            buffer.append((line_no, line, bool(fence)))
+            size += len(line) + 1
+            fresh = True
+            
+            if stripped.startswith(('```', '~~~')):
+                if not fence:
+                    fence = stripped[:3]
+                elif stripped.startswith(fence):
+                    fence = ''
+                continue
+            
+            if fence:
+                continue
             
-            # Ищем ближайший конец предложения или абзаца
-            chunk_end = content.rfind('\n\n', start, end)
-            if chunk_end == -1:
-                chunk_end = content.rfind('\n', start, end)
-            if chunk_end == -1:
-                chunk_end = content.rfind('.', start, end)
-            if chunk_end == -1:
-                chunk_end = end
+            if not stripped:
+                safe_cut = len(buffer)
             
-            chunks.append(content[start:chunk_end])
-            start = chunk_end - self.overlap if chunk_end > self.overlap else chunk_end
+            if size < self.chunk_size:
+                continue
+            
+            # Режем по последней границе абзаца, иначе - по текущей строке
+            cut = safe_cut if 0 < safe_cut < len(buffer) else len(buffer)
+            emitted, rest = buffer[:cut], buffer[cut:]
+            chunk = emit(emitted)
+            if chunk:
+                yield chunk
+                chunk_index += 1
+            
+            buffer = self._overlap_tail(emitted) + rest
+            size = sum(len(text) + 1 for _, text, _ in buffer)
+            fresh = bool(rest)
+            safe_cut = 0
         
-        return chunks
+        # Последняя секция
+        if fresh:
+            chunk = emit(buffer)
+            if chunk:
+                yield chunk
+    
+    def _overlap_tail(self, entries: List[Tuple[int, str, bool]]) -> List[Tuple[int, str, bool]]:
+        """Хвост предыдущего чанка для перекрытия (не начинается внутри кода)"""
+        tail_start = len(entries)
+        tail_size = 0
+        while tail_start > 0:
+            line_size = len(entries[tail_start - 1][1]) + 1
+            if tail_size + line_size > self.overlap:
+                break
+            tail_size += line_size
+            tail_start -= 1
+        while tail_start < len(entries) and entries[tail_start][2]:
+            tail_start += 1
+        return entries[tail_start:]
@@ -10,6 +10,9 @@ import fnmatch
 
 logger = logging.getLogger(__name__)
 
+# Декораторы FastAPI/Flask/aiogram-роутеров, первым аргументом которых идёт путь
+ROUTE_DECORATORS = {'get', 'post', 'put', 'patch', 'delete', 'route', 'api_route', 'websocket'}
+
 class PythonIndexer:
     def __init__(self):
         self.chunk_size = 1000  # Размер чанка в символах
@@ -208,9 +211,21 @@ class PythonIndexer:
                 elif isinstance(node.returns, ast.Constant):
                     return_type = str(node.returns.value)
             
-            # Извлечение декораторов
+            # Извлечение декораторов (и пути роута из @router.get("/path"))
             decorators = []
+            route_path = None
             for decorator in node.decorator_list:
+                if isinstance(decorator, ast.Call):
+                    if (
+                        isinstance(decorator.func, ast.Attribute)
+                        and decorator.func.attr in ROUTE_DECORATORS
+                        and decorator.args
+                        and isinstance(decorator.args[0], ast.Constant)
+                        and isinstance(decorator.args[0].value, str)
+                    ):
+                        route_path = route_path or decorator.args[0].value
+                    # Как и раньше, в текст чанка вызовы-декораторы не попадают: текст входит в стабильный ID
+                    continue
                 if isinstance(decorator, ast.Name):
                     decorators.append(decorator.id)
                 elif isinstance(decorator, ast.Attribute):
@@ -249,6 +264,7 @@ Return type: {return_type}{decorators_text}{calls_text}
                 "param_types": param_types,
                 "return_type": return_type,
                 "decorators": decorators,
+                "route_path": route_path,
                 "calls_functions": called_functions,
                 "chunk_id": hash(f"{file_path}_{node.name}")
             }
@@ -0,0 +1,100 @@
+"""
+Кэш ответов LLM по отпечатку (модель, нормализованный промпт, опции генерации)
+
+Промпты из одного и того же top-k контекста часто повторяются, а генерация
+на CPU занимает десятки секунд. Ответ хранится в Redis с TTL; версия индекса
+проекта входит в ключ, поэтому после переиндексации старые ответы не читаются
+(и истекают сами). Закреплённые канонические ответы хранятся отдельно,
+без TTL, и отдаются по нормализованному вопросу.
+
+Ключи:
+    llm:cache:{project}:{version}:{sha256}  STRING  ответ модели (TTL LLM_CACHE_TTL_SEC)
+    llm:pinned:{project}                    HASH    нормализованный вопрос -> {"question", "answer"}
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from ..storage.index_stats import IndexStats
+from ..storage.qa_store import normalize_question
+from ..storage.redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", "86400"))
+
+
+def prompt_fingerprint(model: str, prompt: str, options: Dict[str, Any]) -> str:
+    """Пробелы и переносы строк не влияют на отпечаток."""
+    payload = json.dumps(
+        {"model": model, "prompt": " ".join(prompt.split()), "options": options},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache(RedisStore):
+    """Ответы LLM в Redis; ошибки Redis не мешают генерации."""
+
+    key_prefix = "llm"
+    unavailable_message = "Кэш ответов LLM в Redis недоступен"
+
+    def __init__(self, client: Optional[redis.Redis] = None) -> None:
+        super().__init__(client)
+        self.index_stats = IndexStats(client)
+
+    async def get(self, project: str, fingerprint: str) -> Optional[str]:
+        if not LLM_CACHE_ENABLED:
+            return None
+        key = await self._key(project, fingerprint)
+        if key is None:
+            return None
+        value = await self._safe(self.client.get, key)
+        if value is not None:
+            logger.info("⚡ Ответ LLM из кэша (%s)", project)
+            return value.decode()
+        return None
+
+    async def put(self, project: str, fingerprint: str, answer: str) -> None:
+        if not LLM_CACHE_ENABLED or not answer:
+            return
+        key = await self._key(project, fingerprint)
+        if key is not None:
+            await self._safe(self.client.set, key, answer, ex=LLM_CACHE_TTL_SEC)
+
+    async def get_pinned(self, project: str, question: str) -> Optional[Dict[str, Any]]:
+        raw = await self._safe(self.client.hget, f"llm:pinned:{project}", normalize_question(question))
+        return json.loads(raw) if raw else None
+
+    async def pin(self, project: str, question: str, answer: str) -> None:
+        entry = json.dumps({"question": question, "answer": answer}, ensure_ascii=False)
+        await self._safe(self.client.hset, f"llm:pinned:{project}", normalize_question(question), entry)
+
+    async def unpin(self, project: str, question: str) -> bool:
+        return bool(await self._safe(self.client.hdel, f"llm:pinned:{project}", normalize_question(question)))
+
+    async def list_pinned(self, project: str) -> List[Dict[str, Any]]:
+        raw = await self._safe(self.client.hgetall, f"llm:pinned:{project}") or {}
+        return [json.loads(value) for value in raw.values()]
+
+    async def _key(self, project: str, fingerprint: str) -> Optional[str]:
+        version = await self.index_stats.get_version(project)
+        if version is None:
+            return None
+        return f"llm:cache:{project}:{version}:{fingerprint}"
+
+
+_completion_cache: Optional[CompletionCache] = None
+
+
+def get_completion_cache() -> CompletionCache:
+    global _completion_cache
+    if _completion_cache is None:
+        _completion_cache = CompletionCache()
+    return _completion_cache
@@ -1,39 +1,188 @@
 """
 Ollama клиент для работы с локальной LLM
+
+Один httpx.AsyncClient на процесс (пул соединений с keep-alive), модель
+держится в памяти Ollama (keep_alive) и прогревается при старте API.
 """
+import asyncio
 import logging
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import json
 import os
 
+from .completion_cache import get_completion_cache, prompt_fingerprint
+from .prompt_packer import PROMPT_CONTEXT_TOKENS, pack_context
+from .scheduler import INTERACTIVE, LLM_OVERLOAD_POLICY, LLMOverloadedError, get_scheduler
+
 logger = logging.getLogger(__name__)
 
+# direct - ответ берётся из лучшего документа контекста, llm - генерация через Ollama
+LLM_MODE = os.getenv("LLM_MODE", "direct")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:14b-instruct")
+OLLAMA_TIMEOUT_SEC = float(os.getenv("OLLAMA_TIMEOUT_SEC", "120"))
+# Сколько Ollama держит модель в памяти после запроса (формат Ollama: "30m", "-1" - всегда)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Прогрев модели при старте API (по умолчанию - только в режиме llm)
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true" if LLM_MODE == "llm" else "false").lower() == "true"
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+# Окно контекста: промпт + ответ, округляется вверх до OLLAMA_CTX_STEP (меньше пересоздания KV кэша)
+OLLAMA_MAX_CTX = int(os.getenv("OLLAMA_MAX_CTX", "8192"))
+OLLAMA_CTX_STEP = 1024
+# Системный промпт, метки контекста и вопрос - сверх бюджета контекста
+PROMPT_OVERHEAD_TOKENS = 1024
+# max_tokens ответа по умолчанию (прогрев использует те же опции, что и запросы)
+DEFAULT_MAX_TOKENS = 1000
+
+_http_client: Optional[httpx.AsyncClient] = None
+_ollama_client: Optional["OllamaClient"] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Общий HTTP клиент к Ollama: соединения переиспользуются между запросами"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OLLAMA_TIMEOUT_SEC, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+                keepalive_expiry=300
+            )
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_ollama_client() -> "OllamaClient":
+    """Клиент Ollama на процесс"""
+    global _ollama_client
+    if _ollama_client is None:
+        _ollama_client = OllamaClient()
+    return _ollama_client
+
+
+def generation_options(max_tokens: int) -> Dict[str, Any]:
+    """
+    num_predict - бюджет ответа, num_ctx - по бюджету промпта, а не максимальное окно модели
+
+    num_ctx не зависит от конкретного промпта: смена num_ctx заставляет Ollama
+    перезагрузить модель и теряет KV кэш общего префикса (системного промпта).
+    """
+    needed = PROMPT_OVERHEAD_TOKENS + PROMPT_CONTEXT_TOKENS + max_tokens
+    num_ctx = min(OLLAMA_MAX_CTX, -(-needed // OLLAMA_CTX_STEP) * OLLAMA_CTX_STEP)
+    return {"num_ctx": num_ctx, "num_predict": max_tokens}
+
+
 class OllamaClient:
     def __init__(self, base_url: str = None):
         # Читаем URL из переменной окружения или используем значение по умолчанию
         self.base_url = base_url or os.getenv("OLLAMA_HOST", "http://localhost:11434")
-        self.model = "qwen2.5:14b-instruct"  # Qwen 2.5 14B - баланс скорости и качества (8.9GB)
+        self.model = OLLAMA_MODEL  # Qwen 2.5 14B - баланс скорости и качества (8.9GB)
         self.fallback_model = "codellama:13b-instruct"  # Fallback модель (7.4GB)
+        self._system_prompts: Dict[str, str] = {}
         logger.info(f"OllamaClient инициализирован с base_url: {self.base_url}")
         
     async def initialize(self):
         """Инициализация клиента (пропускаем проверку)"""
         logger.info(f"Ollama клиент инициализирован с URL: {self.base_url}")
-        logger.info(f"Модель: {self.model}, Fallback: {self.fallback_model}")
+        logger.info(f"Модель: {self.model}, Fallback: {self.fallback_model}, режим: {LLM_MODE}")
+    
+    async def warm_up(self, projects: Optional[List[str]] = None) -> bool:
+        """
+        Загрузка модели в память Ollama с теми же опциями, что у запросов, и прогрев
+        KV кэша системных промптов проектов (при OLLAMA_NUM_PARALLEL > 1 у каждого свой слот)
+        """
+        options = generation_options(DEFAULT_MAX_TOKENS)
+        try:
+            response = await get_http_client().post(
+                f"{self.base_url}/api/generate",
+                json={"model": self.model, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE, "options": options}
+            )
+            response.raise_for_status()
+            logger.info(f"🔥 Модель {self.model} загружена в Ollama (keep_alive={OLLAMA_KEEP_ALIVE})")
+            for project in projects or []:
+                response = await get_http_client().post(
+                    f"{self.base_url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "system": self._system_prompt(project),
+                        "prompt": ".",
+                        "stream": False,
+                        "keep_alive": OLLAMA_KEEP_ALIVE,
+                        "options": {**options, "num_predict": 1}
+                    }
+                )
+                response.raise_for_status()
+                logger.info(f"🔥 Системный промпт {project} прогрет")
+            return True
+        except Exception as e:
+            logger.warning(f"Прогрев модели {self.model} не удался: {e}")
+            return False
     
     async def generate_response(
         self,
         query: str,
         context: List[Dict[str, Any]],
         max_tokens: int = 1000,
-        project_name: str = "staffprobot"
+        project_name: str = "staffprobot",
+        priority: int = INTERACTIVE
     ) -> str:
         """
         Генерация ответа на основе запроса и контекста
         
-        РЕЖИМ: Прямой возврат из контекста БЕЗ LLM (100% точность)
+        LLM_MODE=llm - генерация через Ollama (через планировщик генераций), иначе
+        (и при ошибке Ollama) DIRECT MODE: прямой возврат из контекста БЕЗ LLM (100% точность).
+        При перегрузке - LLMOverloadedError или DIRECT MODE (LLM_OVERLOAD_POLICY=direct).
         """
+        if LLM_MODE == "llm" and context:
+            try:
+                system = self._system_prompt(project_name)
+                # Упаковка контекста считает токены токенизатором - CPU работа, не в event loop
+                prompt = await asyncio.to_thread(self._build_prompt, query, context, project_name)
+                options = generation_options(max_tokens)
+                # Тот же промпт с теми же опциями - ответ из кэша, без очереди к Ollama
+                cache = get_completion_cache()
+                fingerprint = prompt_fingerprint(self.model, f"{system}\n{prompt}", options)
+                cached = await cache.get(project_name, fingerprint)
+                if cached is not None:
+                    return cached
+                async with get_scheduler().slot(priority):
+                    answer = await self._generate(system, prompt, options)
+                await cache.put(project_name, fingerprint, answer)
+                return answer
+            except LLMOverloadedError:
+                if LLM_OVERLOAD_POLICY != "direct":
+                    raise
+                logger.warning("LLM перегружена, ответ в DIRECT MODE")
+            except Exception as e:
+                logger.warning(f"Генерация через Ollama не удалась, DIRECT MODE: {e}")
+        
+        return self._direct_answer(context)
+    
+    async def _generate(self, system: str, prompt: str, options: Dict[str, Any]) -> str:
+        response = await get_http_client().post(
+            f"{self.base_url}/api/generate",
+            json={
+                "model": self.model,
+                "system": system,
+                "prompt": prompt,
+                "stream": False,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "options": options
+            }
+        )
+        response.raise_for_status()
+        return response.json().get("response", "").strip()
+    
+    def _direct_answer(self, context: List[Dict[str, Any]]) -> str:
+        """DIRECT MODE: лучший документ контекста (для QA пары - её ответ)"""
         logger.info(f"🎯 DIRECT MODE: возврат лучшего результата из {len(context)} документов")
         
         if not context:
@@ -57,14 +206,72 @@ class OllamaClient:
         logger.info(f"✅ Возвращаем документ ({len(content)} симв.)")
         return content
     
-    def _build_prompt(self, query: str, context: List[Dict[str, Any]], project_name: str = "staffprobot") -> str:
-        """Построение промпта для LLM с учётом типов документов"""
+    async def stream_response(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        max_tokens: int = 1000,
+        project_name: str = "staffprobot",
+        priority: int = INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """
+        Ответ по частям: в режиме llm - токены /api/generate по мере генерации,
+        в DIRECT MODE - готовый ответ одним куском
+        """
+        if LLM_MODE != "llm" or not context:
+            yield await self.generate_response(query, context, max_tokens, project_name, priority)
+            return
         
-        # Определяем типы документов в контексте
-        doc_types = {}
-        for doc in context:
-            doc_type = doc.get('doc_type', 'other')
-            doc_types.setdefault(doc_type, []).append(doc)
+        system = self._system_prompt(project_name)
+        prompt = await asyncio.to_thread(self._build_prompt, query, context, project_name)
+        options = generation_options(max_tokens)
+        cache = get_completion_cache()
+        fingerprint = prompt_fingerprint(self.model, f"{system}\n{prompt}", options)
+        cached = await cache.get(project_name, fingerprint)
+        if cached is not None:
+            yield cached
+            return
+        
+        payload = {
+            "model": self.model,
+            "system": system,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": options
+        }
+        parts: List[str] = []
+        try:
+            async with get_scheduler().slot(priority):
+                async with get_http_client().stream("POST", f"{self.base_url}/api/generate", json=payload) as response:
+                    response.raise_for_status()
+                    # Ollama отдаёт NDJSON: {"response": "<токен>", "done": false}
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if data.get("response"):
+                            parts.append(data["response"])
+                            yield data["response"]
+                        if data.get("done"):
+                            # В кэш - только полностью сгенерированный ответ
+                            await cache.put(project_name, fingerprint, "".join(parts).strip())
+                            break
+        except LLMOverloadedError:
+            if LLM_OVERLOAD_POLICY != "direct":
+                raise
+            logger.warning("LLM перегружена, ответ в DIRECT MODE")
+            yield self._direct_answer(context)
+    
+    def _system_prompt(self, project_name: str) -> str:
+        """
+        Системный промпт проекта - неизменный префикс каждого запроса
+        
+        Идёт первым и не зависит от вопроса, поэтому Ollama переиспользует
+        его KV кэш между запросами вместо повторной обработки.
+        """
+        if project_name in self._system_prompts:
+            return self._system_prompts[project_name]
         
         # Описания проектов
         project_descriptions = {
@@ -100,42 +307,36 @@ class OllamaClient:
 
 Контекст из кодовой базы проекта {project_name} (упорядочен по важности):"""
 
-        # Добавление контекста с приоритизацией
+        self._system_prompts[project_name] = system_prompt
+        return system_prompt
+    
+    def _build_prompt(self, query: str, context: List[Dict[str, Any]], project_name: str = "staffprobot") -> str:
+        """Переменная часть промпта: контекст и вопрос (после системного промпта)"""
+        
+        # Контекст: склеенные фрагменты по убыванию score в пределах бюджета токенов
         context_text = ""
-        context_order = ['documentation', 'route', 'handler', 'api', 'service', 'form', 'model', 'schema', 'other']
-        
-        context_num = 1
-        for doc_type in context_order:
-            if doc_type in doc_types:
-                for doc in doc_types[doc_type]:
-                    # Метка типа документа для лучшего понимания
-                    type_label = {
-                        'route': '🔗 РОУТ (API endpoint)',
-                        'handler': '⚡ ХЕНДЛЕР (обработчик)',
-                        'api': '📡 API',
-                        'service': '🔧 СЕРВИС (бизнес-логика)',
-                        'form': '📝 ФОРМА',
-                        'model': '🗄️ МОДЕЛЬ БД',
-                        'schema': '📋 СХЕМА',
-                        'other': '📄 ДОКУМЕНТАЦИЯ'
-                    }.get(doc_type, '📄')
-                    
-                    file_info = f"{type_label}\nФайл: {doc.get('file', 'неизвестно')}"
-                    if doc.get('lines'):
-                        file_info += f"\nСтроки: {doc['lines']}"
-                    
-                    # Обрезаем слишком длинный контент
-                    content = doc.get('content', '')
-                    if len(content) > 800:
-                        content = content[:800] + "\n... (контент обрезан)"
-                    
-                    context_text += f"\n\n--- Контекст {context_num} ---\n{file_info}\n\n{content}"
-                    context_num += 1
-        
-        # Формирование полного промпта
-        full_prompt = f"""{system_prompt}
-
-{context_text}
+        type_labels = {
+            'route': '🔗 РОУТ (API endpoint)',
+            'handler': '⚡ ХЕНДЛЕР (обработчик)',
+            'api': '📡 API',
+            'service': '🔧 СЕРВИС (бизнес-логика)',
+            'form': '📝 ФОРМА',
+            'model': '🗄️ МОДЕЛЬ БД',
+            'schema': '📋 СХЕМА',
+            'other': '📄 ДОКУМЕНТАЦИЯ'
+        }
+        
+        for context_num, doc in enumerate(pack_context(context), start=1):
+            # Метка типа документа для лучшего понимания
+            type_label = type_labels.get(doc.get('doc_type', 'other'), '📄')
+            file_info = f"{type_label}\nФайл: {doc.get('file', 'неизвестно')}"
+            if doc.get('lines'):
+                file_info += f"\nСтроки: {doc['lines']}"
+            
+            context_text += f"\n\n--- Контекст {context_num} ---\n{file_info}\n\n{doc.get('content', '')}"
+        
+        # Формирование промпта: контекст, затем вопрос
+        full_prompt = f"""{context_text.lstrip()}
 
 Вопрос пользователя: {query}
 
@@ -146,8 +347,7 @@ class OllamaClient:
     async def test_connection(self) -> bool:
         """Тестирование подключения к Ollama"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
-        except:
+            response = await get_http_client().get(f"{self.base_url}/api/tags")
+            return response.status_code == 200
+        except httpx.HTTPError:
             return False
@@ -0,0 +1,100 @@
+"""
+Упаковка контекста в промпт по бюджету токенов
+
+Чанки одного файла с пересекающимися или соседними диапазонами строк
+склеиваются в один фрагмент (без повторов строк), фрагменты упорядочиваются
+(оценённые cross-encoder - по rerank_score и первыми, остальные - по score)
+и жадно укладываются в бюджет, измеренный токенизатором модели.
+"""
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "3000"))
+# Фрагмент, не влезающий целиком, обрезается, если остаток бюджета не меньше этого
+PACK_MIN_SPAN_TOKENS = 128
+
+_LINES_RE = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
+
+
+def _line_range(doc: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    if isinstance(doc.get("start_line"), int) and isinstance(doc.get("end_line"), int):
+        return doc["start_line"], doc["end_line"]
+    match = _LINES_RE.match(str(doc.get("lines") or ""))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _stitch(span: Dict[str, Any], doc: Dict[str, Any], start: int, end: int) -> None:
+    """Дописываем к фрагменту строки чанка, которых в нём ещё нет."""
+    doc_lines = doc.get("content", "").splitlines()
+    span_end = span["end"]
+    if end <= span_end:
+        return
+    if len(doc_lines) == end - start + 1:
+        new_lines = doc_lines[max(0, span_end - start + 1):]
+        span["content"] = span["content"].rstrip("\n") + "\n" + "\n".join(new_lines)
+    else:
+        # Текст чанка не соответствует диапазону строк (префиксы, обрезка) - склеиваем целиком
+        span["content"] = span["content"].rstrip("\n") + "\n...\n" + doc.get("content", "")
+    span["end"] = end
+
+
+def merge_spans(context: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Склейка пересекающихся и соседних чанков одного файла; score фрагмента - лучший из чанков."""
+    spans: List[Dict[str, Any]] = []
+    by_file: Dict[Tuple[str, str, str], List[Tuple[int, int, Dict[str, Any]]]] = {}
+    for doc in context:
+        line_range = _line_range(doc)
+        if not doc.get("file") or line_range is None:
+            spans.append({**doc, "score": doc.get("score", 0.0)})
+            continue
+        key = (doc.get("project", ""), doc.get("source", ""), doc["file"])
+        by_file.setdefault(key, []).append((line_range[0], line_range[1], doc))
+
+    for chunks in by_file.values():
+        chunks.sort(key=lambda item: (item[0], -item[1]))
+        span: Optional[Dict[str, Any]] = None
+        for start, end, doc in chunks:
+            if span is not None and start <= span["end"] + 1:
+                _stitch(span, doc, start, end)
+                if doc.get("score", 0.0) > span["score"]:
+                    span.update(score=doc.get("score", 0.0), doc_type=doc.get("doc_type", span.get("doc_type")))
+                if "rerank_score" in doc and doc["rerank_score"] > span.get("rerank_score", float("-inf")):
+                    span["rerank_score"] = doc["rerank_score"]
+                continue
+            span = {**doc, "start": start, "end": end, "score": doc.get("score", 0.0)}
+            spans.append(span)
+
+    for span in spans:
+        if "start" in span:
+            span["lines"] = f"{span['start']}-{span['end']}"
+    return spans
+
+
+def _rank_key(span: Dict[str, Any]) -> Tuple[int, float]:
+    # rerank_score и score в разных шкалах: сравниваем только внутри своей группы
+    if "rerank_score" in span:
+        return 1, span["rerank_score"]
+    return 0, span["score"]
+
+
+def pack_context(context: List[Dict[str, Any]], budget: int = PROMPT_CONTEXT_TOKENS) -> List[Dict[str, Any]]:
+    """Фрагменты по убыванию оценки, пока суммарно укладываются в budget токенов."""
+    spans = sorted(merge_spans(context), key=_rank_key, reverse=True)
+    packed, used = [], 0
+    for span in spans:
+        tokens = count_tokens(span.get("content", ""))
+        if used + tokens <= budget:
+            packed.append(span)
+            used += tokens
+        elif budget - used >= PACK_MIN_SPAN_TOKENS:
+            content = truncate_to_tokens(span.get("content", ""), budget - used)
+            packed.append({**span, "content": content + "\n... (контент обрезан)", "truncated": True})
+            used = budget
+    logger.info(f"📦 Контекст: {len(context)} чанков → {len(spans)} фрагментов, в промпт {len(packed)} ({used} токенов)")
+    return packed
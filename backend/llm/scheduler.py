@@ -0,0 +1,112 @@
+"""
+Допуск генераций к Ollama: ограничение параллельности, приоритеты и сброс нагрузки
+
+Локальная Ollama тянет лишь несколько генераций одновременно. Планировщик
+держит не больше LLM_CONCURRENCY активных генераций; остальные ждут в очереди
+по приоритету (чат раньше пакетной генерации документации) не дольше своего
+дедлайна. Переполненная очередь или истёкший дедлайн - LLMOverloadedError
+с оценкой Retry-After.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "2"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+# Сколько запрос может ждать в очереди до отказа
+LLM_QUEUE_DEADLINE_SEC = float(os.getenv("LLM_QUEUE_DEADLINE_SEC", "15"))
+LLM_BATCH_QUEUE_DEADLINE_SEC = float(os.getenv("LLM_BATCH_QUEUE_DEADLINE_SEC", "300"))
+# reject - 503 с Retry-After, direct - ответ в DIRECT MODE без LLM
+LLM_OVERLOAD_POLICY = os.getenv("LLM_OVERLOAD_POLICY", "reject")
+
+# Приоритеты: меньше - раньше
+INTERACTIVE = 0
+BATCH = 10
+
+
+class LLMOverloadedError(Exception):
+    """Генерация не допущена: очередь переполнена или дедлайн ожидания истёк."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GenerationScheduler:
+    """Семафор с приоритетной очередью ожидания и ограничением её длины."""
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE) -> None:
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        # Скользящее среднее длительности генерации - для оценки Retry-After
+        self._avg_duration = 10.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self) -> float:
+        waves = (self.queued + self.active) / max(self.concurrency, 1)
+        return max(1.0, waves * self._avg_duration)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        if deadline is None:
+            deadline = LLM_QUEUE_DEADLINE_SEC if priority <= INTERACTIVE else LLM_BATCH_QUEUE_DEADLINE_SEC
+        await self._acquire(priority, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    async def _acquire(self, priority: int, deadline: float) -> None:
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            logger.warning("⛔ Очередь генераций переполнена (%s ждут, %s активны)", self.queued, self.active)
+            raise LLMOverloadedError("Очередь генераций переполнена", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            # Слот передаётся ожидающему в _release (active не уменьшается)
+            await asyncio.wait_for(future, timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning("⛔ Дедлайн ожидания генерации истёк (%.1f с, приоритет %s)", deadline, priority)
+            raise LLMOverloadedError("Истёк дедлайн ожидания в очереди генераций", self.retry_after())
+        except asyncio.CancelledError:
+            # Клиент ушёл, когда слот уже был передан - возвращаем его следующему
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+_scheduler: Optional[GenerationScheduler] = None
+
+
+def get_scheduler() -> GenerationScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = GenerationScheduler()
+    return _scheduler
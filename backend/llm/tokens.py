@@ -0,0 +1,66 @@
+"""
+Подсчёт токенов токенизатором LLM (для бюджетов контекста вместо "4 символа = 1 токен")
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# HF токенизатор модели, которой отдаётся контекст (qwen2.5 в Ollama)
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "Qwen/Qwen2.5-14B-Instruct")
+# Локальная копия файлов токенизатора (scripts/download_tokenizer.py); загрузка без сети,
+# при отсутствии каталога - только из локального кэша HF
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "data/tokenizer")
+
+_tokenizer = None
+_tokenizer_failed = False
+_tokenizer_lock = threading.Lock()
+
+
+def tokenizer_source() -> str:
+    return TOKENIZER_PATH if os.path.isdir(TOKENIZER_PATH) else TOKENIZER_NAME
+
+
+def get_tokenizer():
+    """Ленивая загрузка токенизатора из локальных файлов; None, если его нет."""
+    global _tokenizer, _tokenizer_failed
+    if _tokenizer is None and not _tokenizer_failed:
+        with _tokenizer_lock:
+            if _tokenizer is None and not _tokenizer_failed:
+                source = tokenizer_source()
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=True)
+                    logger.info("Токенизатор загружен из %s", source)
+                except Exception as error:
+                    _tokenizer_failed = True
+                    logger.warning(
+                        "Токенизатор %s недоступен локально (%s): токены считаются как len(text)//4, "
+                        "бюджеты контекста приблизительные. Скачайте его в %s: "
+                        "python scripts/download_tokenizer.py",
+                        source, error, TOKENIZER_PATH,
+                    )
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Начало текста не длиннее max_tokens токенов."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[: max_tokens * 4]
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) <= max_tokens:
+        return text
+    return tokenizer.decode(ids[:max_tokens])
@@ -0,0 +1,261 @@
+"""
+Контекстные правила для редактора: скомпилированный набор из rules_path проекта
+
+Файл правил (например doc/conventions.mdc или каталог .mdc файлов) разбирается
+один раз: каждая секция становится правилом с ролями, модулями и glob-паттернами
+путей, а её размер считается токенизатором LLM. Ответы кэшируются по признакам
+(паттерн файла, роль, модуль) и сбрасываются при изменении файла правил -
+горячий путь /api/context-rules не трогает ни ChromaDB, ни модель эмбеддингов.
+"""
+import asyncio
+import fnmatch
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import yaml
+
+from ..llm.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+RULES_TOKEN_BUDGET = int(os.getenv("RULES_TOKEN_BUDGET", "1500"))
+# Как часто проверяется mtime файла правил
+RULES_CHECK_SEC = float(os.getenv("RULES_CHECK_SEC", "2"))
+RULES_CACHE_SIZE = 512
+
+# Признаки роли и модуля в пути файла и в тексте секции
+ROLE_KEYWORDS = {
+    "owner": ("owner", "владел"),
+    "manager": ("manager", "управляющ"),
+    "employee": ("employee", "сотрудник"),
+    "admin": ("admin", "администратор"),
+    "moderator": ("moderator", "модератор"),
+}
+MODULE_KEYWORDS = {
+    "web_routes": ("routes", "роут"),
+    "bot_handlers": ("handlers", "telegram", "бот"),
+    "database": ("database", "models", "sqlalchemy", "миграц", "бд"),
+    "templates": ("templates", "jinja", "шаблон"),
+    "services": ("services", "сервис"),
+    "domain_entities": ("domain", "entities", "сущност"),
+    "api": ("api",),
+    "scheduler": ("scheduler", "celery", "планировщик"),
+}
+
+_FRONTMATTER_RE = re.compile(r"\A---\s*\n(.*?)\n---\s*\n", re.DOTALL)
+_HEADER_RE = re.compile(r"^(#{1,4})\s+(.+?)\s*$")
+# Пути в заголовке секции: `apps/web/routes/**`
+_PATH_RE = re.compile(r"`([^`\s]*[/*][^`\s]*)`")
+
+
+@dataclass
+class Rule:
+    title: str
+    text: str
+    tokens: int
+    roles: FrozenSet[str] = frozenset()
+    modules: FrozenSet[str] = frozenset()
+    globs: Tuple[str, ...] = ()
+    patterns: Tuple[re.Pattern, ...] = field(default=(), repr=False)
+
+    def matches_file(self, file_path: str) -> bool:
+        return any(pattern.match(file_path) for pattern in self.patterns)
+
+
+def _keywords(text: str, table: Dict[str, Tuple[str, ...]]) -> FrozenSet[str]:
+    text = text.lower()
+    return frozenset(name for name, words in table.items() if any(word in text for word in words))
+
+
+def _compile_globs(globs: Tuple[str, ...]) -> Tuple[re.Pattern, ...]:
+    # Путь от редактора может быть абсолютным: паттерн совпадает и с любым префиксом каталога
+    patterns = []
+    for glob in globs:
+        glob = glob[3:] if glob.startswith("**/") else glob.lstrip("/")
+        patterns.append(re.compile(fnmatch.translate(glob)))
+        patterns.append(re.compile(fnmatch.translate(f"*/{glob}")))
+    return tuple(patterns)
+
+
+def parse_rules(content: str) -> List[Rule]:
+    """Секции markdown/.mdc → правила; globs из frontmatter относятся ко всем секциям файла."""
+    globs: Tuple[str, ...] = ()
+    match = _FRONTMATTER_RE.match(content)
+    if match:
+        try:
+            meta = yaml.safe_load(match.group(1)) or {}
+        except yaml.YAMLError:
+            meta = {}
+        raw = meta.get("globs") or ()
+        if isinstance(raw, str):
+            raw = raw.split(",")
+        globs = tuple(glob.strip() for glob in raw if glob and glob.strip())
+        content = content[match.end():]
+
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in content.splitlines():
+        header = _HEADER_RE.match(line)
+        # Заголовок первого уровня - название файла, а не правило
+        if header and len(header.group(1)) > 1:
+            sections.append((header.group(2), [line]))
+        else:
+            sections[-1][1].append(line)
+
+    rules = []
+    for title, lines in sections:
+        text = "\n".join(lines).strip()
+        if not text or text.startswith("# ") and "\n" not in text:
+            continue
+        section_globs = globs + tuple(_PATH_RE.findall(title))
+        # Роль и модуль по заголовку; по тексту - только если заголовок ничего не сказал
+        roles = _keywords(title, ROLE_KEYWORDS) or _keywords(text, ROLE_KEYWORDS)
+        modules = _keywords(title, MODULE_KEYWORDS) or _keywords(text, MODULE_KEYWORDS)
+        rules.append(Rule(
+            title=title,
+            text=text,
+            tokens=count_tokens(text),
+            roles=roles,
+            modules=modules,
+            globs=section_globs,
+            patterns=_compile_globs(section_globs),
+        ))
+    return rules
+
+
+class RuleBook:
+    """Скомпилированные правила проекта и кэш готовых наборов."""
+
+    def __init__(self, rules: List[Rule], signature: Tuple) -> None:
+        self.rules = rules
+        self.signature = signature
+        self.checked_at = time.monotonic()
+        self._cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+
+    def select(self, file_path: str, role: str, module: str, budget: int) -> Dict[str, Any]:
+        file_path = file_path.replace("\\", "/")
+        file_roles = _keywords(file_path, ROLE_KEYWORDS) if file_path else frozenset()
+        file_modules = _keywords(file_path, MODULE_KEYWORDS) if file_path else frozenset()
+        glob_hits = frozenset(
+            index for index, rule in enumerate(self.rules) if rule.patterns and rule.matches_file(file_path)
+        ) if file_path else frozenset()
+
+        roles = file_roles | ({role.lower()} if role else frozenset())
+        modules = file_modules | ({module.lower()} if module else frozenset())
+        # Паттерн файла = то, что из пути влияет на выбор правил
+        key = (roles, modules, glob_hits, budget)
+        bundle = self._cache.get(key)
+        if bundle is not None:
+            self._cache.move_to_end(key)
+            return bundle
+
+        bundle = self._build(roles, modules, glob_hits, budget)
+        self._cache[key] = bundle
+        if len(self._cache) > RULES_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return bundle
+
+    def _build(
+        self, roles: FrozenSet[str], modules: FrozenSet[str], glob_hits: FrozenSet[int], budget: int
+    ) -> Dict[str, Any]:
+        if not (roles or modules or glob_hits):
+            return {"rules": [], "tokens": 0}
+
+        scored = []
+        for index, rule in enumerate(self.rules):
+            # Правило для другой роли не подходит, даже если совпал модуль
+            if roles and rule.roles and not rule.roles & roles:
+                continue
+            score = 3 * (index in glob_hits) + 2 * len(rule.roles & roles) + 2 * len(rule.modules & modules)
+            if score == 0 and (rule.roles or rule.modules or rule.patterns):
+                continue
+            # Общие правила без признаков - в конце, если останется бюджет
+            scored.append((-score, index, rule))
+        scored.sort(key=lambda item: item[:2])
+
+        selected, tokens = [], 0
+        for _, _, rule in scored:
+            if tokens + rule.tokens > budget:
+                continue
+            selected.append(rule.text)
+            tokens += rule.tokens
+        return {"rules": selected, "tokens": tokens}
+
+
+class ContextRules:
+    """Наборы правил по проектам из config/projects.yaml (rules_path)."""
+
+    def __init__(self, config_path: str = "config/projects.yaml") -> None:
+        self.config_path = config_path
+        self._books: Dict[str, RuleBook] = {}
+        self._lock = asyncio.Lock()
+
+    async def get_rules(
+        self, project: str, file_path: str = "", role: str = "", module: str = "",
+        budget: int = RULES_TOKEN_BUDGET,
+    ) -> Dict[str, Any]:
+        book = await self._get_book(project)
+        if book is None:
+            return {"rules": [], "tokens": 0}
+        return book.select(file_path, role, module, budget)
+
+    async def _get_book(self, project: str) -> Optional[RuleBook]:
+        book = self._books.get(project)
+        if book and time.monotonic() - book.checked_at < RULES_CHECK_SEC:
+            return book
+
+        async with self._lock:
+            files = await asyncio.to_thread(self._rules_files, project)
+            signature = await asyncio.to_thread(self._signature, files)
+            book = self._books.get(project)
+            if book and book.signature == signature:
+                book.checked_at = time.monotonic()
+                return book
+            if not files:
+                self._books.pop(project, None)
+                return None
+            rules = await asyncio.to_thread(self._compile, files)
+            book = RuleBook(rules, signature)
+            self._books[project] = book
+            logger.info("📋 Правила %s скомпилированы: %s правил из %s файлов", project, len(rules), len(files))
+            return book
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _rules_files(self, project: str) -> List[str]:
+        if not os.path.exists(self.config_path):
+            return []
+        with open(self.config_path, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file) or {}
+        for item in config.get("projects", []):
+            if item.get("name") == project and item.get("rules_path"):
+                path = os.path.join(item.get("path", ""), item["rules_path"])
+                if os.path.isdir(path):
+                    return sorted(
+                        os.path.join(path, name) for name in os.listdir(path) if name.endswith((".mdc", ".md"))
+                    )
+                return [path] if os.path.isfile(path) else []
+        return []
+
+    @staticmethod
+    def _signature(files: List[str]) -> Tuple:
+        signature = []
+        for path in files:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    @staticmethod
+    def _compile(files: List[str]) -> List[Rule]:
+        rules: List[Rule] = []
+        for path in files:
+            with open(path, "r", encoding="utf-8") as file:
+                rules.extend(parse_rules(file.read()))
+        return rules
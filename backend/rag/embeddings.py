@@ -0,0 +1,57 @@
+"""
+Общий бэкенд эмбеддингов: одна модель SentenceTransformer на процесс
+"""
+import asyncio
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Размерность векторов модели (all-MiniLM-L6-v2 = 384), нужна без загрузки модели
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+_model: Optional[SentenceTransformer] = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model() -> SentenceTransformer:
+    """Ленивая загрузка модели (потокобезопасно, один раз на процесс)"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                logger.info("Загрузка модели эмбеддингов %s...", EMBEDDING_MODEL_NAME)
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _model
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    if not texts:
+        return []
+    return get_embedding_model().encode(texts, batch_size=EMBEDDING_BATCH_SIZE).tolist()
+
+
+@lru_cache(maxsize=1024)
+def _embed_query_cached(text: str) -> tuple:
+    return tuple(get_embedding_model().encode(text).tolist())
+
+
+def embed_query(text: str) -> List[float]:
+    # Один запрос кодируется несколькими этапами (QA хранилище, поиск контекста)
+    return list(_embed_query_cached(text))
+
+
+async def aembed_texts(texts: List[str]) -> List[List[float]]:
+    """Батчевое кодирование вне event loop"""
+    return await asyncio.to_thread(embed_texts, texts)
+
+
+async def aembed_query(text: str) -> List[float]:
+    return await asyncio.to_thread(embed_query, text)
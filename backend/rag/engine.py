@@ -2,39 +2,57 @@
 RAG Engine - основной движок для поиска и генерации ответов
 """
 import logging
-from typing import List, Dict, Any, Optional
+import os
+from typing import AsyncIterator, List, Dict, Any, Optional
 import asyncio
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+
+from .context_rules import ContextRules
+from ..llm.completion_cache import get_completion_cache
+from ..llm.ollama_client import get_ollama_client
+from ..llm.scheduler import LLMOverloadedError
+from .embeddings import aembed_query, get_embedding_model
+from .reranker import get_reranker
+from ..storage.chroma_client import DATASET_COLLECTIONS, ChromaClient
+from ..storage.circuit_breaker import CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
+# Маршрутизация между qa_<project> и kb_<project>: score = 1 - distance
+QA_ROUTE_CONFIDENCE = float(os.getenv("QA_ROUTE_CONFIDENCE", "0.6"))  # уверенный ответ из QA, код не ищем
+QA_MIN_SCORE = float(os.getenv("QA_MIN_SCORE", "0.3"))                # ниже - QA пары в контекст не попадают
+# Намерения, для которых ответ ищется только в коде
+CODE_ONLY_INTENTS = {"structure", "api", "logic"}
+# Буст чанка, на который указывает неоднозначное совпадение символа (одно слово, опечатка)
+SYMBOL_MATCH_BOOST = float(os.getenv("SYMBOL_MATCH_BOOST", "0.2"))
+# Федеративный поиск: бюджет времени на один датасет и вес его результатов относительно кода
+FEDERATED_SOURCE_BUDGET_SEC = float(os.getenv("FEDERATED_SOURCE_BUDGET_SEC", "1.5"))
+FEDERATED_DATASET_WEIGHT = float(os.getenv("FEDERATED_DATASET_WEIGHT", "0.9"))
+
+class UnknownProjectError(ValueError):
+    """Проекта нет в config/projects.yaml."""
+
+
 class RAGEngine:
     def __init__(self):
-        self.chroma_client = None
+        self.storage: Optional[ChromaClient] = None
         self.embedding_model = None
         self.collection = None
+        self.context_rules = ContextRules()
         
     async def initialize(self):
         """Инициализация RAG engine"""
         try:
-            import os
+            # Асинхронный слой хранения (ChromaDB 0.5.x, коллекции kb_<project>)
+            self.storage = ChromaClient()
+            await self.storage.initialize()
             
-            chroma_host = os.getenv("CHROMA_HOST", "chromadb").replace("http://", "").split(":")[0]
-            chroma_port = int(os.getenv("CHROMA_PORT", "8000"))
+            # Общая модель эмбеддингов (одна на процесс)
+            self.embedding_model = await asyncio.to_thread(get_embedding_model)
             
-            logger.info(f"Подключение к ChromaDB: {chroma_host}:{chroma_port}")
-            
-            # ChromaDB 0.5.x - новый API
-            self.chroma_client = chromadb.HttpClient(
-                host=chroma_host,
-                port=chroma_port
-            )
-            
-            # Инициализация модели эмбеддингов
-            logger.info("Загрузка модели эмбеддингов...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Cross-encoder грузится в фоне: до готовности порядок по эвристике
+            reranker = get_reranker()
+            if reranker is not None:
+                reranker.start_loading()
             
             # НЕ создаём коллекцию здесь - будем создавать для каждого проекта отдельно
             self.collection = None  # Будет установлена через get_collection()
@@ -47,18 +65,12 @@ class RAGEngine:
     
     def get_collection(self, project: str):
         """Получение или создание коллекции для конкретного проекта"""
-        collection_name = f"kb_{project.replace('-', '_')}"  # kb_staffprobot, kb_project_brain
-        
         try:
-            collection = self.chroma_client.get_or_create_collection(
-                name=collection_name,
-                metadata={"description": f"Knowledge base for {project}"}
-            )
-            logger.info(f"📚 Использую коллекцию: {collection_name}")
+            collection = self.storage.get_collection(project)
             self.collection = collection
             return collection
         except Exception as e:
-            logger.error(f"❌ Ошибка получения коллекции {collection_name}: {e}")
+            logger.error(f"❌ Ошибка получения коллекции для {project}: {e}")
             raise
     
     def _detect_query_intent(self, query: str) -> Dict[str, Any]:
@@ -144,6 +156,25 @@ class RAGEngine:
         # Сортируем по новому score
         return sorted(results, key=lambda x: x['score'], reverse=True)
     
+    def _merge_symbol_docs(
+        self,
+        results: List[Dict[str, Any]],
+        symbol_docs: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Неоднозначные совпадения символов: найденные поиском чанки получают буст,
+        ненайденные добавляются на уровне лучшего результата поиска
+        """
+        best_score = max((doc['score'] for doc in results), default=1.0)
+        by_location = {(doc['file'], doc['lines']): doc for doc in results}
+        for symbol_doc in symbol_docs:
+            found = by_location.get((symbol_doc['file'], symbol_doc['lines']))
+            if found is not None:
+                found['score'] = min(1.0, found['score'] + SYMBOL_MATCH_BOOST)
+            else:
+                results.append({**symbol_doc, "score": best_score})
+        return results
+    
     async def retrieve_context(
         self, 
         query: str, 
@@ -154,31 +185,61 @@ class RAGEngine:
         Поиск релевантного контекста для запроса с умной приоритизацией
         """
         try:
-            # Получаем коллекцию для конкретного проекта
-            collection = self.get_collection(project)
+            # "Где находится open_shift": символ из запроса ищем в таблице символов
+            symbol_hits = await self.storage.lookup_symbols(project, query, limit=top_k)
+            symbol_docs = []
+            if symbol_hits:
+                symbol_docs = await self.storage.get_chunks_by_ids(
+                    project, [hit['chunk_id'] for hit in symbol_hits]
+                )
+                # Векторный поиск пропускаем только для точно названного составного идентификатора;
+                # одно слово с заглавной (Shift) и опечатки лишь поднимают чанки в общей выдаче
+                if symbol_docs and any(hit['exact'] and hit['compound'] for hit in symbol_hits):
+                    logger.info(f"Symbol lookup: {[hit['name'] for hit in symbol_hits]}, {len(symbol_docs)} results")
+                    return [{**doc, "score": 1.0} for doc in symbol_docs]
             
             # Определение намерения пользователя
             intent = self._detect_query_intent(query)
             logger.info(f"Query intent: {intent['type']}, preferred types: {intent['preferred_doc_types']}")
             
             # Создание эмбеддинга запроса
-            query_embedding = self.embedding_model.encode(query).tolist()
-            
-            # Двухэтапный поиск для "how_to" и "overview" запросов
+            query_embedding = await aembed_query(query)
+            
+            # QA пары живут в своей коллекции: при уверенном совпадении код не ищем
+            qa_docs = []
+            if intent['type'] not in CODE_ONLY_INTENTS:
+                qa_docs = await self._search_qa(project, query_embedding, top_k)
+                if qa_docs and qa_docs[0]['score'] >= QA_ROUTE_CONFIDENCE:
+                    logger.info(f"Routed to QA collection: best score {qa_docs[0]['score']:.3f}")
+                    return qa_docs[:top_k]
+            
+            # Двухэтапный поиск: для "how_to" и "overview" запросов, а при разделах по doc_type -
+            # для любого намерения с предпочтительными типами (structure, api, logic)
             context_docs = []
+            use_partitions = self.storage.partitions_cover(intent['preferred_doc_types'])
             
-            if intent['type'] in ['how_to', 'overview'] and intent['preferred_doc_types']:
+            if use_partitions or (intent['type'] in ['how_to', 'overview'] and intent['preferred_doc_types']):
                 # Этап 1: Ищем в предпочтительных типах документов
                 try:
-                    where_clause = {
-                        "$or": [{"doc_type": dt} for dt in intent['preferred_doc_types']]
-                    }
-                    
-                    results_priority = collection.query(
-                        query_embeddings=[query_embedding],
-                        n_results=top_k,
-                        where=where_clause
-                    )
+                    if use_partitions:
+                        # Маленькие коллекции-разделы вместо фильтрованного HNSW поиска
+                        results_priority = await self.storage.query_partitions(
+                            project,
+                            query_embedding,
+                            intent['preferred_doc_types'],
+                            n_results=top_k
+                        )
+                    else:
+                        where_clause = {
+                            "$or": [{"doc_type": dt} for dt in intent['preferred_doc_types']]
+                        }
+                        
+                        results_priority = await self.storage.query(
+                            project,
+                            query_embedding,
+                            n_results=top_k,
+                            where=where_clause
+                        )
                     
                     # Форматирование приоритетных результатов
                     if results_priority['documents'] and results_priority['documents'][0]:
@@ -194,6 +255,8 @@ class RAGEngine:
                     
                     logger.info(f"Found {len(context_docs)} results in priority types")
                 
+                except CircuitOpenError:
+                    raise
                 except Exception as e:
                     logger.warning(f"Priority search failed: {e}, falling back to general search")
             
@@ -202,8 +265,9 @@ class RAGEngine:
                 remaining = top_k - len(context_docs)
                 
                 # Общий поиск БЕЗ where (коллекция уже для конкретного проекта)
-                results = collection.query(
-                    query_embeddings=[query_embedding],
+                results = await self.storage.query(
+                    project,
+                    query_embedding,
                     n_results=top_k * 2  # Берём больше для переранжирования
                 )
                 
@@ -224,7 +288,13 @@ class RAGEngine:
                                   for d in context_docs):
                             context_docs.append(doc_data)
             
-            # Переранжирование на основе намерения
+            # Неуверенные QA совпадения идут в общий контекст наравне с кодом
+            context_docs.extend(doc for doc in qa_docs if doc['score'] >= QA_MIN_SCORE)
+            
+            if symbol_docs:
+                context_docs = self._merge_symbol_docs(context_docs, symbol_docs)
+            
+            # Переранжирование на основе намерения (cross-encoder - после федерации, в _prepare_answer)
             context_docs = self._rerank_results(context_docs, intent)
             
             # Возвращаем top_k лучших
@@ -233,10 +303,142 @@ class RAGEngine:
             
             return final_results
             
+        except CircuitOpenError:
+            # ChromaDB недоступна - не маскируем это под "ничего не найдено"
+            raise
         except Exception as e:
             logger.error(f"Ошибка при поиске контекста: {e}")
             return []
     
+    async def resolve_projects(self, project: str, projects: Optional[List[str]] = None) -> List[str]:
+        """
+        Список проектов запроса: явный, "*" - все из config/projects.yaml, иначе один project
+        
+        Неизвестные имена отклоняются: иначе get_or_create заведёт пустую коллекцию kb_<опечатка>.
+        """
+        known = await asyncio.to_thread(ChromaClient.project_names)
+        if not projects:
+            resolved = [project]
+        elif "*" in projects:
+            resolved = known or [project]
+        else:
+            resolved = list(dict.fromkeys(projects))
+        # Проверяются явно перечисленные проекты; одиночный project ведёт себя как раньше
+        unknown = [name for name in resolved if projects and known and name not in known]
+        if unknown:
+            raise UnknownProjectError(f"Неизвестные проекты: {', '.join(unknown)}")
+        return resolved
+    
+    async def retrieve_federated(
+        self,
+        query: str,
+        project: str = "staffprobot",
+        datasets: Optional[List[str]] = None,
+        top_k: int = 12,
+        projects: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Федеративный поиск: код одного или нескольких проектов + датасеты параллельно
+        
+        Эмбеддинг запроса считается один раз. Оценки всех источников приводятся к
+        косинусной близости в [0, 1]; датасет, не уложившийся в бюджет времени,
+        просто не попадает в результат. Время ответа близко к самому медленному
+        источнику, а не к их сумме.
+        """
+        projects = projects or [project]
+        if not datasets:
+            datasets = []
+        elif "*" in datasets:
+            datasets = DATASET_COLLECTIONS
+        else:
+            datasets = [name for name in datasets if name in DATASET_COLLECTIONS]
+        query_embedding = await aembed_query(query)
+        
+        async def search_dataset(name: str) -> List[Dict[str, Any]]:
+            try:
+                results = await asyncio.wait_for(
+                    self.storage.query_collection(name, query_embedding, n_results=top_k),
+                    timeout=FEDERATED_SOURCE_BUDGET_SEC
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Federated: {name} exceeded {FEDERATED_SOURCE_BUDGET_SEC}s budget, skipped")
+                return []
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"Federated: {name} failed: {e}")
+                return []
+            
+            docs = []
+            for i, doc in enumerate(results['documents'][0] if results['documents'] else []):
+                metadata = results['metadatas'][0][i] or {}
+                # Векторы нормированы: l2^2 = 2 - 2cos
+                cosine = 1 - results['distances'][0][i] / 2
+                docs.append({
+                    "content": doc,
+                    "file": f"{name}:{metadata.get('id', i)}",
+                    "lines": "-",
+                    "type": name,
+                    "doc_type": "dataset",
+                    "source": name,
+                    "score": max(0.0, cosine) * FEDERATED_DATASET_WEIGHT
+                })
+            return docs
+        
+        results = await asyncio.gather(
+            *(self.retrieve_context(query=query, project=name, top_k=top_k) for name in projects),
+            *(search_dataset(name) for name in datasets)
+        )
+        code_results, dataset_docs = results[:len(projects)], results[len(projects):]
+        
+        merged = []
+        for name, code_docs in zip(projects, code_results):
+            for doc in code_docs:
+                # Оценка кода = 1 - l2^2 (с бустами) = 2cos - 1 -> переводим в косинус
+                merged.append({
+                    **doc,
+                    "source": "code",
+                    "project": name,
+                    "score": min(1.0, max(0.0, (doc['score'] + 1) / 2))
+                })
+        for docs in dataset_docs:
+            merged.extend(docs)
+        
+        merged.sort(key=lambda doc: doc['score'], reverse=True)
+        logger.info(
+            "Federated: "
+            + ", ".join(f"{name}={len(docs)}" for name, docs in zip(projects + datasets, results))
+        )
+        return merged[:top_k]
+    
+    async def _search_qa(
+        self,
+        project: str,
+        query_embedding: List[float],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Поиск по коллекции QA пар qa_<project>"""
+        try:
+            results = await self.storage.query_qa(project, query_embedding, n_results=top_k)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.warning(f"QA search failed: {e}")
+            return []
+        
+        docs = []
+        for i, doc in enumerate(results['documents'][0] if results['documents'] else []):
+            metadata = results['metadatas'][0][i] or {}
+            docs.append({
+                "content": doc,
+                "file": metadata.get('file', ''),
+                "lines": metadata.get('lines', ''),
+                "type": metadata.get('type', 'qa_pair'),
+                "doc_type": metadata.get('doc_type', 'qa_pair'),
+                "score": 1 - results['distances'][0][i] if results['distances'] else 0.0
+            })
+        return docs
+    
     async def get_relevant_rules(
         self,
         file_path: str = "",
@@ -245,49 +447,11 @@ class RAGEngine:
         project: str = "staffprobot"
     ) -> List[str]:
         """
-        Получение релевантных правил для контекста
+        Получение релевантных правил для контекста (скомпилированный набор из rules_path)
         """
         try:
-            # Получаем коллекцию для конкретного проекта
-            collection = self.get_collection(project)
-            
-            # Построение запроса для поиска правил
-            query_parts = []
-            
-            if role:
-                query_parts.append(f"роль {role}")
-            if file_path:
-                if "routes" in file_path:
-                    query_parts.append("роуты")
-                if "owner" in file_path:
-                    query_parts.append("владелец")
-                if "manager" in file_path:
-                    query_parts.append("управляющий")
-                if "employee" in file_path:
-                    query_parts.append("сотрудник")
-            if module:
-                query_parts.append(module)
-            
-            if not query_parts:
-                return []
-            
-            query = " ".join(query_parts)
-            
-            # Поиск правил в базе знаний
-            results = collection.query(
-                query_texts=[query],
-                n_results=10,
-                where={"type": "rule"}
-            )
-            
-            # Извлечение правил
-            rules = []
-            if results['documents'] and results['documents'][0]:
-                for doc in results['documents'][0]:
-                    rules.append(doc)
-            
-            return rules[:5]  # Ограничиваем количество правил
-            
+            bundle = await self.context_rules.get_rules(project, file_path=file_path, role=role, module=module)
+            return bundle["rules"]
         except Exception as e:
             logger.error(f"Ошибка при получении правил: {e}")
             return []
@@ -299,106 +463,145 @@ class RAGEngine:
         metadata: Dict[str, Any]
     ):
         """Сохранение документа в векторную БД"""
+        await self.store_chunks(project, [{**metadata, "content": content}])
+    
+    async def store_chunks(
+        self,
+        project: str,
+        chunks: List[Dict[str, Any]]
+    ) -> int:
+        """Батчевое сохранение чанков (upsert по стабильным ID)"""
         try:
-            # Получаем коллекцию для конкретного проекта
-            collection = self.get_collection(project)
-            
-            # Создание эмбеддинга
-            embedding = self.embedding_model.encode(content).tolist()
-            
-            # Санитизация метаданных: только простые типы, короткие строки
-            clean_metadata = {}
-            for key, value in metadata.items():
-                if value is None:
-                    continue
-                if isinstance(value, bool):
-                    clean_metadata[key] = value
-                elif isinstance(value, (int, float)):
-                    clean_metadata[key] = str(value)
-                elif isinstance(value, str):
-                    # Ограничиваем длину строк
-                    clean_metadata[key] = value[:200] if len(value) > 200 else value
-                elif isinstance(value, list):
-                    # Конвертируем списки в строки
-                    clean_metadata[key] = ', '.join(str(v)[:50] for v in value[:5])
-            
-            # Уникальный ID: ВСЕГДА используем chunk_id
-            chunk_id = clean_metadata.get('chunk_id', abs(hash(f"{clean_metadata.get('file', 'unknown')}_{clean_metadata.get('start_line', 0)}_{content[:50]}")))
-            doc_id = f"{project}_{chunk_id}"
-            
-            # Сохранение в ChromaDB
-            try:
-                collection.add(
-                    embeddings=[embedding],
-                    documents=[content],
-                    metadatas=[clean_metadata],
-                    ids=[doc_id]
-                )
-            except Exception as e:
-                # Если документ уже существует - пропускаем
-                if "already exists" in str(e) or "duplicate" in str(e).lower():
-                    pass  # Тихо пропускаем дубли
-                else:
-                    logger.error(f"ПОЛНАЯ ошибка ChromaDB: {e}, metadata keys: {list(clean_metadata.keys())}")
-                    raise
-            
+            return await self.storage.store_chunks(project, chunks)
         except Exception as e:
             logger.error(f"КРИТИЧЕСКАЯ ошибка при сохранении: {e}", exc_info=True)
             raise  # Пробрасываем ошибку для диагностики
     
-    async def query(
+    async def _prepare_answer(
         self,
         query: str,
-        project: str = "staffprobot",
-        top_k: int = 12
+        project: str,
+        top_k: int,
+        datasets: Optional[List[str]],
+        projects: Optional[List[str]]
     ) -> Dict[str, Any]:
         """
-        Полный RAG запрос: поиск контекста + генерация ответа
+        Этап до генерации: готовый ответ из QA хранилища или найденный контекст
         """
-        try:
-            # Поиск релевантного контекста
+        projects = await self.resolve_projects(project, projects)
+        if len(projects) == 1:
+            # {"projects": ["project-brain"]} или "*" при одном проекте - ищем именно в нём
+            project = projects[0]
+        
+        # Закреплённый канонический ответ на этот вопрос
+        pinned = await get_completion_cache().get_pinned(project, query)
+        if pinned:
+            return {
+                "answer": pinned["answer"],
+                "sources": [{"file": "pinned", "lines": "", "content": pinned["question"], "score": 1.0}],
+                "context": [],
+                "project": project
+            }
+        
+        # Вопрос из QA набора (точно или почти дословно) - отвечаем без векторного поиска
+        qa_hits = [
+            hit for hit in await asyncio.gather(*(self.storage.match_qa(name, query) for name in projects))
+            if hit
+        ]
+        qa_hit = max(qa_hits, key=lambda hit: hit["score"]) if qa_hits else None
+        if qa_hit:
+            logger.info(f"QA store: {qa_hit['match']} match ({qa_hit['score']:.3f})")
+            return {
+                "answer": qa_hit["answer"],
+                "sources": [{
+                    "file": qa_hit.get("file") or "qa",
+                    "lines": qa_hit.get("lines", ""),
+                    "content": qa_hit["question"],
+                    "score": qa_hit["score"]
+                }],
+                "context": [],
+                "project": project
+            }
+        
+        # Поиск релевантного контекста (несколько проектов или датасеты - федеративный)
+        if datasets or len(projects) > 1:
+            context_docs = await self.retrieve_federated(
+                query=query,
+                project=project,
+                datasets=datasets,
+                top_k=top_k,
+                projects=projects
+            )
+        else:
             context_docs = await self.retrieve_context(
                 query=query,
                 project=project,
                 top_k=top_k
             )
+        
+        # Cross-encoder (если включён) один раз по объединённому списку, в пределах бюджета
+        reranker = get_reranker()
+        if reranker is not None:
+            context_docs = await reranker.rerank(query, context_docs) or context_docs
+        
+        # Форматирование источников
+        sources = []
+        for doc in context_docs:
+            source = {
+                "file": doc.get("file", ""),
+                "lines": doc.get("lines", ""),
+                "content": doc.get("content", "")[:200] + "...",
+                "score": doc.get("score", 0.0)
+            }
+            for key in ("source", "project", "rerank_score"):
+                if key in doc:
+                    source[key] = doc[key]
+            sources.append(source)
+        
+        return {"answer": None, "sources": sources, "context": context_docs, "project": project}
+    
+    async def query(
+        self,
+        query: str,
+        project: str = "staffprobot",
+        top_k: int = 12,
+        datasets: Optional[List[str]] = None,
+        projects: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Полный RAG запрос: поиск контекста + генерация ответа
+        """
+        try:
+            prepared = await self._prepare_answer(query, project, top_k, datasets, projects)
+            if prepared["answer"] is not None:
+                return {"answer": prepared["answer"], "sources": prepared["sources"], "relevant_rules": []}
             
-            # Импорт Ollama клиента
-            from ..llm.ollama_client import OllamaClient
-            ollama = OllamaClient()
-            await ollama.initialize()
+            # Общий Ollama клиент (пул соединений, модель прогрета при старте)
+            ollama = get_ollama_client()
             
             # Генерация ответа с контекстом (передаём имя проекта!)
             answer = await ollama.generate_response(
                 query=query,
-                context=context_docs,
+                context=prepared["context"],
                 max_tokens=1000,
-                project_name=project
+                project_name=prepared["project"]
             )
             
-            # Форматирование источников
-            sources = []
-            for doc in context_docs:
-                sources.append({
-                    "file": doc.get("file", ""),
-                    "lines": doc.get("lines", ""),
-                    "content": doc.get("content", "")[:200] + "...",
-                    "score": doc.get("score", 0.0)
-                })
-            
             # Получение релевантных правил
             relevant_rules = await self.get_relevant_rules(
                 file_path="",
                 role="",
-                project=project
+                project=prepared["project"]
             )
             
             return {
                 "answer": answer,
-                "sources": sources,
+                "sources": prepared["sources"],
                 "relevant_rules": relevant_rules
             }
             
+        except (CircuitOpenError, LLMOverloadedError, UnknownProjectError):
+            raise
         except Exception as e:
             logger.error(f"Ошибка RAG запроса: {e}", exc_info=True)
             return {
@@ -406,3 +609,48 @@ class RAGEngine:
                 "sources": [],
                 "relevant_rules": []
             }
+    
+    async def query_stream(
+        self,
+        query: str,
+        project: str = "staffprobot",
+        top_k: int = 12,
+        datasets: Optional[List[str]] = None,
+        projects: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковый RAG запрос: сначала событие sources, затем token по мере генерации, в конце done
+        
+        CircuitOpenError пробрасывается до первого события - роут успевает ответить 503.
+        """
+        prepared = await self._prepare_answer(query, project, top_k, datasets, projects)
+        relevant_rules = [] if prepared["answer"] is not None else await self.get_relevant_rules(
+            project=prepared["project"]
+        )
+        yield {"event": "sources", "sources": prepared["sources"], "relevant_rules": relevant_rules}
+        
+        if prepared["answer"] is not None:
+            yield {"event": "token", "text": prepared["answer"]}
+        else:
+            ollama = get_ollama_client()
+            try:
+                async for text in ollama.stream_response(
+                    query=query,
+                    context=prepared["context"],
+                    max_tokens=1000,
+                    project_name=prepared["project"]
+                ):
+                    yield {"event": "token", "text": text}
+            except LLMOverloadedError as e:
+                yield {
+                    "event": "error",
+                    "status": 503,
+                    "detail": f"LLM перегружена: {e}",
+                    "retry_after": int(e.retry_after) + 1
+                }
+                return
+            except Exception as e:
+                logger.error(f"Ошибка потоковой генерации: {e}", exc_info=True)
+                yield {"event": "error", "detail": f"Ошибка генерации ответа: {str(e)}"}
+                return
+        yield {"event": "done"}
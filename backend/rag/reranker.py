@@ -0,0 +1,120 @@
+"""
+Переранжирование кандидатов cross-encoder моделью на CPU с бюджетом времени
+
+Вызывается один раз на запрос, по объединённому списку кандидатов (после
+федерации). Первые RERANK_TOP_N кандидатов оцениваются парами (запрос,
+документ) одним батчем; оценка пишется в rerank_score, score поиска не
+меняется. Батчи считаются по одному: параллельный запрос ждёт очереди в
+пределах своего бюджета. Не уложились в RERANK_BUDGET_MS или модель ещё не
+загружена - возвращается None, и движок оставляет эвристический порядок.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# none - только эвристика по doc_type, cross-encoder - модель RERANKER_MODEL
+RERANKER = os.getenv("RERANKER", "none")
+# Многоязычная (запросы на русском) MiniLM, ~120M параметров, PyTorch на CPU
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+
+
+class CrossEncoderReranker:
+    """Ленивая загрузка модели в фоне; запросы до загрузки идут по эвристике."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL) -> None:
+        self.model_name = model_name
+        self._model = None
+        self._loading = False
+        self._failed = False
+        self._load_lock = threading.Lock()
+        # Одно вычисление за раз: батч, не уложившийся в бюджет, досчитывается в потоке
+        self._compute_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def start_loading(self) -> None:
+        if self._model is None and not self._loading and not self._failed:
+            self._loading = True
+            threading.Thread(target=self._load, name="reranker-load", daemon=True).start()
+
+    async def rerank(self, query: str, docs: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Оценённые кандидаты по убыванию rerank_score, за ними остальные; None - бюджет, модель не готова."""
+        if not docs:
+            return docs
+        if not self.ready:
+            self.start_loading()
+            return None
+
+        candidates, rest = docs[:RERANK_TOP_N], docs[RERANK_TOP_N:]
+        started = time.perf_counter()
+        budget = RERANK_BUDGET_MS / 1000
+        deadline = time.monotonic() + budget
+        try:
+            scores = await asyncio.wait_for(
+                asyncio.to_thread(self._score, query, [doc.get("content", "") for doc in candidates], deadline),
+                timeout=budget,
+            )
+        except asyncio.TimeoutError:
+            scores = None
+        if scores is None:
+            logger.warning("Rerank не уложился в %.0f мс, эвристический порядок", RERANK_BUDGET_MS)
+            return None
+
+        reranked = [{**doc, "rerank_score": score} for doc, score in zip(candidates, scores)]
+        reranked.sort(key=lambda doc: doc["rerank_score"], reverse=True)
+        logger.info("Rerank %s кандидатов за %.0f мс", len(candidates), (time.perf_counter() - started) * 1000)
+        return reranked + rest
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _load(self) -> None:
+        with self._load_lock:
+            try:
+                from sentence_transformers import CrossEncoder
+
+                logger.info("Загрузка cross-encoder %s...", self.model_name)
+                self._model = CrossEncoder(self.model_name, max_length=RERANK_MAX_LENGTH, device="cpu")
+            except Exception as error:
+                self._failed = True
+                logger.error("Cross-encoder %s недоступен, rerank выключен: %s", self.model_name, error)
+            finally:
+                self._loading = False
+
+    def _score(self, query: str, documents: List[str], deadline: float) -> Optional[List[float]]:
+        # Ждём предыдущий батч не дольше бюджета; опоздавший вызов не считает впустую
+        if not self._compute_lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            return None
+        try:
+            if time.monotonic() >= deadline:
+                return None
+            logits = self._model.predict(
+                [(query, document) for document in documents], batch_size=len(documents)
+            )
+            # Логиты → (0, 1)
+            return [1 / (1 + math.exp(-float(logit))) for logit in logits]
+        finally:
+            self._compute_lock.release()
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Reranker процесса или None, если он выключен (RERANKER=none)."""
+    global _reranker
+    if RERANKER != "cross-encoder":
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
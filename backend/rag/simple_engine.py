@@ -2,9 +2,10 @@
 Простой RAG Engine без ChromaDB для тестирования
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 import asyncio
-from sentence_transformers import SentenceTransformer
+
+from .embeddings import get_embedding_model
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +18,11 @@ class SimpleRAGEngine:
         """Инициализация простого RAG engine"""
         try:
             # Инициализация модели эмбеддингов
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = await asyncio.to_thread(get_embedding_model)
             
             # Простая инициализация Ollama клиента
-            from ..llm.ollama_client import OllamaClient
-            self.ollama_client = OllamaClient()
-            await self.ollama_client.initialize()
+            from ..llm.ollama_client import get_ollama_client
+            self.ollama_client = get_ollama_client()
             
             logger.info("Simple RAG Engine инициализирован успешно")
             
@@ -30,9 +30,15 @@ class SimpleRAGEngine:
             logger.error(f"Ошибка инициализации Simple RAG Engine: {e}")
             raise
     
-    async def query(self, query: str, project: str = "staffprobot") -> Dict[str, Any]:
+    async def query(
+        self,
+        query: str,
+        project: str = "staffprobot",
+        datasets: Optional[List[str]] = None,
+        projects: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
-        Простой запрос без ChromaDB - только генерация через Ollama
+        Простой запрос без ChromaDB - только генерация через Ollama (датасеты и поиск по проектам недоступны)
         """
         try:
             # Простой ответ без поиска в базе знаний
@@ -58,6 +64,21 @@ class SimpleRAGEngine:
                 "relevant_rules": []
             }
     
+    async def query_stream(
+        self,
+        query: str,
+        project: str = "staffprobot",
+        datasets: Optional[List[str]] = None,
+        projects: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковый вариант query: источников нет, ответ приходит одним событием
+        """
+        result = await self.query(query, project, datasets, projects)
+        yield {"event": "sources", "sources": [], "relevant_rules": []}
+        yield {"event": "token", "text": result["answer"]}
+        yield {"event": "done"}
+    
     async def get_relevant_rules(self, file_path: str = "", role: str = "") -> List[str]:
         """
         Возвращает базовые правила для тестирования
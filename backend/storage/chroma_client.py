@@ -1,91 +1,659 @@
 """
 ChromaDB клиент для хранения векторных данных (адаптирован под chromadb 0.5.x)
+
+Бэкенд (HTTP, встроенный PersistentClient или NumPy) выбирается в vector_store.
 """
 import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import chromadb
+import httpx
 import yaml
-from chromadb.api import ClientAPI
+
+from ..rag.embeddings import EMBEDDING_DIM, aembed_texts
+from .chunk_ids import chunk_symbol, stable_chunk_id
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .index_stats import IndexStats
+from .qa_store import QAStore
+from .symbol_index import SYMBOL_TYPES, SymbolIndex
+from .vector_store import VECTOR_STORE_BACKEND, VectorStore, chroma_http_address, get_vector_store
 
 logger = logging.getLogger(__name__)
 
 
+# Размер батча для upsert (дополнительно ограничивается лимитом сервера)
+UPSERT_BATCH_SIZE = 256
+# Глобальная статистика: параллельность подсчёта коллекций и TTL кэша
+GLOBAL_STATS_CONCURRENCY = int(os.getenv("GLOBAL_STATS_CONCURRENCY", "8"))
+GLOBAL_STATS_TTL_SEC = float(os.getenv("GLOBAL_STATS_TTL_SEC", "10"))
+
+
+# Устойчивость: таймаут одного вызова, повторы с джиттером, circuit breaker
+CHROMA_CALL_TIMEOUT_SEC = float(os.getenv("CHROMA_CALL_TIMEOUT_SEC", "10"))
+CHROMA_MAX_RETRIES = int(os.getenv("CHROMA_MAX_RETRIES", "2"))
+CHROMA_RETRY_BASE_SEC = float(os.getenv("CHROMA_RETRY_BASE_SEC", "0.2"))
+CHROMA_BREAKER_THRESHOLD = int(os.getenv("CHROMA_BREAKER_THRESHOLD", "5"))
+CHROMA_BREAKER_RESET_SEC = float(os.getenv("CHROMA_BREAKER_RESET_SEC", "30"))
+# Повторяются и считаются отказом только сбои связи и ответы 5xx/429; ошибки запроса
+# (ValueError, InvalidArgument и т.п.) пробрасываются сразу и не открывают breaker
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError, OSError, httpx.TransportError)
+
+# Опциональная раскладка: чанки дополнительно пишутся в коллекции-разделы
+# kb_<project>__<doc_type>, чтобы приоритетный поиск не шёл через where-фильтр
+DOC_TYPE_PARTITIONS = os.getenv("DOC_TYPE_PARTITIONS", "false").lower() in ("1", "true", "yes")
+PARTITIONED_DOC_TYPES = tuple(
+    os.getenv(
+        "PARTITIONED_DOC_TYPES", "route,handler,service,model,schema,api,documentation"
+    ).split(",")
+)
+PARTITION_SEPARATOR = "__"
+
+# Коллекции датасетов StaffProBot (заполняются /datasets/sync)
+DATASET_COLLECTIONS = ["faq_knowledge", "bug_context", "dev_changes", "commit_history"]
+
+# Поля метаданных, которые хранятся числами (для $gte/$lte фильтров на сервере)
+INT_METADATA_FIELDS = ("start_line", "end_line")
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """HTTP статус ошибки: httpx.HTTPStatusError или ChromaError.code() у ответа сервера."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            return None
+    return code if isinstance(code, int) else None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Сбой сервиса (связь, перегрузка, 5xx), а не ошибка самого запроса."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = _status_code(error)
+    return status is not None and (status >= 500 or status == 429)
+
+
+def partition_key(metadata: Dict[str, Any]) -> str:
+    """Раздел чанка по doc_type (QA пары живут в своей коллекции qa_<project>)."""
+    return metadata.get("doc_type") or "other"
+
+
 class ChromaClient:
-    """Асинхронная обёртка над синхронным chromadb.HttpClient."""
+    """Асинхронный слой хранения поверх синхронного VectorStore (chromadb API).
+
+    Все блокирующие вызовы хранилища выполняются через asyncio.to_thread
+    с таймаутом, повторами и circuit breaker; документы пишутся в
+    коллекцию проекта kb_<project>, хэндлы коллекций кэшируются.
+    """
 
-    def __init__(self, host: str = "chromadb", port: int = 8000) -> None:
-        self.host = host
-        self.port = port
-        self.client: Optional[ClientAPI] = None
-        self.collection = None
-        self._default_collection_name = "project_brain"
+    def __init__(self, store: Optional[VectorStore] = None) -> None:
+        self.host, self.port = chroma_http_address()
+        self.client: Optional[VectorStore] = store
+        self.index_stats = IndexStats()
+        self.symbol_index = SymbolIndex()
+        self.qa_store = QAStore()
+        self._qa_backfills: Dict[str, asyncio.Task] = {}
+        self._max_batch_size = UPSERT_BATCH_SIZE
+        self._global_stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._collections: Dict[str, Any] = {}
+        self.breaker = CircuitBreaker(
+            "chromadb",
+            failure_threshold=CHROMA_BREAKER_THRESHOLD,
+            reset_timeout=CHROMA_BREAKER_RESET_SEC,
+        )
 
     async def initialize(self) -> None:
         """Инициализация ChromaDB клиента."""
         try:
-            self.client = chromadb.HttpClient(host=self.host, port=self.port)
-            self.collection = await asyncio.to_thread(
-                self.client.get_or_create_collection,
-                name=self._default_collection_name,
-                metadata={"description": "Project Brain knowledge base"},
-            )
+            if self.client is None:
+                if VECTOR_STORE_BACKEND == "http":
+                    logger.info("Подключение к ChromaDB: %s:%s", self.host, self.port)
+                self.client = await asyncio.to_thread(get_vector_store)
+            try:
+                server_limit = await asyncio.to_thread(self.client.get_max_batch_size)
+                self._max_batch_size = min(UPSERT_BATCH_SIZE, server_limit)
+            except Exception:
+                pass
             logger.info("ChromaDB клиент инициализирован успешно")
         except Exception as error:
             logger.error("Ошибка инициализации ChromaDB: %s", error, exc_info=True)
             raise
 
-    async def store_chunks(self, project: str, chunks: List[Dict[str, Any]]) -> None:
-        """Сохранение чанков в ChromaDB."""
+    def get_collection(self, project: str):
+        """Коллекция проекта kb_<project> (блокирующий вызов при первом обращении)."""
+        if self.client is None:
+            raise RuntimeError("ChromaDB клиент не инициализирован")
+
+        return self._get_named_collection(
+            self._make_collection_name(project), f"Knowledge base for {project}"
+        )
+
+    def get_qa_collection(self, project: str):
+        """Коллекция QA пар qa_<project> (блокирующий вызов при первом обращении)."""
+        if self.client is None:
+            raise RuntimeError("ChromaDB клиент не инициализирован")
+
+        return self._get_named_collection(
+            self._make_qa_collection_name(project), f"QA pairs for {project}"
+        )
+
+    def get_partition(self, project: str, doc_type: str):
+        """Коллекция-раздел kb_<project>__<doc_type> (блокирующий вызов при первом обращении)."""
+        if self.client is None:
+            raise RuntimeError("ChromaDB клиент не инициализирован")
+
+        return self._get_named_collection(
+            self._make_partition_name(project, doc_type), f"{doc_type} partition of {project}"
+        )
+
+    def _get_named_collection(self, name: str, description: str):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self.client.get_or_create_collection(
+                name=name,
+                metadata={"description": description},
+            )
+            self._collections[name] = collection
+            logger.info("📚 Коллекция %s подключена", name)
+        return collection
+
+    def forget_collection(self, project: str) -> None:
+        """Сброс кэшированных хэндлов проекта и его разделов (например, после удаления коллекции)."""
+        name = self._make_collection_name(project)
+        self._collections.pop(self._make_qa_collection_name(project), None)
+        for cached in list(self._collections):
+            if cached == name or cached.startswith(name + PARTITION_SEPARATOR):
+                self._collections.pop(cached, None)
+
+    async def _call(self, func, *args, **kwargs):
+        """Вызов chromadb в потоке: таймаут, повторы с джиттером, circuit breaker."""
+        for attempt in range(CHROMA_MAX_RETRIES + 1):
+            self.breaker.before_call()
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.to_thread(func, *args, **kwargs), timeout=CHROMA_CALL_TIMEOUT_SEC
+                )
+            except Exception as error:
+                if not is_transient_error(error):
+                    # Сервер ответил ошибкой запроса - он доступен, повтор ничего не даст
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == CHROMA_MAX_RETRIES:
+                    raise
+                delay = CHROMA_RETRY_BASE_SEC * (2 ** attempt)
+                delay += random.uniform(0, delay)
+                logger.warning(
+                    "ChromaDB: ошибка вызова %s (попытка %s): %s, повтор через %.2f с",
+                    getattr(func, "__name__", func),
+                    attempt + 1,
+                    error or type(error).__name__,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Отмена (бюджет федеративного поиска, клиент ушёл) о сервисе ничего не говорит,
+                # но пробу half-open нужно освободить, иначе цепь не замкнётся до рестарта
+                self.breaker.abort_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _prepare_chunks(
+        self, project: str, chunks: List[Dict[str, Any]]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """Стабильные ID, тексты и очищенные метаданные чанков без повторов ID."""
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        ids: List[str] = []
+        seen_ids = set()
+
+        for chunk in chunks:
+            content = chunk["content"]
+            metadata = {"project": project, **{k: v for k, v in chunk.items() if k != "content"}}
+            if not metadata.get("symbol"):
+                metadata["symbol"] = chunk_symbol(metadata) or None
+            metadata = self._clean_metadata(metadata)
+            chunk_id = stable_chunk_id(project, metadata, content)
+            # Одинаковый текст той же сущности в одном файле даёт тот же ID:
+            # chromadb отклоняет батч с повторами, оставляем первый чанк
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            documents.append(content)
+            metadatas.append(metadata)
+            ids.append(chunk_id)
+        return ids, documents, metadatas
+
+    async def store_chunks(self, project: str, chunks: List[Dict[str, Any]]) -> int:
+        """Сохранение чанков в коллекцию проекта (upsert, реальные эмбеддинги)."""
         if not chunks:
-            return
+            return 0
+        ids, documents, metadatas = self._prepare_chunks(project, chunks)
+        await self._store_prepared(project, ids, documents, metadatas)
+        return len(ids)
+
+    async def replace_file(self, project: str, file_path: str, chunks: List[Dict[str, Any]]) -> int:
+        """Переиндексация файла: upsert новых чанков и удаление прежних версий.
+
+        ID зависит от текста чанка, поэтому изменённая функция получает новый ID;
+        старый удаляется здесь же, а не остаётся в выдаче рядом с актуальным кодом.
+        Вклад файла в статистику пересчитывается по чанкам без повторов.
+        """
+        ids, documents, metadatas = self._prepare_chunks(project, chunks)
+        previous_ids = await self.file_chunk_ids(project, file_path)
+        if ids:
+            await self._store_prepared(project, ids, documents, metadatas)
+        stale_ids = sorted(set(previous_ids) - set(ids))
+        if stale_ids:
+            await self.delete_ids(project, stale_ids)
+            logger.debug("Удалено %s устаревших чанков файла %s", len(stale_ids), file_path)
+        await self.index_stats.record_file(
+            project,
+            file_path,
+            [{**metadata, "content": document} for document, metadata in zip(documents, metadatas)],
+        )
+        return len(ids)
 
-        if self.collection is None:
-            raise RuntimeError("ChromaDB коллекция не инициализирована")
+    def chunk_ids_for(self, project: str, chunks: List[Dict[str, Any]]) -> List[str]:
+        """ID, под которыми чанки были бы записаны (без записи и эмбеддингов)."""
+        return self._prepare_chunks(project, chunks)[0]
 
+    async def metadata_page(self, project: str, limit: int, offset: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Страница (ID, метаданные) основной коллекции проекта."""
+        collection = await self._get_project_collection(project)
+        page = await self._call(collection.get, include=["metadatas"], limit=limit, offset=offset)
+        ids = page.get("ids") or []
+        return ids, [metadata or {} for metadata in page.get("metadatas") or [None] * len(ids)]
+
+    async def file_chunk_ids(self, project: str, file_path: str) -> List[str]:
+        """ID чанков файла в основной коллекции проекта (без документов и метаданных)."""
+        collection = await self._get_project_collection(project)
+        page = await self._call(collection.get, where={"file": file_path}, include=[])
+        return list(page.get("ids") or [])
+
+    async def _store_prepared(
+        self, project: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]
+    ) -> None:
         try:
-            embeddings: List[List[float]] = []
-            documents: List[str] = []
-            metadatas: List[Dict[str, Any]] = []
-            ids: List[str] = []
-
-            for chunk in chunks:
-                embedding = [0.0] * 384  # TODO: заменить на реальные эмбеддинги
-                embeddings.append(embedding)
-                documents.append(chunk["content"])
-
-                metadata: Dict[str, Any] = {
-                    "project": project,
-                    "file": chunk.get("file", ""),
-                    "lines": chunk.get("lines", ""),
-                    "type": chunk.get("type", ""),
-                    "chunk_id": chunk.get("chunk_id", 0),
-                }
-                if "class_name" in chunk:
-                    metadata["class_name"] = chunk["class_name"]
-                if "function_name" in chunk:
-                    metadata["function_name"] = chunk["function_name"]
-                if "section" in chunk:
-                    metadata["section"] = chunk["section"]
-
-                metadatas.append(metadata)
-                ids.append(f"{project}_{chunk.get('file', '')}_{chunk.get('chunk_id', 0)}")
-
-            await asyncio.to_thread(
-                self.collection.add,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids,
-            )
+            collection = await self._get_project_collection(project)
+            embeddings = await aembed_texts(documents)
 
-            logger.info("Сохранено %s чанков для проекта %s", len(chunks), project)
+            # QA пары - в отдельную коллекцию qa_<project>, код и документация - в kb_<project>
+            qa_indexes = [i for i, metadata in enumerate(metadatas) if metadata.get("type") == "qa_pair"]
+            kb_indexes = [i for i, metadata in enumerate(metadatas) if metadata.get("type") != "qa_pair"]
+
+            if kb_indexes:
+                await self._upsert(
+                    collection,
+                    [ids[i] for i in kb_indexes],
+                    [embeddings[i] for i in kb_indexes],
+                    [documents[i] for i in kb_indexes],
+                    [metadatas[i] for i in kb_indexes],
+                )
+                # В таблицу символов - только функции и классы из kb_<project>
+                symbol_indexes = [i for i in kb_indexes if metadatas[i].get("type") in SYMBOL_TYPES]
+                if symbol_indexes:
+                    await self.symbol_index.record_chunks(
+                        project, [ids[i] for i in symbol_indexes], [metadatas[i] for i in symbol_indexes]
+                    )
+            if qa_indexes:
+                qa_collection = await self._get_qa_collection(project)
+                qa_ids = [ids[i] for i in qa_indexes]
+                qa_documents = [documents[i] for i in qa_indexes]
+                qa_metadatas = [metadatas[i] for i in qa_indexes]
+                await self._upsert(
+                    qa_collection, qa_ids, [embeddings[i] for i in qa_indexes], qa_documents, qa_metadatas
+                )
+                await self.qa_store.record_chunks(project, qa_ids, qa_documents, qa_metadatas)
+
+            if DOC_TYPE_PARTITIONS:
+                groups: Dict[str, List[int]] = {}
+                for index in kb_indexes:
+                    key = partition_key(metadatas[index])
+                    if key in PARTITIONED_DOC_TYPES:
+                        groups.setdefault(key, []).append(index)
+                for doc_type, indexes in groups.items():
+                    partition = await self._get_partition_collection(project, doc_type)
+                    await self._upsert(
+                        partition,
+                        [ids[i] for i in indexes],
+                        [embeddings[i] for i in indexes],
+                        [documents[i] for i in indexes],
+                        [metadatas[i] for i in indexes],
+                    )
+
+            await self.index_stats.bump_version(project)
+            logger.debug("Сохранено %s чанков для проекта %s", len(ids), project)
+        except CircuitOpenError:
+            raise
         except Exception as error:
+            self.forget_collection(project)
             logger.error("Ошибка при сохранении чанков: %s", error, exc_info=True)
             raise
 
+    async def query(
+        self,
+        project: str,
+        query_embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Векторный поиск в коллекции проекта."""
+        collection = await self._get_project_collection(project)
+        kwargs: Dict[str, Any] = {"query_embeddings": [query_embedding], "n_results": n_results}
+        if where:
+            kwargs["where"] = where
+        try:
+            return await self._call(collection.query, **kwargs)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            # Хэндл мог устареть (коллекция пересоздана) - при следующем вызове получим заново
+            self.forget_collection(project)
+            raise
+
+    async def query_collection(
+        self, name: str, query_embedding: List[float], n_results: int
+    ) -> Dict[str, Any]:
+        """Векторный поиск по произвольной коллекции (датасеты) с общим эмбеддингом запроса."""
+        if self.client is None:
+            raise RuntimeError("ChromaDB клиент не инициализирован")
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = await self._call(self._get_named_collection, name, f"Dataset {name}")
+        if not await self._call(collection.count):
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return await self._call(
+            collection.query, query_embeddings=[query_embedding], n_results=n_results
+        )
+
+    async def query_qa(self, project: str, query_embedding: List[float], n_results: int) -> Dict[str, Any]:
+        """Векторный поиск по коллекции QA пар проекта."""
+        collection = await self._get_qa_collection(project)
+        if not await self._call(collection.count):
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return await self._call(
+            collection.query, query_embeddings=[query_embedding], n_results=n_results
+        )
+
+    async def migrate_qa_pairs(self, project: str, page_size: int = 500, dry_run: bool = False) -> int:
+        """Перенос QA пар из kb_<project> в qa_<project> (эмбеддинги и ID сохраняются)."""
+        collection = await self._get_project_collection(project)
+        qa_collection = await self._get_qa_collection(project)
+        moved = 0
+        while True:
+            # Перенесённые удаляются из kb, поэтому всегда читаем первую страницу
+            page = await self._call(
+                collection.get,
+                where={"type": "qa_pair"},
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=moved if dry_run else 0,
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            if not dry_run:
+                await self._upsert(qa_collection, ids, page["embeddings"], page["documents"], page["metadatas"])
+                await self._call(collection.delete, ids=ids)
+            moved += len(ids)
+
+        logger.info("❓ QA пары %s: %s %s в qa коллекцию", project, moved, "к переносу" if dry_run else "перенесено")
+        return moved
+
+    def partitions_cover(self, doc_types: List[str]) -> bool:
+        """Можно ли ответить на запрос по типам только из разделов."""
+        return DOC_TYPE_PARTITIONS and bool(doc_types) and all(
+            doc_type in PARTITIONED_DOC_TYPES for doc_type in doc_types
+        )
+
+    async def query_partitions(
+        self,
+        project: str,
+        query_embedding: List[float],
+        doc_types: List[str],
+        n_results: int,
+    ) -> Dict[str, Any]:
+        """Поиск по разделам doc_type параллельно со слиянием по расстоянию.
+
+        Возвращает результат в формате collection.query (один запрос).
+        """
+
+        async def search(doc_type: str) -> List[Tuple[float, str, Dict[str, Any]]]:
+            partition = await self._get_partition_collection(project, doc_type)
+            if not await self._call(partition.count):
+                return []
+            result = await self._call(
+                partition.query, query_embeddings=[query_embedding], n_results=n_results
+            )
+            return list(zip(result["distances"][0], result["documents"][0], result["metadatas"][0]))
+
+        hits: List[Tuple[float, str, Dict[str, Any]]] = []
+        for partial in await asyncio.gather(*(search(doc_type) for doc_type in dict.fromkeys(doc_types))):
+            hits.extend(partial)
+        hits.sort(key=lambda hit: hit[0])
+        hits = hits[:n_results]
+
+        return {
+            "distances": [[hit[0] for hit in hits]],
+            "documents": [[hit[1] for hit in hits]],
+            "metadatas": [[hit[2] for hit in hits]],
+        }
+
+    async def delete_ids(self, project: str, ids: List[str], batch_size: int = 500) -> None:
+        """Удаление документов из коллекции проекта и всех её разделов."""
+        targets = [await self._get_project_collection(project)]
+        if DOC_TYPE_PARTITIONS:
+            for doc_type in PARTITIONED_DOC_TYPES:
+                targets.append(await self._get_partition_collection(project, doc_type))
+        for collection in targets:
+            for i in range(0, len(ids), batch_size):
+                await self._call(collection.delete, ids=ids[i:i + batch_size])
+        await self.symbol_index.remove_chunks(project, ids)
+        await self.index_stats.bump_version(project)
+
+    async def rebuild_partitions(self, project: str, page_size: int = 500) -> Dict[str, int]:
+        """Пересборка разделов из основной коллекции (без переэмбеддинга).
+
+        Нужна при включении раскладки на существующем индексе и после дедупликации.
+        """
+        if not DOC_TYPE_PARTITIONS:
+            raise ValueError("Раскладка по разделам выключена (DOC_TYPE_PARTITIONS=false)")
+
+        for doc_type in PARTITIONED_DOC_TYPES:
+            name = self._make_partition_name(project, doc_type)
+            self._collections.pop(name, None)
+            try:
+                await self._call(self.client.delete_collection, name)
+            except CircuitOpenError:
+                raise
+            except Exception:
+                pass
+
+        collection = await self._get_project_collection(project)
+        counts: Dict[str, int] = {doc_type: 0 for doc_type in PARTITIONED_DOC_TYPES}
+        offset = 0
+        while True:
+            page = await self._call(
+                collection.get,
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=offset,
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            groups: Dict[str, List[int]] = {}
+            for index, metadata in enumerate(page["metadatas"]):
+                key = partition_key(metadata or {})
+                if key in counts:
+                    groups.setdefault(key, []).append(index)
+            for doc_type, indexes in groups.items():
+                partition = await self._get_partition_collection(project, doc_type)
+                await self._upsert(
+                    partition,
+                    [ids[i] for i in indexes],
+                    [page["embeddings"][i] for i in indexes],
+                    [page["documents"][i] for i in indexes],
+                    [page["metadatas"][i] for i in indexes],
+                )
+                counts[doc_type] += len(indexes)
+            offset += len(ids)
+
+        logger.info("🗂️ Разделы %s пересобраны: %s", project, counts)
+        return counts
+
+    async def _upsert(self, collection, ids, embeddings, documents, metadatas) -> None:
+        for i in range(0, len(ids), self._max_batch_size):
+            batch = slice(i, i + self._max_batch_size)
+            await self._call(
+                collection.upsert,
+                embeddings=embeddings[batch],
+                documents=documents[batch],
+                metadatas=metadatas[batch],
+                ids=ids[batch],
+            )
+
+    async def chunks_in_range(
+        self, project: str, file_path: str, start_line: int, end_line: int, limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Чанки файла, пересекающиеся с диапазоном строк (фильтр целиком на сервере)."""
+        where = {
+            "$and": [
+                {"file": file_path},
+                {"start_line": {"$lte": end_line}},
+                {"end_line": {"$gte": start_line}},
+            ]
+        }
+        chunks = await self._get_chunks(project, where, limit)
+        return sorted(chunks, key=lambda chunk: chunk["start_line"] or 0)
+
+    async def chunks_for_symbol(
+        self, project: str, symbol: str, file_path: Optional[str] = None, limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Чанки сущности (функция, класс, секция) по точному имени."""
+        where: Dict[str, Any] = {"symbol": symbol}
+        if file_path:
+            where = {"$and": [where, {"file": file_path}]}
+        return await self._get_chunks(project, where, limit)
+
+    async def get_chunks_by_ids(self, project: str, ids: List[str]) -> List[Dict[str, Any]]:
+        """Чанки по ID в порядке запроса (отсутствующие пропускаются)."""
+        if not ids:
+            return []
+        chunks = {chunk["id"]: chunk for chunk in await self._get_chunks(project, ids=ids)}
+        return [chunks[doc_id] for doc_id in ids if doc_id in chunks]
+
+    async def lookup_symbols(self, project: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Символы проекта, явно названные в запросе (таблица символов, без эмбеддинга)."""
+        return await self.symbol_index.lookup(project, query, limit=limit)
+
+    async def rebuild_symbols(self, project: str) -> int:
+        collection = await self._get_project_collection(project)
+        return await self.symbol_index.rebuild(project, collection)
+
+    async def _get_chunks(
+        self,
+        project: str,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        collection = await self._get_project_collection(project)
+        page = await self._call(
+            collection.get, ids=ids, where=where, limit=limit, include=["documents", "metadatas"]
+        )
+        return [
+            {
+                "id": doc_id,
+                "content": document,
+                "file": (metadata or {}).get("file", ""),
+                "lines": (metadata or {}).get("lines", ""),
+                "start_line": (metadata or {}).get("start_line"),
+                "end_line": (metadata or {}).get("end_line"),
+                "type": (metadata or {}).get("type", ""),
+                "doc_type": (metadata or {}).get("doc_type", "other"),
+                "symbol": (metadata or {}).get("symbol", ""),
+            }
+            for doc_id, document, metadata in zip(
+                page.get("ids") or [], page.get("documents") or [], page.get("metadatas") or []
+            )
+        ]
+
+    async def migrate_typed_metadata(self, project: str, page_size: int = 500, dry_run: bool = False) -> Dict[str, int]:
+        """Перевод метаданных старых чанков на типизированную схему (без переэмбеддинга).
+
+        start_line/end_line из строк в числа, symbol из function_name/class_name/section/question.
+        """
+        collection = await self._get_project_collection(project)
+        scanned = updated = 0
+        offset = 0
+        while True:
+            page = await self._call(collection.get, include=["metadatas"], limit=page_size, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            changed_ids: List[str] = []
+            changed_metadatas: List[Dict[str, Any]] = []
+            for doc_id, original in zip(ids, page.get("metadatas") or []):
+                metadata = dict(original or {})
+                if not metadata.get("symbol"):
+                    metadata["symbol"] = chunk_symbol(metadata) or None
+                metadata = self._clean_metadata(metadata)
+                if metadata != (original or {}):
+                    changed_ids.append(doc_id)
+                    changed_metadatas.append(metadata)
+            if changed_ids and not dry_run:
+                for i in range(0, len(changed_ids), self._max_batch_size):
+                    await self._call(
+                        collection.update,
+                        ids=changed_ids[i:i + self._max_batch_size],
+                        metadatas=changed_metadatas[i:i + self._max_batch_size],
+                    )
+            scanned += len(ids)
+            updated += len(changed_ids)
+            offset += len(ids)
+
+        logger.info(
+            "🔢 Метаданные %s: просмотрено %s, %s %s",
+            project,
+            scanned,
+            "к обновлению" if dry_run else "обновлено",
+            updated,
+        )
+        return {"scanned": scanned, "updated": updated}
+
+    @staticmethod
+    def _clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Санитизация метаданных: простые типы, числа остаются числами, короткие строки."""
+        clean: Dict[str, Any] = {}
+        for key, value in metadata.items():
+            if value is None:
+                continue
+            if key in INT_METADATA_FIELDS:
+                try:
+                    clean[key] = int(value)
+                except (TypeError, ValueError):
+                    pass
+            elif isinstance(value, bool):
+                clean[key] = value
+            elif isinstance(value, (int, float)):
+                clean[key] = value
+            elif isinstance(value, str):
+                clean[key] = value[:200]
+            elif isinstance(value, list):
+                # Конвертируем списки в строки
+                clean[key] = ", ".join(str(v)[:50] for v in value[:5])
+        return clean
+
     async def get_project_config(self, project: str) -> Optional[Dict[str, Any]]:
         """Получение конфигурации проекта."""
         try:
@@ -105,81 +673,133 @@ class ChromaClient:
             return None
 
     async def get_project_stats(self, project: str) -> Dict[str, Any]:
-        """Получение статистики проекта."""
+        """Получение статистики проекта (из счётчиков в Redis)."""
         try:
-            collection = await self._get_project_collection(project)
-            total_chunks = await asyncio.to_thread(collection.count)
-
-            metadatas_result = await asyncio.to_thread(
-                collection.get,
-                ids=None,
-                include=["metadatas"],
-            )
-            metadatas = metadatas_result.get("metadatas", []) or []
-
-            files = {
-                metadata.get("file")
-                for metadata in metadatas
-                if metadata and metadata.get("file")
-            }
-            file_types: Dict[str, int] = {}
-            for metadata in metadatas:
-                if not metadata:
-                    continue
-                file_type = metadata.get("type")
-                if file_type:
-                    file_types[file_type] = file_types.get(file_type, 0) + 1
-
-            return {
-                "total_chunks": total_chunks,
-                "total_files": len(files),
-                "file_types": file_types,
-                "last_indexed": None,
-            }
+            stats = await self.index_stats.get_project(project)
+            if stats is None:
+                # Счётчиков ещё нет - однократно строим их по коллекции
+                collection = await self._get_project_collection(project)
+                stats = await self.index_stats.reconcile(project, collection)
+            return stats
         except Exception as error:
             logger.error(
                 "Ошибка получения статистики проекта %s: %s", project, error, exc_info=True
             )
             return {"total_chunks": 0, "total_files": 0, "file_types": {}}
 
+    async def reconcile_project_stats(self, project: str) -> Dict[str, Any]:
+        """Сверка счётчиков и таблицы символов проекта с фактическим содержимым коллекции."""
+        collection = await self._get_project_collection(project)
+        await self.symbol_index.rebuild(project, collection)
+        await self.qa_store.rebuild(project, collection, await self._get_qa_collection(project))
+        return await self.index_stats.reconcile(project, collection)
+
+    async def match_qa(self, project: str, query: str) -> Optional[Dict[str, Any]]:
+        """Готовый ответ из QA хранилища (точный или близкий вопрос) или None."""
+        if project not in self._qa_backfills and not await self.qa_store.has_data(project):
+            # QA пары, загруженные до появления хранилища: разово собираем в фоне
+            collections = [await self._get_project_collection(project), await self._get_qa_collection(project)]
+            self._qa_backfills[project] = asyncio.create_task(self.qa_store.rebuild(project, *collections))
+            return None
+        return await self.qa_store.match(project, query)
+
+    async def refresh_dataset_counts(self, names: List[str]) -> Dict[str, int]:
+        """Обновление счётчиков коллекций датасетов (collection.count, без выборки ID)."""
+        if self.client is None:
+            raise RuntimeError("ChromaDB клиент не инициализирован")
+
+        counts: Dict[str, int] = {}
+        for name in names:
+            collection = await self._call(self.client.get_or_create_collection, name)
+            counts[name] = await self._call(collection.count)
+            await self.index_stats.set_dataset_count(name, counts[name])
+        return counts
+
     async def get_global_stats(self) -> Dict[str, Any]:
-        """Получение глобальной статистики по всем коллекциям."""
+        """Получение глобальной статистики по всем коллекциям (кэшируется на короткий TTL)."""
         if self.client is None:
             raise RuntimeError("ChromaDB клиент не инициализирован")
 
+        now = time.monotonic()
+        if self._global_stats_cache and now - self._global_stats_cache[0] < GLOBAL_STATS_TTL_SEC:
+            return self._global_stats_cache[1]
+
         try:
-            collections = await asyncio.to_thread(self.client.list_collections)
-            total_chunks = 0
-            total_projects = 0
+            collections = await self._call(self.client.list_collections)
+            # Разделы дублируют чанки основной коллекции - не считаем их дважды
+            collections = [
+                collection for collection in collections if PARTITION_SEPARATOR not in collection.name
+            ]
+            semaphore = asyncio.Semaphore(GLOBAL_STATS_CONCURRENCY)
+
+            async def count(collection) -> int:
+                async with semaphore:
+                    try:
+                        return await self._call(collection.count)
+                    except Exception as error:
+                        logger.warning("Не удалось посчитать коллекцию %s: %s", collection.name, error)
+                        return 0
 
-            for collection in collections:
-                count = await asyncio.to_thread(collection.count)
-                total_chunks += count
-                if collection.name.startswith("kb_"):
-                    total_projects += 1
+            counts, project_stats = await asyncio.gather(
+                asyncio.gather(*(count(collection) for collection in collections)),
+                self.index_stats.get_projects(await asyncio.to_thread(self.project_names)),
+            )
+
+            total_chunks = sum(counts)
+            total_projects = sum(1 for collection in collections if collection.name.startswith("kb_"))
+            # Размер: тексты документов (по счётчикам проектов) + float32 векторы всех коллекций
+            document_bytes = sum(stats.get("document_bytes", 0) for stats in project_stats.values())
+            indexed = [stats["last_indexed"] for stats in project_stats.values() if stats.get("last_indexed")]
 
-            return {
+            result = {
                 "total_chunks": total_chunks,
                 "total_projects": total_projects,
-                "total_files": 0,
-                "storage_size": 0,
-                "last_updated": None,
+                "total_files": sum(stats.get("total_files", 0) for stats in project_stats.values()),
+                "storage_size": document_bytes + total_chunks * EMBEDDING_DIM * 4,
+                "last_updated": max(indexed) if indexed else None,
             }
+            self._global_stats_cache = (now, result)
+            return result
         except Exception as error:
             logger.error("Ошибка получения глобальной статистики: %s", error, exc_info=True)
             return {"total_chunks": 0, "total_projects": 0, "total_files": 0}
 
+    @staticmethod
+    def project_names() -> List[str]:
+        """Имена проектов из config/projects.yaml."""
+        config_path = "config/projects.yaml"
+        if not os.path.exists(config_path):
+            return []
+        with open(config_path, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file) or {}
+        return [item["name"] for item in config.get("projects", [])]
+
     async def _get_project_collection(self, project: str):
-        if self.client is None:
-            raise RuntimeError("ChromaDB клиент не инициализирован")
+        name = self._make_collection_name(project)
+        if name in self._collections:
+            return self._collections[name]
+        return await self._call(self.get_collection, project)
 
-        collection_name = self._make_collection_name(project)
-        return await asyncio.to_thread(
-            self.client.get_or_create_collection,
-            name=collection_name,
-            metadata={"description": f"Knowledge base for {project}"},
-        )
+    async def _get_qa_collection(self, project: str):
+        name = self._make_qa_collection_name(project)
+        if name in self._collections:
+            return self._collections[name]
+        return await self._call(self.get_qa_collection, project)
+
+    async def _get_partition_collection(self, project: str, doc_type: str):
+        name = self._make_partition_name(project, doc_type)
+        if name in self._collections:
+            return self._collections[name]
+        return await self._call(self.get_partition, project, doc_type)
 
     @staticmethod
     def _make_collection_name(project: str) -> str:
         return f"kb_{project.replace('-', '_')}"
+
+    @staticmethod
+    def _make_qa_collection_name(project: str) -> str:
+        return f"qa_{project.replace('-', '_')}"
+
+    @classmethod
+    def _make_partition_name(cls, project: str, doc_type: str) -> str:
+        return f"{cls._make_collection_name(project)}{PARTITION_SEPARATOR}{doc_type}"
@@ -0,0 +1,41 @@
+"""
+Стабильные ID чанков в векторной БД
+
+Встроенный hash() в Python солится на каждый запуск процесса, поэтому ID вида
+f"{project}_{hash(...)}" при каждой переиндексации получались новыми и чанки
+дублировались. ID ниже зависит только от содержимого чанка.
+"""
+import hashlib
+from typing import Any, Dict, Tuple
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def chunk_symbol(metadata: Dict[str, Any]) -> str:
+    """Имя сущности, к которой относится чанк (функция, класс, секция, вопрос)"""
+    for key in ("function_name", "class_name", "section", "question"):
+        value = metadata.get(key)
+        if value:
+            return str(value)
+    return ""
+
+
+def chunk_key(metadata: Dict[str, Any], content: str) -> Tuple[str, str, str, str]:
+    """Ключ идентичности чанка: (file, type, symbol, content digest)"""
+    return (
+        str(metadata.get("file", "")),
+        str(metadata.get("type", "")),
+        chunk_symbol(metadata),
+        content_digest(content),
+    )
+
+
+def stable_id_for_key(project: str, key: Tuple[str, str, str, str]) -> str:
+    raw = "|".join(key)
+    return f"{project}_{hashlib.sha1(raw.encode('utf-8', errors='ignore')).hexdigest()[:24]}"
+
+
+def stable_chunk_id(project: str, metadata: Dict[str, Any], content: str) -> str:
+    return stable_id_for_key(project, chunk_key(metadata, content))
@@ -0,0 +1,67 @@
+"""
+Circuit breaker для внешних сервисов (ChromaDB)
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Сервис помечен как недоступный, вызов отклонён без обращения к нему"""
+
+
+class CircuitBreaker:
+    """Классический автомат closed → open → half-open.
+
+    После ``failure_threshold`` ошибок подряд цепь размыкается на
+    ``reset_timeout`` секунд; затем пропускается одна пробная попытка,
+    успех которой снова замыкает цепь.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Бросает CircuitOpenError, если вызов сейчас нельзя пропускать."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probe_in_flight):
+            raise CircuitOpenError(f"{self.name}: circuit open, сервис временно недоступен")
+        if state == "half_open":
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.failures >= self.failure_threshold:
+            logger.info("%s: circuit закрыт, сервис снова доступен", self.name)
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def abort_probe(self) -> None:
+        """Вызов прерван без ответа сервиса (отмена, бюджет времени): пробу можно повторить."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.failures == self.failure_threshold:
+                logger.warning(
+                    "%s: circuit разомкнут на %.0f с после %s ошибок подряд",
+                    self.name,
+                    self.reset_timeout,
+                    self.failures,
+                )
@@ -0,0 +1,115 @@
+"""
+Дедупликация коллекций kb_* и миграция ID на стабильную схему
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple
+
+from .chunk_ids import chunk_key, stable_id_for_key
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionDeduplicator:
+    """Оставляет одну копию на (file, type, symbol, digest) и переписывает её ID.
+
+    Эмбеддинги не пересчитываются: канонический документ копируется под новым
+    ID вместе с сохранённым вектором, после чего старые ID удаляются.
+    """
+
+    def __init__(self, collection, project: str, page_size: int = 500, batch_size: int = 500):
+        self.collection = collection
+        self.project = project
+        self.page_size = page_size
+        self.batch_size = batch_size
+
+    async def scan(self) -> Dict[Tuple[str, str, str, str], List[str]]:
+        """Группировка ID по ключу идентичности (постранично через limit/offset)"""
+        groups: Dict[Tuple[str, str, str, str], List[str]] = {}
+        offset = 0
+
+        while True:
+            page = await asyncio.to_thread(
+                self.collection.get,
+                include=["metadatas", "documents"],
+                limit=self.page_size,
+                offset=offset,
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for doc_id, metadata, document in zip(
+                ids, page.get("metadatas") or [], page.get("documents") or []
+            ):
+                groups.setdefault(chunk_key(metadata or {}, document or ""), []).append(doc_id)
+            offset += len(ids)
+            logger.info("🔎 Просканировано %s документов", offset)
+
+        return groups
+
+    def plan(self, groups: Dict[Tuple[str, str, str, str], List[str]]) -> Dict[str, Any]:
+        """Выбор канонических копий: что переименовать и что удалить"""
+        renames: Dict[str, str] = {}
+        duplicates: List[str] = []
+        top_groups = []
+
+        for key, ids in groups.items():
+            new_id = stable_id_for_key(self.project, key)
+            canonical = new_id if new_id in ids else ids[0]
+            duplicates.extend(doc_id for doc_id in ids if doc_id != canonical)
+            if canonical != new_id:
+                renames[canonical] = new_id
+            if len(ids) > 1:
+                top_groups.append({"file": key[0], "type": key[1], "symbol": key[2], "copies": len(ids)})
+
+        top_groups.sort(key=lambda group: group["copies"], reverse=True)
+        return {"renames": renames, "duplicates": duplicates, "top_groups": top_groups[:20]}
+
+    async def run(self, dry_run: bool = True) -> Dict[str, Any]:
+        groups = await self.scan()
+        plan = self.plan(groups)
+        renames, duplicates = plan["renames"], plan["duplicates"]
+
+        if not dry_run:
+            await self._rewrite_ids(renames)
+            to_delete = duplicates + list(renames)
+            for i in range(0, len(to_delete), self.batch_size):
+                await asyncio.to_thread(self.collection.delete, ids=to_delete[i:i + self.batch_size])
+
+        report = {
+            "project": self.project,
+            "dry_run": dry_run,
+            "scanned": sum(len(ids) for ids in groups.values()),
+            "unique": len(groups),
+            "duplicates_removed": len(duplicates),
+            "ids_rewritten": len(renames),
+            "top_duplicated": plan["top_groups"],
+        }
+        logger.info(
+            "🧽 Дедупликация %s: документов=%s, уникальных=%s, дублей=%s, переименовано=%s%s",
+            self.project,
+            report["scanned"],
+            report["unique"],
+            report["duplicates_removed"],
+            report["ids_rewritten"],
+            " (dry run)" if dry_run else "",
+        )
+        return report
+
+    async def _rewrite_ids(self, renames: Dict[str, str]) -> None:
+        """Копирование канонических документов под стабильные ID (с сохранёнными векторами)"""
+        old_ids = list(renames)
+        for i in range(0, len(old_ids), self.batch_size):
+            batch = old_ids[i:i + self.batch_size]
+            page = await asyncio.to_thread(
+                self.collection.get,
+                ids=batch,
+                include=["embeddings", "metadatas", "documents"],
+            )
+            await asyncio.to_thread(
+                self.collection.upsert,
+                ids=[renames[doc_id] for doc_id in page["ids"]],
+                embeddings=page["embeddings"],
+                metadatas=page["metadatas"],
+                documents=page["documents"],
+            )
@@ -0,0 +1,188 @@
+"""
+Инкрементальная статистика индекса в Redis
+
+Счётчики поддерживаются конвейером индексации, поэтому /api/stats/{project}
+и /api/datasets/metrics отдаются за O(1) без сканирования метаданных ChromaDB.
+Дрейф (QA пары, ручные загрузки, удаления) исправляет периодическая сверка.
+
+Ключи:
+    stats:{project}        HASH  chunks, files, bytes, last_indexed, index_duration_sec, reconciled_at
+    stats:{project}:types  HASH  type -> количество чанков
+    stats:{project}:files  HASH  file -> {"chunks": n, "bytes": n, "types": {type: n}}
+    stats:{project}:version STRING  счётчик изменений индекса (инвалидирует кэш ответов LLM)
+    stats:datasets         HASH  collection -> количество документов
+"""
+import asyncio
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+DATASETS_KEY = "stats:datasets"
+
+
+def _text_bytes(text: Optional[str]) -> int:
+    return len(text.encode("utf-8", errors="ignore")) if text else 0
+
+
+class IndexStats(RedisStore):
+    """Счётчики по проектам (Redis HASH), синхронный redis вызывается через to_thread."""
+
+    key_prefix = "stats"
+    # Статистика не должна ломать индексацию
+    unavailable_message = "Статистика в Redis недоступна"
+
+    async def record_file(self, project: str, file_path: str, chunks: List[Dict[str, Any]]) -> None:
+        """Файл проиндексирован заново: заменяем его вклад в счётчики."""
+        types = Counter(chunk.get("type", "") for chunk in chunks)
+        entry = {
+            "chunks": len(chunks),
+            "bytes": sum(_text_bytes(chunk.get("content")) for chunk in chunks),
+            "types": dict(types),
+        }
+        await self._safe(self._replace_files, project, {file_path: entry})
+
+    async def remove_files(self, project: str, files: Iterable[str]) -> None:
+        """Файлы удалены из индекса (сборка мусора)."""
+        await self._safe(self._replace_files, project, {file_path: None for file_path in files})
+
+    async def finish_run(self, project: str, duration_sec: float) -> None:
+        """Отметка о завершённой индексации."""
+        await self._safe(
+            self.client.hset,
+            f"stats:{project}",
+            mapping={
+                "last_indexed": datetime.utcnow().isoformat() + "Z",
+                "index_duration_sec": round(duration_sec, 3),
+            },
+        )
+
+    async def bump_version(self, project: str) -> None:
+        """Чанки проекта записаны или удалены."""
+        await self._safe(self.client.incr, f"stats:{project}:version")
+
+    async def get_version(self, project: str) -> Optional[int]:
+        """Версия индекса проекта; None - Redis недоступен."""
+        return await self._safe(self._read_version, project)
+
+    async def get_project(self, project: str) -> Optional[Dict[str, Any]]:
+        """Статистика проекта или None, если счётчиков ещё нет."""
+        result = await self._safe(self._read_project, project)
+        return result or None
+
+    async def set_dataset_count(self, name: str, count: int) -> None:
+        await self._safe(self.client.hset, DATASETS_KEY, name, count)
+
+    async def get_dataset_counts(self) -> Dict[str, int]:
+        raw = await self._safe(self.client.hgetall, DATASETS_KEY) or {}
+        return {key.decode(): int(value) for key, value in raw.items()}
+
+    async def reconcile(self, project: str, collection, page_size: int = 1000) -> Dict[str, Any]:
+        """Пересчёт счётчиков по фактическому содержимому коллекции (постранично)."""
+        files: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+
+        while True:
+            page = await asyncio.to_thread(
+                collection.get, include=["metadatas", "documents"], limit=page_size, offset=offset
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for metadata, document in zip(page.get("metadatas") or [], page.get("documents") or []):
+                metadata = metadata or {}
+                entry = files.setdefault(
+                    metadata.get("file", ""), {"chunks": 0, "bytes": 0, "types": {}}
+                )
+                entry["chunks"] += 1
+                entry["bytes"] += _text_bytes(document)
+                doc_type = metadata.get("type", "")
+                entry["types"][doc_type] = entry["types"].get(doc_type, 0) + 1
+            offset += len(ids)
+
+        await self._safe(self._write_snapshot, project, files)
+        logger.info("📊 Сверка статистики %s: %s чанков, %s файлов", project, offset, len(files))
+        return await self.get_project(project) or {}
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _replace_files(self, project: str, entries: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        files_key = f"stats:{project}:files"
+        names = list(entries)
+        old_raw = self.client.hmget(files_key, names) if names else []
+
+        pipe = self.client.pipeline()
+        for file_path, old, new in zip(names, old_raw, entries.values()):
+            old = json.loads(old) if old else None
+            if old is None and new is None:
+                continue
+            old_types = Counter(old["types"]) if old else Counter()
+            new_types = Counter(new["types"]) if new else Counter()
+            chunks_delta = (new["chunks"] if new else 0) - (old["chunks"] if old else 0)
+            bytes_delta = (new.get("bytes", 0) if new else 0) - (old.get("bytes", 0) if old else 0)
+            files_delta = (1 if new else 0) - (1 if old else 0) if file_path else 0
+
+            if new is None:
+                pipe.hdel(files_key, file_path)
+            else:
+                pipe.hset(files_key, file_path, json.dumps(new, ensure_ascii=False))
+            if chunks_delta:
+                pipe.hincrby(f"stats:{project}", "chunks", chunks_delta)
+            if bytes_delta:
+                pipe.hincrby(f"stats:{project}", "bytes", bytes_delta)
+            if files_delta:
+                pipe.hincrby(f"stats:{project}", "files", files_delta)
+            for doc_type in set(old_types) | set(new_types):
+                delta = new_types[doc_type] - old_types[doc_type]
+                if delta:
+                    pipe.hincrby(f"stats:{project}:types", doc_type, delta)
+        pipe.execute()
+
+    def _write_snapshot(self, project: str, files: Dict[str, Dict[str, Any]]) -> None:
+        types: Counter = Counter()
+        for entry in files.values():
+            types.update(entry["types"])
+        summary = {
+            "chunks": sum(entry["chunks"] for entry in files.values()),
+            "bytes": sum(entry["bytes"] for entry in files.values()),
+            "files": len([file_path for file_path in files if file_path]),
+            "reconciled_at": datetime.utcnow().isoformat() + "Z",
+        }
+
+        pipe = self.client.pipeline()
+        self._replace_hash(
+            pipe, f"stats:{project}:files", {k: json.dumps(v, ensure_ascii=False) for k, v in files.items()}
+        )
+        self._replace_hash(pipe, f"stats:{project}:types", dict(types))
+        pipe.hset(f"stats:{project}", mapping=summary)
+        pipe.execute()
+
+    def _read_project(self, project: str) -> Dict[str, Any]:
+        pipe = self.client.pipeline()
+        pipe.hgetall(f"stats:{project}")
+        pipe.hgetall(f"stats:{project}:types")
+        summary_raw, types_raw = pipe.execute()
+        if not summary_raw:
+            return {}
+        summary = {key.decode(): value.decode() for key, value in summary_raw.items()}
+        return {
+            "total_chunks": int(summary.get("chunks", 0)),
+            "total_files": int(summary.get("files", 0)),
+            "document_bytes": int(summary.get("bytes", 0)),
+            "file_types": {
+                key.decode(): int(value) for key, value in types_raw.items() if int(value) > 0
+            },
+            "last_indexed": summary.get("last_indexed"),
+            "index_duration_sec": float(summary["index_duration_sec"]) if "index_duration_sec" in summary else None,
+            "reconciled_at": summary.get("reconciled_at"),
+        }
+
+    async def get_projects(self, projects: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Статистика нескольких проектов (проекты без счётчиков пропускаются)."""
+        results = await asyncio.gather(*(self.get_project(project) for project in projects))
+        return {project: stats for project, stats in zip(projects, results) if stats}
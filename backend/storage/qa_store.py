@@ -0,0 +1,239 @@
+"""
+Хранилище QA пар с точным и близким поиском вопроса без векторной БД
+
+QA пары (золотой набор, сгенерированные, обучающие) разбираются на вопрос и
+ответ один раз - при записи - и хранятся в Redis вместе с эмбеддингом вопроса.
+В процессе держится словарь нормализованный вопрос → пара и маленькая матрица
+эмбеддингов вопросов: точное совпадение отвечает сразу, близкое ищется
+скалярным произведением по этой матрице, не трогая коллекцию с кодом.
+Перезагрузка таблицы только читает векторы из Redis, модель не вызывается.
+
+Ключи:
+    qa:{project}          HASH  нормализованный вопрос -> {"question", "answer", "chunk_id", "file", "lines"}
+    qa:{project}:vectors  HASH  нормализованный вопрос -> нормированный эмбеддинг вопроса (float32 байты)
+    qa:{project}:version  STRING  счётчик изменений (инвалидирует кэш процессов)
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import redis
+
+from ..rag.embeddings import aembed_query, aembed_texts
+from .redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+# Порог косинусной близости вопроса для ответа без векторного поиска
+QA_NEAR_THRESHOLD = float(os.getenv("QA_NEAR_THRESHOLD", "0.9"))
+QA_VERSION_CHECK_SEC = float(os.getenv("QA_VERSION_CHECK_SEC", "2"))
+
+_QUESTION_RE = re.compile(r"^\s*вопрос:\s*", re.IGNORECASE)
+_ANSWER_RE = re.compile(r"\n\s*ответ:\s*", re.IGNORECASE)
+_PUNCT_RE = re.compile(r"[^\w\s/]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Регистр, ё/е, пунктуация и пробелы не влияют на совпадение."""
+    text = text.lower().replace("ё", "е")
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def split_qa(content: str, metadata: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Вопрос и ответ из документа "Вопрос: … Ответ: …" (форматы всех загрузчиков)."""
+    parts = _ANSWER_RE.split(content, maxsplit=1)
+    if len(parts) != 2:
+        return None
+    question = metadata.get("question") or _QUESTION_RE.sub("", parts[0]).strip()
+    # train_qa_pairs дописывает после ответа служебный блок "---\nКатегория: …"
+    answer = parts[1].split("\n---\n", 1)[0].strip()
+    if not question or not answer:
+        return None
+    return question, answer
+
+
+class _QATable:
+    """Словарь точных совпадений и матрица нормированных эмбеддингов вопросов."""
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]], vectors: Dict[str, np.ndarray]) -> None:
+        self.entries = entries
+        # Вопросы без сохранённого вектора (записаны до его появления) ищутся только точно
+        self.keys = [key for key in entries if key in vectors]
+        self.matrix = np.stack([vectors[key] for key in self.keys]) if self.keys else None
+
+    def nearest(self, query_vector: np.ndarray) -> Tuple[Optional[Dict[str, Any]], float]:
+        if self.matrix is None:
+            return None, 0.0
+        scores = self.matrix @ query_vector
+        best = int(np.argmax(scores))
+        return self.entries[self.keys[best]], float(scores[best])
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class QAStore(RedisStore):
+    """QA пары по проектам: запись в Redis, поиск по кэшу процесса."""
+
+    key_prefix = "qa"
+    unavailable_message = "QA хранилище в Redis недоступно"
+
+    def __init__(self, client: Optional[redis.Redis] = None) -> None:
+        super().__init__(client)
+        # project -> (версия, время проверки, таблица)
+        self._tables: Dict[str, Tuple[int, float, _QATable]] = {}
+        self._reload_lock = asyncio.Lock()
+
+    async def record_chunks(
+        self, project: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """Запоминаем QA пары среди только что записанных чанков."""
+        entries = {}
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            entry = self._entry(chunk_id, document, metadata)
+            if entry:
+                entries[normalize_question(entry["question"])] = entry
+        if entries:
+            await self._safe(self._write, project, *await self._serialize(entries))
+
+    async def rebuild(self, project: str, *collections, page_size: int = 1000) -> int:
+        """Полная пересборка по QA парам коллекций (бэкфилл и после дедупликации)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        for collection in collections:
+            offset = 0
+            while True:
+                page = await asyncio.to_thread(
+                    collection.get,
+                    where={"type": "qa_pair"},
+                    include=["documents", "metadatas"],
+                    limit=page_size,
+                    offset=offset,
+                )
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                for chunk_id, document, metadata in zip(
+                    ids, page.get("documents") or [], page.get("metadatas") or []
+                ):
+                    entry = self._entry(chunk_id, document or "", metadata or {})
+                    if entry:
+                        entries[normalize_question(entry["question"])] = entry
+                offset += len(ids)
+
+        # Сверка идёт периодически: эмбеддинги уже известных вопросов не пересчитываем
+        known = await self._safe(self.client.hgetall, f"qa:{project}:vectors") or {}
+        await self._safe(self._write_snapshot, project, *await self._serialize(entries, known))
+        logger.info("❓ QA хранилище %s: %s вопросов", project, len(entries))
+        return len(entries)
+
+    async def has_data(self, project: str) -> bool:
+        return bool(await self._safe(self.client.exists, f"qa:{project}:version"))
+
+    async def match(self, project: str, query: str) -> Optional[Dict[str, Any]]:
+        """Точное совпадение нормализованного вопроса, иначе ближайший вопрос выше порога."""
+        table = await self._get_table(project)
+        if table is None or not table.entries:
+            return None
+
+        entry = table.entries.get(normalize_question(query))
+        if entry:
+            return {**entry, "score": 1.0, "match": "exact"}
+
+        entry, score = table.nearest(_unit(await aembed_query(query)))
+        if entry and score >= QA_NEAR_THRESHOLD:
+            return {**entry, "score": score, "match": "near"}
+        return None
+
+    # --- внутреннее ---
+
+    @staticmethod
+    def _entry(chunk_id: str, document: str, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if metadata.get("type") != "qa_pair":
+            return None
+        parsed = split_qa(document, metadata)
+        if not parsed:
+            return None
+        question, answer = parsed
+        return {
+            "question": question,
+            "answer": answer,
+            "chunk_id": chunk_id,
+            "file": metadata.get("file", ""),
+            "lines": metadata.get("lines", ""),
+        }
+
+    async def _get_table(self, project: str) -> Optional[_QATable]:
+        cached = self._tables.get(project)
+        now = time.monotonic()
+        if cached and now - cached[1] < QA_VERSION_CHECK_SEC:
+            return cached[2]
+
+        version = await self._safe(self._read_version, project)
+        if version is None:
+            return cached[2] if cached else None
+        if cached and cached[0] == version:
+            self._tables[project] = (version, now, cached[2])
+            return cached[2]
+
+        async with self._reload_lock:
+            loaded = await self._safe(self._read_table, project)
+            if loaded is None:
+                return cached[2] if cached else None
+            table = _QATable(*loaded)
+            self._tables[project] = (version, time.monotonic(), table)
+            logger.info("❓ QA хранилище %s загружено: %s вопросов", project, len(table.entries))
+            if len(table.keys) < len(table.entries):
+                logger.warning(
+                    "QA хранилище %s: у %s вопросов нет эмбеддинга, близкий поиск по ним отключён "
+                    "до ближайшей сверки статистики",
+                    project, len(table.entries) - len(table.keys),
+                )
+            return table
+
+    @staticmethod
+    async def _serialize(
+        entries: Dict[str, Dict[str, Any]], known: Optional[Dict[bytes, bytes]] = None
+    ) -> Tuple[Dict[str, str], Dict[str, bytes]]:
+        """JSON записей и эмбеддинги вопросов - считаются один раз, при записи."""
+        known = known or {}
+        vectors = {key: known[key.encode()] for key in entries if key.encode() in known}
+        missing = [key for key in entries if key not in vectors]
+        if missing:
+            embedded = await aembed_texts([entries[key]["question"] for key in missing])
+            vectors.update((key, _unit(vector).tobytes()) for key, vector in zip(missing, embedded))
+        return {key: json.dumps(entry, ensure_ascii=False) for key, entry in entries.items()}, vectors
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _write(self, project: str, entries: Dict[str, str], vectors: Dict[str, bytes]) -> None:
+        pipe = self.client.pipeline()
+        pipe.hset(f"qa:{project}", mapping=entries)
+        pipe.hset(f"qa:{project}:vectors", mapping=vectors)
+        pipe.incr(f"qa:{project}:version")
+        pipe.execute()
+
+    def _write_snapshot(self, project: str, entries: Dict[str, str], vectors: Dict[str, bytes]) -> None:
+        pipe = self.client.pipeline()
+        self._replace_hash(pipe, f"qa:{project}", entries)
+        self._replace_hash(pipe, f"qa:{project}:vectors", vectors)
+        pipe.incr(f"qa:{project}:version")
+        pipe.execute()
+
+    def _read_table(self, project: str) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, np.ndarray]]:
+        pipe = self.client.pipeline()
+        pipe.hgetall(f"qa:{project}")
+        pipe.hgetall(f"qa:{project}:vectors")
+        entries_raw, vectors_raw = pipe.execute()
+        entries = {key.decode(): json.loads(value) for key, value in entries_raw.items()}
+        vectors = {key.decode(): np.frombuffer(value, dtype=np.float32) for key, value in vectors_raw.items()}
+        return entries, vectors
@@ -0,0 +1,77 @@
+"""
+Распределённая блокировка на Redis (SET NX + heartbeat)
+"""
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Продлеваем/снимаем блокировку только если она всё ещё наша
+_EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Блокировка с TTL, которую держатель продлевает фоновым heartbeat.
+
+    Если процесс-держатель умер, ключ истекает через ``ttl`` секунд и
+    блокировку может взять другой воркер.
+    """
+
+    def __init__(self, client: redis.Redis, name: str, ttl: float = 60.0) -> None:
+        self.client = client
+        self.name = name
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._extend = client.register_script(_EXTEND_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        """Попытка взять блокировку (без ожидания)."""
+        acquired = await asyncio.to_thread(
+            self.client.set, self.name, self.token, nx=True, px=int(self.ttl * 1000)
+        )
+        if acquired:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return bool(acquired)
+
+    async def release(self) -> None:
+        """Снятие блокировки и остановка heartbeat."""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        try:
+            await asyncio.to_thread(self._release, keys=[self.name], args=[self.token])
+        except redis.RedisError as error:
+            logger.warning("Не удалось снять блокировку %s: %s", self.name, error)
+
+    async def _heartbeat(self) -> None:
+        interval = max(self.ttl / 3, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                extended = await asyncio.to_thread(
+                    self._extend, keys=[self.name], args=[self.token, int(self.ttl * 1000)]
+                )
+            except redis.RedisError as error:
+                logger.warning("Heartbeat блокировки %s не прошёл: %s", self.name, error)
+                continue
+            if not extended:
+                logger.warning("Блокировка %s потеряна (истёк TTL)", self.name)
+                return
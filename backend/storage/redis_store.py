@@ -0,0 +1,62 @@
+"""
+Общая основа хранилищ поверх Redis (статистика, символы, QA пары, кэш ответов)
+
+Все они - ускорители: синхронный redis вызывается через to_thread, а ошибка
+Redis только логируется и возвращает None, чтобы индексация и ответы работали
+без них. Раскладку ключей каждое хранилище задаёт само.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import redis
+
+from ..architecture.storage import get_redis_client
+
+
+class RedisStore:
+    """Ленивый клиент Redis, безопасные вызовы и атомарная подмена HASH."""
+
+    # Префикс ключей хранилища: {prefix}:{project}, {prefix}:{project}:version
+    key_prefix = ""
+    # Что недоступно - для предупреждения в логе
+    unavailable_message = "Хранилище в Redis недоступно"
+
+    def __init__(self, client: Optional[redis.Redis] = None) -> None:
+        self._client = client
+        self._logger = logging.getLogger(type(self).__module__)
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = get_redis_client()
+        return self._client
+
+    async def _safe(self, func, *args, **kwargs):
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        except redis.RedisError as error:
+            self._logger.warning("%s: %s", self.unavailable_message, error)
+            return None
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _read_version(self, project: str) -> int:
+        return int(self.client.get(f"{self.key_prefix}:{project}:version") or 0)
+
+    def _write_snapshot(self, project: str, entries: Dict[str, Any]) -> None:
+        """Полная замена записей проекта и новая версия (после пересборки)."""
+        pipe = self.client.pipeline()
+        self._replace_hash(pipe, f"{self.key_prefix}:{project}", entries)
+        pipe.incr(f"{self.key_prefix}:{project}:version")
+        pipe.execute()
+
+    @staticmethod
+    def _replace_hash(pipe, key: str, mapping: Dict[str, Any]) -> None:
+        """Пишем во временный ключ и атомарно подменяем (как arch:graph)."""
+        if mapping:
+            pipe.delete(f"{key}:new")
+            pipe.hset(f"{key}:new", mapping=mapping)
+            pipe.rename(f"{key}:new", key)
+        else:
+            pipe.delete(key)
@@ -0,0 +1,224 @@
+"""
+Таблица символов проекта: функции, классы и пути роутов → чанки
+
+Заполняется при записи чанков и хранится в Redis (по записи на чанк, поэтому
+удаление чанков в GC снимает и их символы). В процессе держится отсортированный
+список ключей: точный поиск, префикс через bisect и нечёткий поиск по соседям
+с тем же началом - всё без эмбеддинга и обращения к ChromaDB.
+
+Ключи:
+    symbols:{project}          HASH  chunk_id -> {"name", "qualname", "route", "kind", "file", "start_line", "end_line"}
+    symbols:{project}:version  STRING  счётчик изменений (инвалидирует кэш процессов)
+"""
+import asyncio
+import difflib
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+
+from .chunk_ids import chunk_symbol
+from .redis_store import RedisStore
+
+logger = logging.getLogger(__name__)
+
+# Типы чанков, которые попадают в таблицу символов
+SYMBOL_TYPES = {"function", "class"}
+# Как часто процесс сверяет версию таблицы в Redis
+SYMBOL_VERSION_CHECK_SEC = float(os.getenv("SYMBOL_VERSION_CHECK_SEC", "2"))
+FUZZY_CUTOFF = 0.85
+
+# Идентификаторы в тексте запроса: snake_case, CamelCase, a.b.c и пути /a/b
+_IDENTIFIER_RE = re.compile(r"/[\w\-/{}]+|[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+
+def symbol_entry(metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Запись таблицы символов для чанка или None, если чанк не описывает символ."""
+    if metadata.get("type") not in SYMBOL_TYPES:
+        return None
+    name = metadata.get("symbol") or chunk_symbol(metadata)
+    if not name:
+        return None
+    file_path = str(metadata.get("file", ""))
+    module = os.path.splitext(file_path)[0].strip("/").replace("/", ".")
+    return {
+        "name": name,
+        "qualname": f"{module}.{name}" if module else name,
+        "route": metadata.get("route_path") or "",
+        "kind": metadata.get("type"),
+        "file": file_path,
+        "start_line": metadata.get("start_line"),
+        "end_line": metadata.get("end_line"),
+    }
+
+
+def _is_compound(token: str) -> bool:
+    """snake_case, CamelCase, a.b.c или путь роута - явно идентификатор, а не слово."""
+    return token.startswith("/") or "_" in token or "." in token or bool(re.search(r"[a-z][A-Z]", token))
+
+
+def query_identifiers(query: str) -> List[str]:
+    """Похожие на идентификаторы токены запроса (обычные слова отбрасываются)."""
+    tokens = []
+    for token in _IDENTIFIER_RE.findall(query):
+        token = token.rstrip("./")
+        # Имя класса из одного слова (Shift, Object) тоже берём, но ищем его только точно
+        if token and (_is_compound(token) or (token[0].isupper() and len(token) > 3)):
+            tokens.append(token)
+    return list(dict.fromkeys(tokens))
+
+
+class SymbolTable:
+    """Отсортированные ключи (короткое имя, полное имя, путь роута) → записи символов."""
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk_id, entry in entries.items():
+            entry = {**entry, "chunk_id": chunk_id}
+            for key in (entry["name"], entry["qualname"], entry.get("route")):
+                if key:
+                    self._by_key.setdefault(key.lower(), []).append(entry)
+        self._keys = sorted(self._by_key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def exact(self, name: str) -> List[Dict[str, Any]]:
+        return list(self._by_key.get(name.lower(), []))
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[Dict[str, Any]]:
+        prefix = prefix.lower()
+        results: List[Dict[str, Any]] = []
+        for key in self._keys_with_prefix(prefix):
+            results.extend(self._by_key[key])
+            if len(results) >= limit:
+                break
+        return self._unique(results)[:limit]
+
+    def fuzzy(self, name: str, limit: int = 5, cutoff: float = FUZZY_CUTOFF) -> List[Dict[str, Any]]:
+        """Опечатки: сравниваем только с ключами, начинающимися с тех же двух символов."""
+        name = name.lower()
+        candidates = list(self._keys_with_prefix(name[:2]))
+        matches = difflib.get_close_matches(name, candidates, n=limit, cutoff=cutoff)
+        return self._unique([entry for key in matches for entry in self._by_key[key]])[:limit]
+
+    def _keys_with_prefix(self, prefix: str) -> Iterable[str]:
+        index = bisect_left(self._keys, prefix)
+        while index < len(self._keys) and self._keys[index].startswith(prefix):
+            yield self._keys[index]
+            index += 1
+
+    @staticmethod
+    def _unique(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        seen = set()
+        unique = []
+        for entry in entries:
+            if entry["chunk_id"] not in seen:
+                seen.add(entry["chunk_id"])
+                unique.append(entry)
+        return unique
+
+
+class SymbolIndex(RedisStore):
+    """Таблицы символов по проектам: запись в Redis, чтение из кэша процесса."""
+
+    key_prefix = "symbols"
+    unavailable_message = "Таблица символов в Redis недоступна"
+
+    def __init__(self, client: Optional[redis.Redis] = None) -> None:
+        super().__init__(client)
+        # project -> (версия, время проверки, таблица)
+        self._tables: Dict[str, Tuple[int, float, SymbolTable]] = {}
+
+    async def record_chunks(self, project: str, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Добавление символов только что записанных чанков."""
+        entries = {}
+        for chunk_id, metadata in zip(ids, metadatas):
+            entry = symbol_entry(metadata)
+            if entry:
+                entries[chunk_id] = json.dumps(entry, ensure_ascii=False)
+        if entries:
+            await self._safe(self._write, project, entries, [])
+
+    async def remove_chunks(self, project: str, ids: List[str]) -> None:
+        if ids:
+            await self._safe(self._write, project, {}, ids)
+
+    async def rebuild(self, project: str, collection, page_size: int = 1000) -> int:
+        """Полная пересборка по метаданным коллекции (после миграций и дедупликации)."""
+        entries: Dict[str, str] = {}
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(
+                collection.get, include=["metadatas"], limit=page_size, offset=offset
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for chunk_id, metadata in zip(ids, page.get("metadatas") or []):
+                entry = symbol_entry(metadata or {})
+                if entry:
+                    entries[chunk_id] = json.dumps(entry, ensure_ascii=False)
+            offset += len(ids)
+
+        await self._safe(self._write_snapshot, project, entries)
+        logger.info("🔤 Таблица символов %s: %s символов", project, len(entries))
+        return len(entries)
+
+    async def get_table(self, project: str) -> Optional[SymbolTable]:
+        """Таблица из кэша процесса; версия в Redis проверяется не чаще SYMBOL_VERSION_CHECK_SEC."""
+        cached = self._tables.get(project)
+        now = time.monotonic()
+        if cached and now - cached[1] < SYMBOL_VERSION_CHECK_SEC:
+            return cached[2]
+
+        version = await self._safe(self._read_version, project)
+        if version is None:
+            return cached[2] if cached else None
+        if cached and cached[0] == version:
+            self._tables[project] = (version, now, cached[2])
+            return cached[2]
+
+        raw = await self._safe(self.client.hgetall, f"symbols:{project}") or {}
+        table = SymbolTable({key.decode(): json.loads(value) for key, value in raw.items()})
+        self._tables[project] = (version, now, table)
+        return table
+
+    async def lookup(self, project: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Символы, названные в запросе: сначала точные совпадения, затем нечёткие.
+
+        exact и compound в записи результата говорят, насколько совпадению можно
+        верить: точное совпадение составного идентификатора (open_shift, Shift.close)
+        однозначно, одно слово с заглавной или опечатка - только подсказка.
+        """
+        identifiers = query_identifiers(query)
+        if not identifiers:
+            return []
+        table = await self.get_table(project)
+        if not table:
+            return []
+
+        hits: List[Dict[str, Any]] = []
+        for identifier in identifiers:
+            compound = _is_compound(identifier)
+            hits.extend({**entry, "exact": True, "compound": compound} for entry in table.exact(identifier))
+        if not hits:
+            for identifier in filter(_is_compound, identifiers):
+                hits.extend({**entry, "exact": False, "compound": True} for entry in table.fuzzy(identifier))
+        return SymbolTable._unique(hits)[:limit]
+
+    # --- синхронные операции (выполняются в потоке) ---
+
+    def _write(self, project: str, entries: Dict[str, str], removed: List[str]) -> None:
+        pipe = self.client.pipeline()
+        if entries:
+            pipe.hset(f"symbols:{project}", mapping=entries)
+        if removed:
+            pipe.hdel(f"symbols:{project}", *removed)
+        pipe.incr(f"symbols:{project}:version")
+        pipe.execute()
@@ -0,0 +1,346 @@
+"""
+Векторное хранилище с подключаемым бэкендом
+
+Весь код работает с коллекциями через интерфейс chromadb (get_or_create_collection,
+add/upsert/get/query/delete/count), а конкретный бэкенд выбирается конфигурацией:
+
+    VECTOR_STORE_BACKEND=http        chromadb.HttpClient (отдельный контейнер, по умолчанию)
+    VECTOR_STORE_BACKEND=persistent  chromadb.PersistentClient в CHROMA_PERSIST_DIR (без сети)
+    VECTOR_STORE_BACKEND=numpy       хранилище в памяти на NumPy (тесты, бенчмарки)
+"""
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "http").lower()
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "data/chroma")
+BACKENDS = ("http", "persistent", "numpy")
+
+
+class VectorCollection(Protocol):
+    """Подмножество API chromadb.Collection, которым пользуется проект."""
+
+    name: str
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None) -> None: ...
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None) -> None: ...
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None) -> None: ...
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]: ...
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None) -> Dict[str, Any]: ...
+
+    def delete(self, ids=None, where=None) -> None: ...
+
+    def count(self) -> int: ...
+
+
+class VectorStore(Protocol):
+    """Подмножество API chromadb.ClientAPI; ему удовлетворяют оба клиента chromadb."""
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection: ...
+
+    def get_collection(self, name: str) -> VectorCollection: ...
+
+    def list_collections(self) -> Sequence[VectorCollection]: ...
+
+    def delete_collection(self, name: str) -> None: ...
+
+    def get_max_batch_size(self) -> int: ...
+
+
+def chroma_http_address() -> Tuple[str, int]:
+    """Хост и порт ChromaDB из CHROMA_HOST (допускается http://host:port) и CHROMA_PORT."""
+    host = os.getenv("CHROMA_HOST", "http://chromadb:8000")
+    if host.startswith("http://"):
+        host = host[len("http://"):]
+    port = os.getenv("CHROMA_PORT", "8000")
+    if ":" in host:
+        host, port = host.split(":", 1)
+    return host, int(port)
+
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """Новый экземпляр хранилища указанного (или сконфигурированного) бэкенда."""
+    backend = (backend or VECTOR_STORE_BACKEND).lower()
+    if backend == "numpy":
+        return NumpyVectorStore()
+
+    import chromadb
+
+    if backend == "persistent":
+        os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
+        logger.info("Векторное хранилище: встроенный ChromaDB в %s", CHROMA_PERSIST_DIR)
+        return chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+    if backend == "http":
+        host, port = chroma_http_address()
+        return chromadb.HttpClient(host=host, port=port)
+    raise ValueError(f"Неизвестный бэкенд векторного хранилища: {backend} (ожидается один из {BACKENDS})")
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Общее на процесс хранилище: встроенные бэкенды нельзя открывать по экземпляру на запрос."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_vector_store()
+    return _store
+
+
+# --- NumPy бэкенд ---
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Фильтр метаданных в синтаксисе chromadb ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        value = metadata.get(key)
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    return False
+                if op == "$gt" and not value > expected:
+                    return False
+                if op == "$gte" and not value >= expected:
+                    return False
+                if op == "$lt" and not value < expected:
+                    return False
+                if op == "$lte" and not value <= expected:
+                    return False
+    return True
+
+
+class NumpyCollection:
+    """Коллекция в памяти: точный (brute-force) поиск по матрице float32."""
+
+    def __init__(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.metadata = metadata
+        self._space = (metadata or {}).get("hnsw:space", "l2")
+        self._records: Dict[str, Tuple[np.ndarray, Optional[str], Dict[str, Any]]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[str] = []
+        self._lock = threading.RLock()
+
+    def count(self) -> int:
+        return len(self._records)
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        # Как и chromadb, существующие ID при add не перезаписываются
+        self._write(ids, embeddings, metadatas, documents, overwrite=False)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        self._write(ids, embeddings, metadatas, documents, overwrite=True)
+
+    def update(self, ids, embeddings=None, metadatas=None, documents=None) -> None:
+        """Частичное обновление существующих записей (метаданные дополняются, как в chromadb)."""
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        if embeddings is None and documents is not None:
+            embeddings = _embed(list(documents))
+        with self._lock:
+            for i, doc_id in enumerate(ids):
+                record = self._records.get(doc_id)
+                if record is None:
+                    continue
+                vector, document, metadata = record
+                if embeddings is not None:
+                    vector = np.asarray(embeddings[i], dtype=np.float32)
+                if documents is not None:
+                    document = documents[i]
+                if metadatas is not None and metadatas[i]:
+                    metadata = {**metadata, **metadatas[i]}
+                self._records[doc_id] = (vector, document, metadata)
+            self._matrix = None
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]:
+        include = include if include is not None else ["metadatas", "documents"]
+        with self._lock:
+            if ids is not None:
+                ids = [ids] if isinstance(ids, str) else ids
+                selected = [doc_id for doc_id in ids if doc_id in self._records]
+            else:
+                selected = list(self._records)
+            selected = [doc_id for doc_id in selected if _matches(self._records[doc_id][2], where)]
+            start = offset or 0
+            selected = selected[start:start + limit] if limit is not None else selected[start:]
+            return self._result([selected], include, flat=True)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None) -> Dict[str, Any]:
+        include = include if include is not None else ["metadatas", "documents", "distances"]
+        if query_embeddings is None:
+            query_embeddings = _embed(query_texts or [])
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+
+        with self._lock:
+            matrix, matrix_ids = self._get_matrix()
+            if where:
+                mask = np.fromiter(
+                    (_matches(self._records[doc_id][2], where) for doc_id in matrix_ids),
+                    dtype=bool,
+                    count=len(matrix_ids),
+                )
+                matrix, matrix_ids = matrix[mask], [doc_id for doc_id, keep in zip(matrix_ids, mask) if keep]
+
+            all_ids: List[List[str]] = []
+            all_distances: List[List[float]] = []
+            for query in queries:
+                if not matrix_ids:
+                    all_ids.append([])
+                    all_distances.append([])
+                    continue
+                distances = self._distances(matrix, query)
+                k = min(n_results, len(matrix_ids))
+                top = np.argpartition(distances, k - 1)[:k]
+                top = top[np.argsort(distances[top])]
+                all_ids.append([matrix_ids[i] for i in top])
+                all_distances.append(distances[top].tolist())
+
+            result = self._result(all_ids, include, flat=False)
+            if "distances" in include:
+                result["distances"] = all_distances
+            return result
+
+    def delete(self, ids=None, where=None) -> None:
+        if ids is None and where is None:
+            raise ValueError("Для удаления нужно указать ids или where")
+        with self._lock:
+            candidates = ([ids] if isinstance(ids, str) else ids) if ids is not None else list(self._records)
+            for doc_id in candidates:
+                record = self._records.get(doc_id)
+                if record is not None and _matches(record[2], where):
+                    del self._records[doc_id]
+            self._matrix = None
+
+    # --- внутреннее ---
+
+    def _write(self, ids, embeddings, metadatas, documents, overwrite: bool) -> None:
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        if embeddings is None:
+            if documents is None:
+                raise ValueError("Нужны embeddings или documents")
+            embeddings = _embed(list(documents))
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock:
+            for i, doc_id in enumerate(ids):
+                if not overwrite and doc_id in self._records:
+                    continue
+                self._records[doc_id] = (
+                    vectors[i],
+                    documents[i] if documents is not None else None,
+                    dict(metadatas[i] or {}) if metadatas is not None else {},
+                )
+            self._matrix = None
+
+    def _get_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        """Матрица векторов пересобирается лениво после записи."""
+        if self._matrix is None:
+            self._matrix_ids = list(self._records)
+            if self._matrix_ids:
+                self._matrix = np.stack([self._records[doc_id][0] for doc_id in self._matrix_ids])
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+        return self._matrix, self._matrix_ids
+
+    def _distances(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Те же метрики, что у hnsw в chromadb: l2 - квадрат расстояния
+        if self._space == "cosine":
+            norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+            return 1.0 - (matrix @ query) / np.where(norms == 0, 1.0, norms)
+        if self._space == "ip":
+            return 1.0 - matrix @ query
+        diff = matrix - query
+        return np.einsum("ij,ij->i", diff, diff)
+
+    def _result(self, id_lists: List[List[str]], include: List[str], flat: bool) -> Dict[str, Any]:
+        def column(index: int, convert=lambda value: value):
+            rows = [[convert(self._records[doc_id][index]) for doc_id in ids] for ids in id_lists]
+            return rows[0] if flat else rows
+
+        result: Dict[str, Any] = {"ids": id_lists[0] if flat else id_lists}
+        if "embeddings" in include:
+            result["embeddings"] = column(0, lambda vector: vector.tolist())
+        if "documents" in include:
+            result["documents"] = column(1)
+        if "metadatas" in include:
+            result["metadatas"] = column(2, dict)
+        return result
+
+
+class NumpyVectorStore:
+    """Хранилище в памяти процесса, совместимое с используемой частью chromadb.ClientAPI."""
+
+    def __init__(self) -> None:
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None, **_: Any) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(name, metadata)
+            return self._collections[name]
+
+    def get_collection(self, name: str, **_: Any) -> NumpyCollection:
+        if name not in self._collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self._collections[name]
+
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None, **_: Any) -> NumpyCollection:
+        with self._lock:
+            if name in self._collections:
+                raise ValueError(f"Collection {name} already exists.")
+            self._collections[name] = NumpyCollection(name, metadata)
+            return self._collections[name]
+
+    def list_collections(self) -> List[NumpyCollection]:
+        return list(self._collections.values())
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            if self._collections.pop(name, None) is None:
+                raise ValueError(f"Collection {name} does not exist.")
+
+    def get_max_batch_size(self) -> int:
+        return 2 ** 31 - 1
+
+    def heartbeat(self) -> int:
+        return 0
+
+
+def _embed(texts: List[str]) -> List[List[float]]:
+    # Локальный импорт: NumPy бэкенд не должен требовать sentence-transformers,
+    # пока вызывающий код передаёт готовые векторы
+    from ..rag.embeddings import embed_texts
+
+    return embed_texts(texts)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Сравнение бэкендов векторного хранилища (http / persistent / numpy)
+Пишет и ищет синтетические векторы, без модели эмбеддингов
+"""
+import sys
+import time
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+import numpy as np
+
+from backend.rag.embeddings import EMBEDDING_DIM
+from backend.storage.vector_store import BACKENDS, create_vector_store
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+COLLECTION = "bench_vector_store"
+
+def benchmark(backend: str, docs: int, queries: int, batch: int, n_results: int):
+    """Замер upsert и query для одного бэкенда"""
+    store = create_vector_store(backend)
+    try:
+        store.delete_collection(COLLECTION)
+    except Exception:
+        pass
+    collection = store.get_or_create_collection(COLLECTION)
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((docs, EMBEDDING_DIM), dtype=np.float32)
+    probes = rng.standard_normal((queries, EMBEDDING_DIM), dtype=np.float32)
+
+    t0 = time.perf_counter()
+    for i in range(0, docs, batch):
+        collection.upsert(
+            ids=[f"doc_{j}" for j in range(i, min(i + batch, docs))],
+            embeddings=vectors[i:i + batch].tolist(),
+            documents=[f"document {j}" for j in range(i, min(i + batch, docs))],
+            metadatas=[{"type": "code" if j % 2 else "doc"} for j in range(i, min(i + batch, docs))],
+        )
+    upsert_sec = time.perf_counter() - t0
+
+    latencies = []
+    for probe in probes:
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=[probe.tolist()], n_results=n_results)
+        latencies.append(time.perf_counter() - t0)
+
+    store.delete_collection(COLLECTION)
+    latencies_ms = np.array(latencies) * 1000
+    logger.info(
+        f"  {backend:<11} upsert {docs / upsert_sec:>9.0f} док/с | "
+        f"query p50 {np.percentile(latencies_ms, 50):7.2f} мс, p95 {np.percentile(latencies_ms, 95):7.2f} мс"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк бэкендов векторного хранилища")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--n-results", type=int, default=10)
+    args = parser.parse_args()
+
+    logger.info(f"📏 БЕНЧМАРК: {args.docs} документов, {args.queries} запросов, dim={EMBEDDING_DIM}")
+    for backend in args.backends:
+        try:
+            benchmark(backend, args.docs, args.queries, args.batch, args.n_results)
+        except Exception as e:
+            logger.error(f"  {backend:<11} ❌ {e}")
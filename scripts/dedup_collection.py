@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Дедупликация коллекции kb_<project> без переэмбеддинга
+Оставляет одну копию на (file, type, symbol, content digest) и переводит ID
+на стабильную схему. По умолчанию работает в режиме dry run.
+"""
+import sys
+import json
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+from backend.rag.engine import RAGEngine
+from backend.storage.chroma_client import DOC_TYPE_PARTITIONS
+from backend.storage.collection_dedup import CollectionDeduplicator
+import asyncio
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+async def dedup_collection(project: str, apply: bool, page_size: int, report_path: str = None):
+    """Дедупликация коллекции проекта"""
+    logger.info(f"🧽 ДЕДУПЛИКАЦИЯ: kb_{project.replace('-', '_')}{'' if apply else ' (dry run)'}")
+    
+    rag_engine = RAGEngine()
+    await rag_engine.initialize()
+    collection = rag_engine.get_collection(project)
+    
+    deduplicator = CollectionDeduplicator(collection, project, page_size=page_size)
+    report = await deduplicator.run(dry_run=not apply)
+    
+    if apply:
+        # Счётчики статистики после массового удаления пересчитываем целиком
+        await rag_engine.storage.reconcile_project_stats(project)
+        # Разделы doc_type хранят старые ID - пересобираем из основной коллекции
+        if DOC_TYPE_PARTITIONS:
+            await rag_engine.storage.rebuild_partitions(project)
+    
+    logger.info(f"\n📊 ОТЧЁТ:")
+    logger.info(f"  • Документов: {report['scanned']}")
+    logger.info(f"  • Уникальных: {report['unique']}")
+    logger.info(f"  • Дублей {'удалено' if apply else 'к удалению'}: {report['duplicates_removed']}")
+    logger.info(f"  • ID {'переписано' if apply else 'к переписыванию'}: {report['ids_rewritten']}")
+    
+    if report['top_duplicated']:
+        logger.info(f"\n📂 Самые дублируемые:")
+        for group in report['top_duplicated']:
+            logger.info(f"  • {group['copies']}x {group['file']} [{group['type']}] {group['symbol'][:60]}")
+    
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"\n💾 Отчёт сохранён: {report_path}")
+    
+    if not apply:
+        logger.info(f"\nℹ️ Это dry run. Для применения запустите с --apply")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Дедупликация коллекции kb_* без переэмбеддинга")
+    parser.add_argument("project", nargs="?", default="staffprobot")
+    parser.add_argument("--apply", action="store_true", help="Применить изменения (по умолчанию dry run)")
+    parser.add_argument("--page-size", type=int, default=500, help="Размер страницы при сканировании")
+    parser.add_argument("--report", help="Путь для JSON отчёта")
+    args = parser.parse_args()
+    
+    asyncio.run(dedup_collection(args.project, args.apply, args.page_size, args.report))
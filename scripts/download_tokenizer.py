@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Скачивание файлов токенизатора LLM в TOKENIZER_PATH
+Запускается один раз там, где есть доступ к Hugging Face; дальше сервис
+загружает токенизатор только локально (local_files_only) и работает без сети.
+"""
+import sys
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+from backend.llm.tokens import TOKENIZER_NAME, TOKENIZER_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+def download_tokenizer(name: str, path: str):
+    """Сохранение токенизатора name в каталог path"""
+    from transformers import AutoTokenizer
+
+    logger.info(f"📥 Токенизатор {name} → {path}")
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    tokenizer.save_pretrained(path)
+    logger.info(f"✅ ГОТОВО! Проверка: {len(tokenizer.encode('def open_shift(): pass'))} токенов")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная копия токенизатора для подсчёта токенов")
+    parser.add_argument("--name", default=TOKENIZER_NAME, help="HF репозиторий токенизатора")
+    parser.add_argument("--path", default=TOKENIZER_PATH, help="Каталог для файлов токенизатора")
+    args = parser.parse_args()
+
+    download_tokenizer(args.name, args.path)
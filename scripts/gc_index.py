@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Сборка мусора в индексе проекта
+Удаляет чанки файлов, которые были удалены или переименованы в репозитории,
+и устаревшие версии чанков изменённых файлов
+"""
+import sys
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+from backend.indexers.index_gc import IndexGarbageCollector
+from backend.rag.engine import RAGEngine
+import asyncio
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+async def gc_index(project: str, dry_run: bool):
+    """Сборка мусора для одного проекта"""
+    logger.info(f"🧹 СБОРКА МУСОРА: {project}{' (dry run)' if dry_run else ''}")
+    
+    rag_engine = RAGEngine()
+    await rag_engine.initialize()
+    
+    report = await IndexGarbageCollector(rag_engine).collect(project, dry_run=dry_run)
+    
+    for file_path in report['orphan_files']:
+        logger.info(f"  🗑️ {file_path}")
+    
+    logger.info(f"\n✅ ГОТОВО!")
+    logger.info(f"  • Файлов в индексе: {report['indexed_files']}")
+    logger.info(f"  • Файлов в проекте: {report['current_files']}")
+    logger.info(f"  • Удалённых файлов: {len(report['orphan_files'])}")
+    logger.info(f"  • Устаревших чанков изменённых файлов: {report['stale_documents']} в {len(report['stale_files'])} файлах")
+    logger.info(f"  • Освобождено документов: {report['reclaimed_documents']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Удаление из индекса чанков удалённых файлов и устаревших чанков изменённых")
+    parser.add_argument("project", nargs="?", default="staffprobot")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет удалено")
+    args = parser.parse_args()
+    
+    asyncio.run(gc_index(args.project, args.dry_run))
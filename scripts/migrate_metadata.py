@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Перевод метаданных коллекции kb_<project> на типизированную схему
+start_line/end_line становятся числами (для $gte/$lte фильтров), добавляется symbol.
+Эмбеддинги и ID не меняются. По умолчанию работает в режиме dry run.
+"""
+import sys
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+from backend.storage.chroma_client import ChromaClient, DOC_TYPE_PARTITIONS
+import asyncio
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+async def migrate_metadata(project: str, apply: bool, page_size: int):
+    """Миграция метаданных одного проекта"""
+    logger.info(f"🔢 МИГРАЦИЯ МЕТАДАННЫХ: {project}{'' if apply else ' (dry run)'}")
+
+    storage = ChromaClient()
+    await storage.initialize()
+
+    report = await storage.migrate_typed_metadata(project, page_size=page_size, dry_run=not apply)
+
+    if apply:
+        # Поле symbol появилось у старых чанков - пересобираем таблицу символов
+        await storage.rebuild_symbols(project)
+    if apply and DOC_TYPE_PARTITIONS:
+        # Разделы doc_type - копии основной коллекции, пересобираем их целиком
+        await storage.rebuild_partitions(project)
+
+    logger.info(f"\n✅ ГОТОВО!")
+    logger.info(f"  • Документов: {report['scanned']}")
+    logger.info(f"  • {'Обновлено' if apply else 'К обновлению'}: {report['updated']}")
+
+    if not apply:
+        logger.info(f"\nℹ️ Это dry run. Для применения запустите с --apply")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Типизированные метаданные для коллекции kb_*")
+    parser.add_argument("project", nargs="?", default="staffprobot")
+    parser.add_argument("--apply", action="store_true", help="Применить изменения (по умолчанию dry run)")
+    parser.add_argument("--page-size", type=int, default=500, help="Размер страницы при сканировании")
+    args = parser.parse_args()
+
+    asyncio.run(migrate_metadata(args.project, args.apply, args.page_size))
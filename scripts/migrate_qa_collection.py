@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Перенос QA пар из kb_<project> в отдельную коллекцию qa_<project>
+Эмбеддинги и ID сохраняются, переэмбеддинга нет. По умолчанию работает в режиме dry run.
+"""
+import sys
+import argparse
+import logging
+sys.path.insert(0, '/app')
+
+from backend.storage.chroma_client import ChromaClient
+import asyncio
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+async def migrate_qa_collection(project: str, apply: bool, page_size: int):
+    """Перенос QA пар одного проекта"""
+    logger.info(f"❓ ПЕРЕНОС QA ПАР: kb_{project} → qa_{project}{'' if apply else ' (dry run)'}")
+
+    storage = ChromaClient()
+    await storage.initialize()
+
+    moved = await storage.migrate_qa_pairs(project, page_size=page_size, dry_run=not apply)
+
+    if apply:
+        # Счётчики kb_<project>, таблица символов и QA хранилище - по новому расположению
+        await storage.reconcile_project_stats(project)
+
+    logger.info(f"\n✅ ГОТОВО!")
+    logger.info(f"  • QA пар {'перенесено' if apply else 'к переносу'}: {moved}")
+
+    if not apply:
+        logger.info(f"\nℹ️ Это dry run. Для применения запустите с --apply")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос QA пар в коллекцию qa_<project>")
+    parser.add_argument("project", nargs="?", default="staffprobot")
+    parser.add_argument("--apply", action="store_true", help="Применить изменения (по умолчанию dry run)")
+    parser.add_argument("--page-size", type=int, default=500, help="Размер страницы при переносе")
+    args = parser.parse_args()
+
+    asyncio.run(migrate_qa_collection(args.project, args.apply, args.page_size))
@@ -0,0 +1,58 @@
+"""
+Общие фикстуры: Redis в памяти (fakeredis), детерминированная модель эмбеддингов
+и слой хранения поверх NumPy бэкенда
+"""
+import hashlib
+import re
+
+import numpy as np
+import pytest
+
+
+class HashingModel:
+    """Мешок слов, захэшированный в 64 измерения: общие слова - близкие векторы."""
+
+    dim = 64
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        single = isinstance(texts, str)
+        matrix = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in re.findall(r"\w+", text.lower()):
+                bucket = int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim
+                matrix[row, bucket] += 1.0
+            norm = np.linalg.norm(matrix[row])
+            if norm:
+                matrix[row] /= norm
+        return matrix[0] if single else matrix
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    from backend.rag import embeddings
+
+    monkeypatch.setattr(embeddings, "get_embedding_model", lambda: HashingModel())
+    embeddings._embed_query_cached.cache_clear()
+    yield
+    embeddings._embed_query_cached.cache_clear()
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def storage(redis_client, fake_embeddings):
+    from backend.storage.chroma_client import ChromaClient
+    from backend.storage.index_stats import IndexStats
+    from backend.storage.qa_store import QAStore
+    from backend.storage.symbol_index import SymbolIndex
+    from backend.storage.vector_store import NumpyVectorStore
+
+    client = ChromaClient(store=NumpyVectorStore())
+    client.index_stats = IndexStats(redis_client)
+    client.symbol_index = SymbolIndex(redis_client)
+    client.qa_store = QAStore(redis_client)
+    return client
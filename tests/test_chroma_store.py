@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тесты записи чанков: upsert по стабильным ID и переиндексация файла без устаревших версий
+"""
+import asyncio
+
+
+def _function(name: str, body: str, start: int) -> dict:
+    return {
+        "content": f"def {name}():\n    {body}",
+        "file": "apps/web/services/shifts.py",
+        "type": "function",
+        "function_name": name,
+        "doc_type": "service",
+        "start_line": start,
+        "end_line": start + 1,
+        "lines": f"{start}-{start + 1}",
+    }
+
+
+def _stored(storage, project: str) -> dict:
+    collection = storage.get_collection(project)
+    page = collection.get(include=["documents"])
+    return dict(zip(page["ids"], page["documents"]))
+
+
+def test_reindex_removes_previous_version_of_edited_chunk(storage):
+    async def scenario():
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [
+            _function("open_shift", "return 1", 1),
+            _function("close_shift", "return 2", 4),
+        ])
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [
+            _function("open_shift", "return 10", 1),
+            _function("close_shift", "return 2", 4),
+        ])
+        return _stored(storage, "staffprobot"), await storage.index_stats.get_project("staffprobot")
+
+    documents, stats = asyncio.run(scenario())
+
+    assert sorted(documents.values()) == ["def close_shift():\n    return 2", "def open_shift():\n    return 10"]
+    assert stats["total_chunks"] == 2
+    assert stats["total_files"] == 1
+
+
+def test_emptied_file_loses_all_chunks(storage):
+    async def scenario():
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [_function("open_shift", "pass", 1)])
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [])
+        return _stored(storage, "staffprobot"), await storage.index_stats.get_project("staffprobot")
+
+    documents, stats = asyncio.run(scenario())
+
+    assert documents == {}
+    assert stats["total_chunks"] == 0
+
+
+def test_duplicate_chunks_in_batch_are_stored_and_counted_once(storage):
+    async def scenario():
+        duplicate = _function("open_shift", "pass", 1)
+        stored = await storage.replace_file(
+            "staffprobot", "apps/web/services/shifts.py", [duplicate, {**duplicate, "start_line": 7, "end_line": 8}]
+        )
+        return stored, _stored(storage, "staffprobot"), await storage.index_stats.get_project("staffprobot")
+
+    stored, documents, stats = asyncio.run(scenario())
+
+    assert stored == 1
+    assert len(documents) == 1
+    assert stats["total_chunks"] == 1
+
+
+def test_other_files_are_untouched(storage):
+    async def scenario():
+        other = {**_function("helper", "pass", 1), "file": "apps/web/services/utils.py"}
+        await storage.replace_file("staffprobot", "apps/web/services/utils.py", [other])
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [_function("open_shift", "pass", 1)])
+        await storage.replace_file("staffprobot", "apps/web/services/shifts.py", [_function("open_shift", "return", 1)])
+        return _stored(storage, "staffprobot")
+
+    documents = asyncio.run(scenario())
+
+    assert "def helper():\n    pass" in documents.values()
+    assert len(documents) == 2
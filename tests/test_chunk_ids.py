@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Тесты стабильных ID чанков
+"""
+from backend.storage.chunk_ids import stable_chunk_id
+
+
+def _metadata(**fields):
+    return {"file": "apps/web/routes/shifts.py", "type": "function", "function_name": "open_shift", **fields}
+
+
+def test_same_chunk_same_id():
+    content = "async def open_shift(): ..."
+
+    assert stable_chunk_id("staffprobot", _metadata(), content) == stable_chunk_id("staffprobot", _metadata(), content)
+
+
+def test_line_shift_keeps_id():
+    content = "async def open_shift(): ..."
+    before = stable_chunk_id("staffprobot", _metadata(start_line=10, end_line=12), content)
+    after = stable_chunk_id("staffprobot", _metadata(start_line=40, end_line=42), content)
+
+    assert before == after
+
+
+def test_duplicate_content_collides_only_within_same_symbol():
+    """Одинаковый текст в разных файлах, символах и проектах даёт разные ID."""
+    content = "pass"
+    base = stable_chunk_id("staffprobot", _metadata(), content)
+
+    assert stable_chunk_id("staffprobot", _metadata(file="apps/bot/handlers.py"), content) != base
+    assert stable_chunk_id("staffprobot", _metadata(function_name="close_shift"), content) != base
+    assert stable_chunk_id("staffprobot", _metadata(type="class"), content) != base
+    assert stable_chunk_id("project-brain", _metadata(), content) != base
+
+
+def test_changed_content_new_id():
+    assert stable_chunk_id("staffprobot", _metadata(), "a") != stable_chunk_id("staffprobot", _metadata(), "b")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты устойчивого доступа к ChromaDB: circuit breaker и повторы в ChromaClient._call
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.storage import chroma_client
+from backend.storage.chroma_client import ChromaClient
+from backend.storage.circuit_breaker import CircuitBreaker, CircuitOpenError
+from backend.storage.vector_store import NumpyVectorStore
+
+
+def _half_open(breaker: CircuitBreaker) -> None:
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+
+
+def _client(monkeypatch) -> ChromaClient:
+    monkeypatch.setattr(chroma_client, "CHROMA_RETRY_BASE_SEC", 0.0)
+    monkeypatch.setattr(chroma_client, "CHROMA_MAX_RETRIES", 2)
+    return ChromaClient(store=NumpyVectorStore())
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    _half_open(breaker)
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_cancelled_probe_does_not_jam_breaker(monkeypatch):
+    """Отменённая проба (wait_for федеративного поиска, отключение клиента) освобождает breaker."""
+    client = _client(monkeypatch)
+    _half_open(client.breaker)
+
+    async def scenario():
+        probe = asyncio.create_task(client._call(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert client.breaker.state == "half_open"
+        assert await client._call(lambda: "ok") == "ok"
+        assert client.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_client_error_is_not_retried_or_counted(monkeypatch):
+    client = _client(monkeypatch)
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("bad where")
+
+    with pytest.raises(ValueError):
+        asyncio.run(client._call(invalid))
+    assert len(calls) == 1
+    assert client.breaker.failures == 0
+
+
+def test_server_errors_are_retried_and_counted(monkeypatch):
+    client = _client(monkeypatch)
+    calls = []
+    request = httpx.Request("POST", "http://chromadb:8000/api/v1/collections/x/query")
+
+    def overloaded():
+        calls.append(1)
+        raise httpx.HTTPStatusError("503", request=request, response=httpx.Response(503, request=request))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client._call(overloaded))
+    assert len(calls) == 3
+    assert client.breaker.failures == 3
+
+
+def test_half_open_probe_client_error_closes_breaker(monkeypatch):
+    client = _client(monkeypatch)
+    _half_open(client.breaker)
+
+    def invalid():
+        raise ValueError("bad where")
+
+    with pytest.raises(ValueError):
+        asyncio.run(client._call(invalid))
+    assert client.breaker.state == "closed"
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Тесты контекстных правил: выбор по glob-паттернам пути и по роли
+"""
+from backend.rag.context_rules import RuleBook, parse_rules
+
+RULES = """---
+globs: apps/**/*.py
+---
+# Конвенции
+
+## Роуты `apps/web/routes/*.py`
+Роут возвращает TemplateResponse.
+
+## Сервисы
+Бизнес-логика живёт в services.
+
+## Права владельца
+Владелец видит все объекты.
+
+## Права управляющего
+Управляющий видит только свои объекты.
+"""
+
+
+def _book() -> RuleBook:
+    return RuleBook(parse_rules(RULES), signature=())
+
+
+def _titles(bundle) -> list:
+    return [text.splitlines()[0] for text in bundle["rules"]]
+
+
+def test_glob_match_goes_first():
+    bundle = _book().select("/home/dev/staffprobot/apps/web/routes/shifts.py", "", "", budget=1000)
+
+    assert _titles(bundle)[0] == "## Роуты `apps/web/routes/*.py`"
+
+
+def test_glob_does_not_match_other_paths():
+    bundle = _book().select("docs/readme.md", "", "", budget=1000)
+
+    assert "## Роуты `apps/web/routes/*.py`" not in _titles(bundle)
+
+
+def test_role_filters_other_roles():
+    titles = _titles(_book().select("", "manager", "", budget=1000))
+
+    assert "## Права управляющего" in titles
+    assert "## Права владельца" not in titles
+
+
+def test_role_from_file_path():
+    titles = _titles(_book().select("apps/web/routes/owner.py", "", "", budget=1000))
+
+    assert "## Права владельца" in titles
+    assert "## Права управляющего" not in titles
+
+
+def test_module_only():
+    assert _titles(_book().select("", "", "services", budget=1000)) == ["## Сервисы"]
+
+
+def test_no_features_no_rules():
+    assert _book().select("", "", "", budget=1000) == {"rules": [], "tokens": 0}
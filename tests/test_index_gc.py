@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тесты сборки мусора в индексе: удалённые файлы и устаревшие чанки изменённых файлов
+"""
+import asyncio
+import types
+
+import yaml
+
+from backend.indexers.file_chunks import file_chunks
+from backend.indexers.index_gc import IndexGarbageCollector
+from backend.indexers.simple_project_indexer import SimpleProjectIndexer
+
+SHIFTS_V1 = '''def open_shift():
+    return 1
+
+
+def close_shift():
+    return 2
+'''
+
+SHIFTS_V2 = SHIFTS_V1.replace("return 1", "return 10")
+
+
+def _collector(storage, tmp_path) -> IndexGarbageCollector:
+    config = tmp_path / "projects.yaml"
+    config.write_text(yaml.safe_dump({"projects": [{
+        "name": "staffprobot",
+        "path": str(tmp_path / "repo"),
+        "index_patterns": ["**/*.py"],
+        "exclude_patterns": [],
+    }]}), encoding="utf-8")
+    gc = IndexGarbageCollector(types.SimpleNamespace(storage=storage))
+    gc.project_indexer = SimpleProjectIndexer(str(config))
+    return gc
+
+
+async def _upsert_current_files(gc: IndexGarbageCollector, storage) -> None:
+    """Индексация только upsert'ом, как до замены чанков файла - старые версии остаются."""
+    for file_info in (await gc.current_files("staffprobot")).values():
+        chunks = await file_chunks("staffprobot", file_info, gc.python_indexer, gc.markdown_indexer)
+        await storage.store_chunks("staffprobot", chunks)
+
+
+def _documents(storage) -> list:
+    return sorted(storage.get_collection("staffprobot").get(include=["documents"])["documents"])
+
+
+def test_collects_orphans_and_stale_chunks(storage, tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "shifts.py").write_text(SHIFTS_V1, encoding="utf-8")
+    (repo / "old.py").write_text("def legacy():\n    pass\n", encoding="utf-8")
+    gc = _collector(storage, tmp_path)
+
+    async def scenario():
+        await _upsert_current_files(gc, storage)
+        (repo / "shifts.py").write_text(SHIFTS_V2, encoding="utf-8")
+        (repo / "old.py").unlink()
+        await _upsert_current_files(gc, storage)
+
+        dry_run = await gc.collect("staffprobot", dry_run=True)
+        before = _documents(storage)
+        report = await gc.collect("staffprobot")
+        return dry_run, before, report
+
+    dry_run, before, report = asyncio.run(scenario())
+
+    assert dry_run["reclaimed_documents"] == 2
+    assert len(before) == 4
+    assert report["orphan_files"] == ["old.py"]
+    assert report["stale_files"] == {"shifts.py": 1}
+    assert report["reclaimed_documents"] == 2
+    remaining = _documents(storage)
+    assert len(remaining) == 2
+    assert not any("return 1\n" in doc or doc.endswith("return 1") for doc in remaining)
+    assert not any("legacy" in doc for doc in remaining)
+
+
+def test_clean_index_has_nothing_to_collect(storage, tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "shifts.py").write_text(SHIFTS_V1, encoding="utf-8")
+    gc = _collector(storage, tmp_path)
+
+    async def scenario():
+        await _upsert_current_files(gc, storage)
+        return await gc.collect("staffprobot")
+
+    report = asyncio.run(scenario())
+
+    assert report["reclaimed_documents"] == 0
+    assert report["stale_files"] == {}
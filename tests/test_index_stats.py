@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тесты инкрементальной статистики индекса: замена вклада файла, удаление и сверка
+"""
+import asyncio
+
+from backend.storage.index_stats import IndexStats
+from backend.storage.vector_store import NumpyVectorStore
+
+
+def _chunk(doc_type: str, content: str) -> dict:
+    return {"type": doc_type, "content": content}
+
+
+def test_reindexed_file_replaces_its_contribution(redis_client):
+    stats = IndexStats(redis_client)
+
+    async def scenario():
+        await stats.record_file("staffprobot", "shifts.py", [_chunk("function", "abcd"), _chunk("class", "ef")])
+        await stats.record_file("staffprobot", "models.py", [_chunk("class", "g")])
+        await stats.record_file("staffprobot", "shifts.py", [_chunk("function", "абв")])
+        return await stats.get_project("staffprobot")
+
+    project = asyncio.run(scenario())
+
+    assert project["total_chunks"] == 2
+    assert project["total_files"] == 2
+    assert project["document_bytes"] == len("абв".encode()) + 1
+    assert project["file_types"] == {"function": 1, "class": 1}
+
+
+def test_removed_files_drop_out_of_counters(redis_client):
+    stats = IndexStats(redis_client)
+
+    async def scenario():
+        await stats.record_file("staffprobot", "shifts.py", [_chunk("function", "a")])
+        await stats.record_file("staffprobot", "old.py", [_chunk("function", "b"), _chunk("class", "c")])
+        await stats.remove_files("staffprobot", ["old.py", "never_indexed.py"])
+        return await stats.get_project("staffprobot")
+
+    project = asyncio.run(scenario())
+
+    assert project["total_chunks"] == 1
+    assert project["total_files"] == 1
+    assert project["file_types"] == {"function": 1}
+
+
+def test_reconcile_rebuilds_counters_from_collection(redis_client):
+    stats = IndexStats(redis_client)
+    collection = NumpyVectorStore().get_or_create_collection("kb_staffprobot")
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0], [2.0], [3.0]],
+        documents=["aa", "bbb", "c"],
+        metadatas=[
+            {"file": "shifts.py", "type": "function"},
+            {"file": "shifts.py", "type": "class"},
+            {"file": "", "type": "qa_pair"},
+        ],
+    )
+
+    async def scenario():
+        # Дрейф: счётчики знают о файле, которого уже нет
+        await stats.record_file("staffprobot", "gone.py", [_chunk("function", "x")] * 5)
+        return await stats.reconcile("staffprobot", collection, page_size=2)
+
+    project = asyncio.run(scenario())
+
+    assert project["total_chunks"] == 3
+    assert project["total_files"] == 1  # чанки без файла не считаются файлом
+    assert project["document_bytes"] == 6
+    assert project["file_types"] == {"function": 1, "class": 1, "qa_pair": 1}
+    assert project["reconciled_at"]
+
+
+def test_version_and_missing_project(redis_client):
+    stats = IndexStats(redis_client)
+
+    async def scenario():
+        before = await stats.get_version("staffprobot")
+        await stats.bump_version("staffprobot")
+        return before, await stats.get_version("staffprobot"), await stats.get_project("unknown")
+
+    assert asyncio.run(scenario()) == (0, 1, None)
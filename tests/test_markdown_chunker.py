@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тесты потокового разбиения Markdown: точные диапазоны строк, секции и fenced-блоки
+"""
+from backend.indexers.markdown_indexer import MarkdownIndexer
+
+
+def _paragraph(number: int) -> str:
+    return f"Абзац {number}: смена открывается в приложении, сотрудник отмечается на объекте."
+
+
+def _document() -> list:
+    lines = ["# Смены", ""]
+    for number in range(12):
+        lines += [_paragraph(number), ""]
+    lines += ["## Пример", "", "```python"]
+    lines += [f"shift_{number} = open_shift(object_id={number})  # строка кода" for number in range(30)]
+    lines += ["```", "", "Конец раздела с примером кода, текст после блока."]
+    return lines
+
+
+def _chunks(lines: list, chunk_size: int = 400, overlap: int = 100) -> list:
+    indexer = MarkdownIndexer()
+    indexer.chunk_size = chunk_size
+    indexer.overlap = overlap
+    return list(indexer.iter_chunks((line + "\n" for line in lines), "docs/shifts.md"))
+
+
+def test_line_ranges_match_content():
+    lines = _document()
+    chunks = _chunks(lines)
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert chunk["lines"] == f"{chunk['start_line']}-{chunk['end_line']}"
+        assert chunk["content"] == "\n".join(lines[chunk["start_line"] - 1:chunk["end_line"]])
+
+
+def test_header_starts_new_section():
+    lines = _document()
+    chunks = _chunks(lines)
+    header_line = lines.index("## Пример") + 1
+
+    first_in_section = next(chunk for chunk in chunks if chunk["section"] == "## Пример")
+    assert first_in_section["start_line"] == header_line
+    assert all(chunk["end_line"] < header_line for chunk in chunks if chunk["section"] == "# Смены")
+
+
+def test_fenced_block_is_not_split():
+    lines = _document()
+    opening = lines.index("```python") + 1
+    closing = len(lines) - lines[::-1].index("```")
+    chunks = _chunks(lines)
+
+    assert any(chunk["start_line"] <= opening and chunk["end_line"] >= closing for chunk in chunks)
+    for chunk in chunks:
+        inside = opening < chunk["start_line"] <= closing or opening <= chunk["end_line"] < closing
+        if inside:
+            assert chunk["start_line"] <= opening and chunk["end_line"] >= closing
+
+
+def test_consecutive_chunks_overlap_without_gaps():
+    chunks = [chunk for chunk in _chunks(_document()) if chunk["section"] == "# Смены"]
+
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current["start_line"] <= previous["end_line"] + 2
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тесты упаковки контекста: склейка пересекающихся и соседних чанков одного файла
+"""
+from backend.llm.prompt_packer import merge_spans
+
+
+def _chunk(file: str, start: int, end: int, score: float, project: str = "staffprobot"):
+    return {
+        "project": project,
+        "file": file,
+        "lines": f"{start}-{end}",
+        "content": "\n".join(f"{file}:{line}" for line in range(start, end + 1)),
+        "score": score,
+    }
+
+
+def test_overlapping_chunks_merge_without_repeats():
+    spans = merge_spans([_chunk("a.py", 1, 3, 0.4), _chunk("a.py", 3, 5, 0.9)])
+
+    assert len(spans) == 1
+    assert spans[0]["lines"] == "1-5"
+    assert spans[0]["score"] == 0.9
+    assert spans[0]["content"].splitlines() == [f"a.py:{line}" for line in range(1, 6)]
+
+
+def test_adjacent_chunks_merge():
+    spans = merge_spans([_chunk("a.py", 4, 6, 0.5), _chunk("a.py", 1, 3, 0.7)])
+
+    assert [span["lines"] for span in spans] == ["1-6"]
+    assert spans[0]["score"] == 0.7
+
+
+def test_gap_and_other_files_stay_separate():
+    spans = merge_spans([
+        _chunk("a.py", 1, 3, 0.5),
+        _chunk("a.py", 10, 11, 0.6),
+        _chunk("b.py", 4, 6, 0.8),
+        _chunk("a.py", 4, 6, 0.3, project="other"),
+    ])
+
+    assert sorted((span["project"], span["file"], span["lines"]) for span in spans) == [
+        ("other", "a.py", "4-6"),
+        ("staffprobot", "a.py", "1-3"),
+        ("staffprobot", "a.py", "10-11"),
+        ("staffprobot", "b.py", "4-6"),
+    ]
+
+
+def test_chunk_inside_span_adds_nothing():
+    spans = merge_spans([_chunk("a.py", 1, 10, 0.5), _chunk("a.py", 3, 5, 0.6)])
+
+    assert len(spans) == 1
+    assert spans[0]["lines"] == "1-10"
+    assert spans[0]["content"].count("a.py:4") == 1
+
+
+def test_prompt_is_packed_off_the_event_loop(monkeypatch, redis_client):
+    """Подсчёт токенов при упаковке контекста не блокирует event loop."""
+    import asyncio
+    import threading
+
+    from backend.llm import ollama_client
+    from backend.llm.completion_cache import CompletionCache
+
+    threads = []
+
+    def packing(context):
+        threads.append(threading.get_ident())
+        return context
+
+    async def generate(system, prompt, options):
+        return "ответ"
+
+    client = ollama_client.OllamaClient(base_url="http://ollama:11434")
+    monkeypatch.setattr(ollama_client, "LLM_MODE", "llm")
+    monkeypatch.setattr(ollama_client, "pack_context", packing)
+    monkeypatch.setattr(ollama_client, "get_completion_cache", lambda: CompletionCache(redis_client))
+    monkeypatch.setattr(client, "_generate", generate)
+
+    answer = asyncio.run(client.generate_response("где open_shift?", [_chunk("a.py", 1, 3, 0.9)]))
+
+    assert answer == "ответ"
+    assert threads and threads[0] != threading.get_ident()
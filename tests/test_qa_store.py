@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Тесты QA хранилища: точное и близкое совпадение вопроса, эмбеддинги вопросов в Redis
+"""
+import asyncio
+
+import pytest
+
+from backend.rag import embeddings
+from backend.storage import qa_store
+from backend.storage.qa_store import QAStore
+
+
+def _qa(question: str, answer: str) -> tuple:
+    return f"Вопрос: {question}\nОтвет: {answer}", {"type": "qa_pair", "file": "qa/golden.json", "lines": ""}
+
+
+def _record(store: QAStore, *pairs: tuple) -> None:
+    documents, metadatas = zip(*(_qa(question, answer) for question, answer in pairs))
+    ids = [f"qa-{number}" for number in range(len(pairs))]
+    asyncio.run(store.record_chunks("staffprobot", ids, list(documents), list(metadatas)))
+
+
+def test_exact_match_ignores_case_and_punctuation(redis_client, fake_embeddings):
+    store = QAStore(redis_client)
+    _record(store, ("Как открыть смену?", "Вызвать open_shift"))
+
+    match = asyncio.run(store.match("staffprobot", "как ОТКРЫТЬ смену"))
+
+    assert match["match"] == "exact"
+    assert match["answer"] == "Вызвать open_shift"
+    assert match["chunk_id"] == "qa-0"
+
+
+def test_near_match_above_threshold(redis_client, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(qa_store, "QA_NEAR_THRESHOLD", 0.8)
+    store = QAStore(redis_client)
+    _record(store, ("как открыть смену сотрудника в приложении", "Вызвать open_shift"), ("как удалить объект", "delete_object"))
+
+    near = asyncio.run(store.match("staffprobot", "как открыть смену сотрудника в мобильном приложении"))
+    unrelated = asyncio.run(store.match("staffprobot", "сколько стоит подписка"))
+
+    assert near["match"] == "near"
+    assert near["answer"] == "Вызвать open_shift"
+    assert unrelated is None
+
+
+def test_reload_reads_vectors_without_embedding_questions(redis_client, fake_embeddings, monkeypatch):
+    _record(QAStore(redis_client), ("Как открыть смену?", "Вызвать open_shift"))
+    assert redis_client.hlen("qa:staffprobot:vectors") == 1
+
+    async def no_embedding(texts):
+        pytest.fail("вопросы не должны эмбеддиться при загрузке таблицы")
+
+    monkeypatch.setattr(qa_store, "aembed_texts", no_embedding)
+    monkeypatch.setattr(qa_store, "QA_NEAR_THRESHOLD", 0.8)
+    # Новый процесс: таблица загружается из Redis
+    match = asyncio.run(QAStore(redis_client).match("staffprobot", "открыть смену как"))
+
+    assert match["match"] == "near"
+    assert match["answer"] == "Вызвать open_shift"
+
+
+def test_rebuild_reuses_stored_vectors(redis_client, fake_embeddings, monkeypatch):
+    store = QAStore(redis_client)
+    _record(store, ("Как открыть смену?", "Вызвать open_shift"))
+    stored = redis_client.hget("qa:staffprobot:vectors", "как открыть смену")
+    embedded = []
+
+    async def counting(texts):
+        embedded.extend(texts)
+        return embeddings.get_embedding_model().encode(texts)
+
+    class Collection:
+        def get(self, where, include, limit, offset):
+            if offset:
+                return {"ids": []}
+            documents, metadatas = zip(_qa("Как открыть смену?", "open_shift"), _qa("Как закрыть смену?", "close_shift"))
+            return {"ids": ["qa-0", "qa-1"], "documents": list(documents), "metadatas": list(metadatas)}
+
+    monkeypatch.setattr(qa_store, "aembed_texts", counting)
+    assert asyncio.run(store.rebuild("staffprobot", Collection())) == 2
+
+    assert embedded == ["Как закрыть смену?"]
+    assert redis_client.hget("qa:staffprobot:vectors", "как открыть смену") == stored
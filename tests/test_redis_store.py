@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Тесты общей основы хранилищ в Redis: подмена HASH целиком и работа без Redis
+"""
+import asyncio
+import logging
+
+import redis
+
+from backend.storage.qa_store import QAStore
+from backend.storage.symbol_index import SymbolIndex
+
+
+def test_snapshot_replaces_hash_and_bumps_version(redis_client):
+    store = SymbolIndex(redis_client)
+    redis_client.hset("symbols:staffprobot", mapping={"old": "{}"})
+
+    store._write_snapshot("staffprobot", {"new": "{}"})
+
+    assert redis_client.hkeys("symbols:staffprobot") == [b"new"]
+    assert not redis_client.exists("symbols:staffprobot:new")
+    assert store._read_version("staffprobot") == 1
+
+
+def test_empty_snapshot_clears_hash(redis_client):
+    store = SymbolIndex(redis_client)
+    redis_client.hset("symbols:staffprobot", mapping={"old": "{}"})
+
+    store._write_snapshot("staffprobot", {})
+
+    assert not redis_client.exists("symbols:staffprobot")
+    assert store._read_version("staffprobot") == 1
+
+
+def test_redis_errors_are_logged_not_raised(caplog):
+    store = QAStore(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1))
+
+    with caplog.at_level(logging.WARNING, logger="backend.storage.qa_store"):
+        assert asyncio.run(store.has_data("staffprobot")) is False
+
+    assert "QA хранилище в Redis недоступно" in caplog.text
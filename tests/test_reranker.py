@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Тесты cross-encoder reranker: порядок по rerank_score и бюджет времени
+"""
+import asyncio
+import threading
+import time
+
+from backend.rag import reranker
+from backend.rag.reranker import CrossEncoderReranker
+
+
+class _LengthModel:
+    """Логит - длина документа; delay имитирует медленный CPU."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [len(document) - 5 for _, document in pairs]
+
+
+def _ready(model) -> CrossEncoderReranker:
+    ranker = CrossEncoderReranker("test-model")
+    ranker._model = model
+    return ranker
+
+
+def _docs(*contents: str) -> list:
+    return [{"content": content, "score": 0.5} for content in contents]
+
+
+def test_top_candidates_sorted_by_rerank_score(monkeypatch):
+    monkeypatch.setattr(reranker, "RERANK_TOP_N", 3)
+    docs = _docs("ab", "abcdefgh", "abcd", "abcdefghijkl")
+
+    result = asyncio.run(_ready(_LengthModel()).rerank("смены", docs))
+
+    assert [doc["content"] for doc in result] == ["abcdefgh", "abcd", "ab", "abcdefghijkl"]
+    assert result[0]["rerank_score"] > result[1]["rerank_score"] > result[2]["rerank_score"]
+    assert all(doc["score"] == 0.5 for doc in result)
+    assert "rerank_score" not in result[3]
+
+
+def test_over_budget_returns_none(monkeypatch):
+    monkeypatch.setattr(reranker, "RERANK_BUDGET_MS", 50)
+
+    ranker = _ready(_LengthModel(delay=0.5))
+
+    async def scenario():
+        started = time.perf_counter()
+        result = await ranker.rerank("смены", _docs("ab", "abcd"))
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(scenario())
+
+    # Ответ не ждёт модель: батч досчитывается в потоке уже после возврата
+    assert result is None
+    assert elapsed < 0.4
+
+
+def test_waiting_call_gives_up_without_computing(monkeypatch):
+    monkeypatch.setattr(reranker, "RERANK_BUDGET_MS", 50)
+    model = _LengthModel()
+    ranker = _ready(model)
+    # Батч другого запроса ещё считается в потоке
+    ranker._compute_lock.acquire()
+    try:
+        result = asyncio.run(ranker.rerank("смены", _docs("ab", "abcd")))
+        time.sleep(0.1)
+    finally:
+        ranker._compute_lock.release()
+
+    assert result is None
+    assert model.calls == 0
+
+
+def test_not_loaded_model_falls_back_and_starts_loading(monkeypatch):
+    loading = threading.Event()
+    monkeypatch.setattr(CrossEncoderReranker, "_load", lambda self: loading.set())
+    ranker = CrossEncoderReranker("test-model")
+
+    assert asyncio.run(ranker.rerank("смены", _docs("ab"))) is None
+    assert loading.wait(1)
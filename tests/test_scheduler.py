@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тесты планировщика генераций: приоритеты, переполнение очереди, дедлайн и отмена
+"""
+import asyncio
+
+import pytest
+
+from backend.llm.scheduler import BATCH, INTERACTIVE, GenerationScheduler, LLMOverloadedError
+
+
+async def _hold(scheduler: GenerationScheduler, release: asyncio.Event):
+    """Занимает слот до release."""
+    async with scheduler.slot(priority=INTERACTIVE, deadline=5):
+        await release.wait()
+
+
+async def _wait_queued(scheduler: GenerationScheduler, count: int):
+    while scheduler.queued < count:
+        await asyncio.sleep(0)
+
+
+def test_priority_order():
+    """Чат, вставший в очередь позже пакетной генерации, получает слот раньше неё."""
+    async def scenario():
+        scheduler = GenerationScheduler(concurrency=1, max_queue=4)
+        release = asyncio.Event()
+        order = []
+
+        async def worker(name: str, priority: int):
+            async with scheduler.slot(priority=priority, deadline=5):
+                order.append(name)
+
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(worker("batch", BATCH))
+        await _wait_queued(scheduler, 1)
+        chat = asyncio.create_task(worker("chat", INTERACTIVE))
+        await _wait_queued(scheduler, 2)
+
+        release.set()
+        await asyncio.gather(holder, batch, chat)
+        assert scheduler.active == 0
+        return order
+
+    assert asyncio.run(scenario()) == ["chat", "batch"]
+
+
+def test_queue_overflow():
+    """Сверх LLM_MAX_QUEUE ожидающих - сразу LLMOverloadedError с Retry-After."""
+    async def scenario():
+        scheduler = GenerationScheduler(concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(scheduler, release))
+        await _wait_queued(scheduler, 1)
+
+        with pytest.raises(LLMOverloadedError) as error:
+            async with scheduler.slot(priority=INTERACTIVE, deadline=5):
+                pass
+        assert error.value.retry_after >= 1.0
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_deadline_timeout():
+    """Истёкший дедлайн - отказ без слота; занятый слот освобождается как обычно."""
+    async def scenario():
+        scheduler = GenerationScheduler(concurrency=1, max_queue=4)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+
+        entered = False
+        with pytest.raises(LLMOverloadedError):
+            async with scheduler.slot(priority=INTERACTIVE, deadline=0.05):
+                entered = True
+        assert not entered
+        assert scheduler.queued == 0
+        assert scheduler.active == 1
+
+        release.set()
+        await holder
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_handover_releases_slot():
+    """Клиент ушёл, когда слот ему уже передан - слот не теряется."""
+    async def scenario():
+        scheduler = GenerationScheduler(concurrency=1, max_queue=4)
+        await scheduler._acquire(INTERACTIVE, 5)
+
+        async def waiter():
+            async with scheduler.slot(priority=INTERACTIVE, deadline=5):
+                pass
+
+        task = asyncio.create_task(waiter())
+        await _wait_queued(scheduler, 1)
+
+        # Завершение генерации передаёт слот ожидающему, клиент отменяется до пробуждения
+        scheduler._release()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert scheduler.active == 0
+
+        # Слот свободен: следующий запрос проходит без ожидания
+        async with scheduler.slot(priority=INTERACTIVE, deadline=0.05):
+            assert scheduler.active == 1
+        assert scheduler.active == 0
+
+    asyncio.run(scenario())
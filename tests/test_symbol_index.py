@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Тесты таблицы символов: точный, префиксный и нечёткий поиск, запись только кодовых чанков
+"""
+import asyncio
+
+from backend.storage.symbol_index import SymbolIndex, SymbolTable, symbol_entry
+
+
+def _table() -> SymbolTable:
+    entries = {}
+    for number, (name, kind, route) in enumerate([
+        ("open_shift", "function", "/shifts/open"),
+        ("open_shift_report", "function", ""),
+        ("close_shift", "function", ""),
+        ("ShiftService", "class", ""),
+    ]):
+        metadata = {"type": kind, "symbol": name, "file": "apps/web/services/shifts.py", "route_path": route}
+        entries[f"chunk-{number}"] = symbol_entry(metadata)
+    return SymbolTable(entries)
+
+
+def test_exact_lookup_by_name_qualname_and_route():
+    table = _table()
+
+    assert [entry["chunk_id"] for entry in table.exact("OPEN_SHIFT")] == ["chunk-0"]
+    assert [entry["chunk_id"] for entry in table.exact("apps.web.services.shifts.close_shift")] == ["chunk-2"]
+    assert [entry["chunk_id"] for entry in table.exact("/shifts/open")] == ["chunk-0"]
+
+
+def test_prefix_lookup():
+    names = {entry["name"] for entry in _table().prefix("open_")}
+
+    assert names == {"open_shift", "open_shift_report"}
+
+
+def test_fuzzy_lookup_tolerates_typo():
+    names = [entry["name"] for entry in _table().fuzzy("poen_shift", cutoff=0.8)]
+
+    assert names == []  # другое начало - кандидатов нет
+    assert [entry["name"] for entry in _table().fuzzy("close_shfit")] == ["close_shift"]
+
+
+def test_lookup_prefers_exact_hits(redis_client):
+    index = SymbolIndex(redis_client)
+    metadata = {"type": "function", "symbol": "open_shift", "file": "apps/web/services/shifts.py"}
+
+    async def scenario():
+        await index.record_chunks("staffprobot", ["chunk-0"], [metadata])
+        return (
+            await index.lookup("staffprobot", "где вызывается open_shift?"),
+            await index.lookup("staffprobot", "что делает open_shfit"),
+        )
+
+    exact, fuzzy = asyncio.run(scenario())
+
+    assert exact[0]["exact"] and exact[0]["compound"]
+    assert fuzzy[0]["name"] == "open_shift" and not fuzzy[0]["exact"]
+
+def test_only_code_chunks_reach_symbol_index(storage):
+    recorded = []
+
+    async def record_chunks(project, ids, metadatas):
+        recorded.extend(metadata["type"] for metadata in metadatas)
+
+    storage.symbol_index.record_chunks = record_chunks
+    chunks = [
+        {"content": "def open_shift(): pass", "file": "a.py", "type": "function", "symbol": "open_shift"},
+        {"content": "# Смены", "file": "README.md", "type": "markdown_section"},
+        {"content": "Вопрос: где?\\nОтвет: тут", "file": "qa.json", "type": "qa_pair"},
+    ]
+
+    asyncio.run(storage.store_chunks("staffprobot", chunks))
+
+    assert recorded == ["function"]
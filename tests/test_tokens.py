@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Тесты подсчёта токенов: локальный токенизатор и явный откат на оценку по символам
+"""
+import logging
+
+import pytest
+
+from backend.llm import tokens
+
+
+@pytest.fixture
+def fresh_tokenizer(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenizer", None)
+    monkeypatch.setattr(tokens, "_tokenizer_failed", False)
+
+
+def test_missing_tokenizer_warns_once_and_falls_back(monkeypatch, tmp_path, caplog, fresh_tokenizer):
+    monkeypatch.setattr(tokens, "TOKENIZER_PATH", str(tmp_path / "missing"))
+    monkeypatch.setattr(tokens, "TOKENIZER_NAME", "project-brain/no-such-tokenizer")
+
+    with caplog.at_level(logging.WARNING, logger=tokens.__name__):
+        assert tokens.count_tokens("x" * 40) == 11
+        assert tokens.count_tokens("y" * 40) == 11
+
+    warnings = [record for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "len(text)//4" in warnings[0].getMessage()
+
+
+def test_local_tokenizer_loads_without_network(monkeypatch, tmp_path, fresh_tokenizer):
+    pytest.importorskip("transformers")
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"[UNK]": 0, "def": 1, "open_shift": 2, "return": 3}
+    word_level = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    word_level.pre_tokenizer = pre_tokenizers.Whitespace()
+    PreTrainedTokenizerFast(tokenizer_object=word_level, unk_token="[UNK]").save_pretrained(str(tmp_path))
+    monkeypatch.setattr(tokens, "TOKENIZER_PATH", str(tmp_path))
+
+    assert tokens.count_tokens("def open_shift return") == 3
+    assert tokens.truncate_to_tokens("def open_shift return", 2) == "def open_shift"
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Тесты NumPy бэкенда векторного хранилища: семантика записи, фильтры where и порядок выдачи
+"""
+import pytest
+
+from backend.storage.vector_store import NumpyVectorStore
+
+
+def _collection(space: str = "l2"):
+    collection = NumpyVectorStore().get_or_create_collection("kb_staffprobot", metadata={"hnsw:space": space})
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [3.0, 0.0]],
+        documents=["open_shift", "close_shift", "shift_report"],
+        metadatas=[
+            {"file": "shifts.py", "type": "function", "start_line": 1},
+            {"file": "shifts.py", "type": "function", "start_line": 10},
+            {"file": "reports.py", "type": "class", "start_line": 5},
+        ],
+    )
+    return collection
+
+
+def test_l2_query_returns_nearest_first_with_squared_distances():
+    result = _collection().query(query_embeddings=[[1.0, 0.0]], n_results=2)
+
+    assert result["ids"] == [["a", "b"]]
+    assert result["distances"] == [[0.0, 2.0]]
+    assert result["documents"] == [["open_shift", "close_shift"]]
+
+
+def test_cosine_space_ignores_vector_length():
+    result = _collection("cosine").query(query_embeddings=[[2.0, 0.0]], n_results=2)
+
+    assert sorted(result["ids"][0]) == ["a", "c"]
+    assert result["distances"][0] == pytest.approx([0.0, 0.0], abs=1e-6)
+
+
+def test_where_filters_query_and_get():
+    collection = _collection()
+    where = {"$and": [{"file": "shifts.py"}, {"start_line": {"$gte": 5}}]}
+
+    assert collection.query(query_embeddings=[[1.0, 0.0]], where=where)["ids"] == [["b"]]
+    assert collection.get(where={"type": {"$in": ["class"]}}, include=[])["ids"] == ["c"]
+    assert collection.get(where={"type": {"$ne": "function"}}, include=[])["ids"] == ["c"]
+
+
+def test_add_keeps_existing_ids_and_upsert_overwrites():
+    collection = _collection()
+    collection.add(ids=["a"], embeddings=[[9.0, 9.0]], documents=["changed"], metadatas=[{"file": "x.py"}])
+    assert collection.get(ids=["a"])["documents"] == ["open_shift"]
+
+    collection.upsert(ids=["a"], embeddings=[[0.0, 1.0]], documents=["changed"], metadatas=[{"file": "x.py"}])
+    assert collection.get(ids=["a"])["documents"] == ["changed"]
+    # Матрица пересобрана: новый вектор участвует в поиске
+    assert collection.query(query_embeddings=[[0.0, 1.0]], n_results=2)["distances"] == [[0.0, 0.0]]
+
+
+def test_update_merges_metadata():
+    collection = _collection()
+    collection.update(ids=["a", "missing"], metadatas=[{"symbol": "open_shift"}, {"symbol": "x"}])
+
+    metadata = collection.get(ids=["a"], include=["metadatas"])["metadatas"][0]
+    assert metadata == {"file": "shifts.py", "type": "function", "start_line": 1, "symbol": "open_shift"}
+    assert collection.count() == 3
+
+
+def test_get_pages_and_delete_by_where():
+    collection = _collection()
+
+    assert collection.get(limit=2, offset=1, include=[])["ids"] == ["b", "c"]
+
+    collection.delete(where={"file": "shifts.py"})
+    assert collection.get(include=[])["ids"] == ["c"]
+    assert collection.query(query_embeddings=[[1.0, 0.0]], n_results=5)["ids"] == [["c"]]
+    with pytest.raises(ValueError):
+        collection.delete()
+
+
+def test_store_collection_lifecycle():
+    store = NumpyVectorStore()
+    store.create_collection("kb_staffprobot")
+
+    with pytest.raises(ValueError):
+        store.create_collection("kb_staffprobot")
+    store.delete_collection("kb_staffprobot")
+    with pytest.raises(ValueError):
+        store.get_collection("kb_staffprobot")
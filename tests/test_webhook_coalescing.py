@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Тесты переиндексации по webhook: схлопывание пушей и общая блокировка с ручной индексацией
+"""
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+
+from backend.api.routes import index, webhook
+from backend.storage.redis_lock import RedisLock
+
+
+@pytest.fixture
+def pushes(monkeypatch, redis_client):
+    """Webhook на fakeredis с коротким окном; вместо переиндексации - запись SHA."""
+    processed = []
+
+    async def process(payload):
+        processed.append(payload["after"])
+
+    monkeypatch.setattr(webhook, "_redis_client", redis_client)
+    monkeypatch.setattr(webhook, "PUSH_DEBOUNCE_SEC", 0.05)
+    monkeypatch.setattr(webhook, "pending_pushes", {})
+    monkeypatch.setattr(webhook, "superseded_shas", {})
+    monkeypatch.setattr(webhook, "_coalesce_tasks", {})
+    monkeypatch.setattr(webhook, "process_github_push", process)
+    return processed
+
+
+def _push(sha: str) -> dict:
+    return {"ref": "refs/heads/main", "after": sha, "repository": {"name": "staffprobot"}}
+
+
+async def _drain():
+    while webhook._coalesce_tasks:
+        await asyncio.gather(*webhook._coalesce_tasks.values())
+
+
+def test_pushes_within_window_coalesce_to_newest_sha(pushes):
+    async def scenario():
+        for sha in ("a1", "b2", "c3"):
+            info = webhook.enqueue_push(_push(sha))
+        await _drain()
+        return info
+
+    info = asyncio.run(scenario())
+
+    assert pushes == ["c3"]
+    assert info["queued_shas"] == ["a1", "b2", "c3"]
+    assert webhook.superseded_shas["staffprobot"] == ["a1", "b2"]
+
+
+def test_reindex_waits_for_lock_held_elsewhere(pushes, redis_client):
+    async def scenario():
+        other_worker = RedisLock(redis_client, "reindex:lock:staffprobot", ttl=5)
+        assert await other_worker.acquire()
+        webhook.enqueue_push(_push("a1"))
+        await asyncio.sleep(0.2)
+        assert pushes == []
+
+        await other_worker.release()
+        await _drain()
+
+    asyncio.run(scenario())
+
+    assert pushes == ["a1"]
+    assert not redis_client.exists("reindex:lock:staffprobot")
+
+
+class _Projects:
+    projects = [{"name": "staffprobot"}]
+
+    def load_config(self):
+        pass
+
+
+def test_manual_index_conflicts_with_running_reindex(pushes, redis_client, monkeypatch):
+    monkeypatch.setattr(index, "project_indexer", _Projects())
+
+    async def scenario():
+        running = RedisLock(redis_client, "reindex:lock:staffprobot", ttl=5)
+        assert await running.acquire()
+        try:
+            with pytest.raises(HTTPException) as error:
+                await index.index_project("staffprobot", BackgroundTasks())
+        finally:
+            await running.release()
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 409
+
+
+def test_manual_index_holds_lock_until_background_run_ends(pushes, redis_client, monkeypatch):
+    monkeypatch.setattr(index, "project_indexer", _Projects())
+
+    async def broken_engine():
+        raise RuntimeError("ChromaDB недоступна")
+
+    monkeypatch.setattr(index, "get_rag_engine", broken_engine)
+
+    async def scenario():
+        tasks = BackgroundTasks()
+        response = await index.index_project("staffprobot", tasks)
+        assert response.status == "started"
+        assert redis_client.exists("reindex:lock:staffprobot")
+
+        await tasks()
+        return redis_client.exists("reindex:lock:staffprobot")
+
+    assert not asyncio.run(scenario())